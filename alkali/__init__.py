@@ -9,7 +9,7 @@ __copyright__    = 'Copyright 2017 Kurt Neufeld'
 from .database import Database
 from .manager import Manager
 from .model import Model
-from .query import Query
+from .query import Query, Q
 from .utils import tznow, tzadd, fromts
 from . import fields
 from .storage import Storage, JSONStorage, FileStorage, CSVStorage, \
@@ -0,0 +1,103 @@
+"""
+a small least recently used cache of query results that a
+:class:`alkali.manager.Manager` keeps for its queries.
+
+results are stored under the *plan* of a query (its filters and ordering)
+and are only good for the :attr:`alkali.manager.Manager.version` they were
+computed at. as soon as the manager changes every cached result is dropped.
+
+::
+
+    MyModel.objects.filter(title='foo').count   # miss, runs the query
+    MyModel.objects.filter(title='foo').count   # hit
+    MyModel(id=99, title='foo').save()          # new version, cache emptied
+    MyModel.objects.cache_info()
+    # CacheInfo(hits=1, misses=1, maxsize=128, currsize=0)
+"""
+
+import collections
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+CacheInfo = collections.namedtuple('CacheInfo', 'hits misses maxsize currsize')
+
+
+class ResultCache:
+    """
+    bounded LRU mapping of query plan to the primary keys it produced
+    """
+
+    def __init__(self, maxsize=128):
+        """
+        :param int maxsize: most results to keep, 0 disables the cache
+        """
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+
+        self._version = None
+        self._results = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self._results)
+
+    def _check(self, version):
+        """
+        forget everything computed at an older version
+        """
+        if version != self._version:
+            self._results.clear()
+            self._version = version
+
+    def get(self, version, plan):
+        """
+        :param int version: current manager version
+        :param plan: hashable description of the query
+        :rtype: the stored result or None
+        """
+        if not self.maxsize:
+            return None
+
+        self._check(version)
+
+        try:
+            result = self._results[plan]
+        except KeyError:
+            self.misses += 1
+            return None
+
+        self._results.move_to_end(plan)
+        self.hits += 1
+        return result
+
+    def put(self, version, plan, result):
+        """
+        store ``result`` for ``plan``, evicting the least recently
+        used result if we're full
+        """
+        if not self.maxsize:
+            return
+
+        self._check(version)
+
+        self._results[plan] = result
+        self._results.move_to_end(plan)
+
+        while len(self._results) > self.maxsize:
+            self._results.popitem(last=False)
+
+    def clear(self):
+        """
+        forget all results and reset the counters
+        """
+        self._results.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def info(self):
+        """
+        :rtype: ``CacheInfo`` named tuple of hits, misses, maxsize, currsize
+        """
+        return CacheInfo(self.hits, self.misses, self.maxsize, len(self._results))
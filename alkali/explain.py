@@ -0,0 +1,97 @@
+"""
+the report returned by :func:`alkali.query.Query.explain`.
+
+``explain()`` runs the pending filters and ordering of a query one stage
+at a time and records how each stage was answered, how many rows it was
+expected to produce, how many it actually produced and how long it took.
+anything done with the query afterwards (``group_by``, ``aggregate``,
+``limit``, copying instances out of it) is added to the same report.
+
+::
+
+    q = MyModel.objects.filter(name='foo', size__gt=10).order_by('-size')
+    report = q.explain()
+    q.limit(5)
+    print(report)
+
+    <Explain: MyModel>
+    stage      strategy                            est     rows        ms
+    source     12000 instances                   12000    12000     0.210
+    filter     name eq 'foo': HashIndex             12        8     0.012
+    filter     size gt 10: scan                      3        3     0.004
+    order_by   sort on -size, id                     3        3     0.003
+    limit      slice of sorted 5 by -size, id        3        3     0.001
+    copies: 3
+"""
+
+import collections
+import time
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+Stage = collections.namedtuple('Stage', 'stage strategy estimated actual seconds')
+
+
+class Explain:
+    """
+    the stages a query went through, see :mod:`alkali.explain`
+    """
+
+    def __init__(self, model_class):
+        """
+        :param model_class: the model being queried
+        """
+        self.model_class = model_class
+        self.stages = []
+        self.copies = 0 # model instances copied out of the query
+
+    def __repr__(self):
+        return "<Explain: {}>".format(self.model_class.__name__)
+
+    def __str__(self):
+        lines = [repr(self)]
+        fmt = "{:<10} {:<34} {:>5} {:>8} {:>9}"
+
+        lines.append( fmt.format('stage', 'strategy', 'est', 'rows', 'ms') )
+
+        for stage in self.stages:
+            estimated = '' if stage.estimated is None else stage.estimated
+            lines.append( fmt.format(stage.stage, stage.strategy, estimated,
+                stage.actual, "{:.3f}".format(stage.seconds * 1000)) )
+
+        lines.append( "copies: {}".format(self.copies) )
+        return "\n".join(lines)
+
+    def __iter__(self):
+        return iter(self.stages)
+
+    def __len__(self):
+        return len(self.stages)
+
+    @property
+    def seconds(self):
+        """
+        **property**: total time of all the stages
+        """
+        return sum(stage.seconds for stage in self.stages)
+
+    def add(self, stage, strategy, estimated, actual, seconds):
+        """
+        record a stage
+
+        :param str stage: eg. ``filter``, ``order_by``
+        :param str strategy: how the stage was answered
+        :param estimated: rows the stage was expected to produce, None if unknown
+        :param int actual: rows the stage produced
+        :param float seconds: wall clock time
+        """
+        self.stages.append( Stage(stage, strategy, estimated, actual, seconds) )
+
+    def timer(self):
+        """
+        :rtype: function that returns the seconds since ``timer`` was called
+        """
+        start = time.perf_counter()
+        return lambda: time.perf_counter() - start
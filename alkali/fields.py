@@ -37,14 +37,21 @@ class Field:
         :type field_type: str/int/float/etc
         :param kw:
             * primary_key: is this field a primary key of parent model
-            * indexed:     is this field indexed (not implemented yet)
+            * indexed:     keep an index of this field, speeds up queries,
+              see :mod:`alkali.index`
+            * searchable:  keep a full text index of the words in a
+              ``StringField`` for ``field__search`` queries,
+              see :class:`alkali.index.TokenIndex`
+            * trigrams:    keep a trigram index of a ``StringField``, speeds
+              up ``re``, ``rei`` and ``contains`` queries,
+              see :class:`alkali.index.TrigramIndex`
         """
         self._order = next(Field._counter) # DO NOT TOUCH, deleted in MetaModel
 
         assert field_type is not None
         self._field_type = field_type
 
-        self._properties = ['primary_key', 'indexed',
+        self._properties = ['primary_key', 'indexed', 'searchable', 'trigrams',
                 'auto_increment', 'auto_now', 'auto_now_add', 'allowed_choices']
 
         # create a getter property based on _properties list
@@ -318,10 +325,26 @@ class ForeignKey(Field):
             return self
 
         fk_value = model.__dict__[self._name]
+
+        # attached by Query.select_related(), only good for the
+        # foreign pk it was looked up with
+        related = model.__dict__.get(self.cache_name, None)
+        if related is not None and related[0] == fk_value:
+            return related[1]
+
         return self.lookup(fk_value)
 
     # don't require a __set__ because Model.set_field() calls our cast() method
 
+    @property
+    def cache_name(self):
+        """
+        **property**: key in the model's ``__dict__`` that holds the
+        (foreign pk, foreign instance) attached by
+        :func:`alkali.query.Query.select_related`
+        """
+        return '___' + self._name
+
     @property
     def pk_field(self):
         ":rtype: :func:`IField.field_type`, eg: IntField"
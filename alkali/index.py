@@ -0,0 +1,815 @@
+"""
+secondary indexes that a :class:`alkali.manager.Manager` keeps for its
+model fields.
+
+an index maps a field value back to the primary keys of the model
+instances that hold that value. the ``Manager`` keeps its indexes in
+sync as instances are saved, deleted, cleared and loaded, and
+:class:`alkali.query.Query` asks them for answers before falling back
+to scanning every instance.
+
+::
+
+    class MyModel( Model ):
+        id    = fields.IntField(primary_key=True)
+        title = fields.StringField(indexed=True)
+
+    MyModel.objects.filter(title='foo')           # hash lookup
+    MyModel.objects.filter(title__in=['a', 'b'])  # hash lookups
+
+indexed ``IntField``, ``FloatField`` and ``DateTimeField`` fields also
+keep a sorted index that answers range queries with a binary search.
+
+::
+
+    MyModel.objects.filter(date__ge=tznow() - timedelta(days=7))
+    MyModel.objects.filter(date__range=(start, end))
+
+the manager also builds derived indexes the first time they're needed,
+whether or not a field is ``indexed``: casefolded ``StringField`` values
+for ``iexact``, ``icontains``, ``istartswith`` and ``iendswith`` and the
+parts of ``DateTimeField`` values for ``year``, ``month``, ``week_day``, etc.
+
+::
+
+    MyModel.objects.filter(title__icontains='foo')
+    MyModel.objects.filter(date__year=2017)
+
+``StringField(searchable=True)`` keeps an inverted index of the words in
+the field for ``search`` queries.
+
+::
+
+    MyModel.objects.filter(body__search='python OR rust* web')
+
+``StringField(trigrams=True)`` keeps the three letter substrings of the
+field so ``re``, ``rei``, ``contains`` and ``icontains`` queries only
+look at the instances that contain the literal text of the pattern.
+
+::
+
+    MyModel.objects.filter(line__re='ERROR: disk [0-9]+ failed')
+"""
+
+import bisect
+import collections
+import re
+
+try:
+    import re._parser as sre_parse # python 3.11+
+except ImportError:
+    import sre_parse
+
+from . import predicate
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+class Index:
+    """
+    base class for all index types
+
+    an index is told about every (pk, value) pair that enters or leaves
+    its manager, values are the raw values stored in the model instance
+    ``__dict__`` (eg. the pk value for a ForeignKey).
+    """
+
+    def __init__(self, field):
+        """
+        :param Field field: the field being indexed
+        """
+        self.field = field
+        self.clear()
+
+    def __repr__(self):
+        return "<{}: {}>".format(self.__class__.__name__, self.field.name)
+
+    def __len__(self):
+        raise NotImplementedError()
+
+    def clear(self):
+        raise NotImplementedError()
+
+    def add(self, pk, value):
+        raise NotImplementedError()
+
+    def remove(self, pk, value):
+        raise NotImplementedError()
+
+    def update_many(self, name, changes):
+        """
+        move a batch of instances from old to new values, like calling
+        ``remove`` and ``add`` for each
+
+        :param str name: the field name the values are kept under
+        :param changes: ``list`` of ``(pk, old, new)`` model instances,
+            either may be None
+        """
+        for pk, old, new in changes:
+            if old is not None:
+                self.remove(pk, old.__dict__[name])
+            if new is not None:
+                self.add(pk, new.__dict__[name])
+
+    def rebuild(self, instances):
+        """
+        throw away the index and rebuild it from the given instances
+
+        :param instances: ``dict`` of pk, model instance
+        """
+        self.clear()
+
+        name = self.field.name
+        for pk, elem in instances.items():
+            self.add(pk, elem.__dict__[name])
+
+    def lookup(self, oper, value):
+        """
+        return the primary keys that match ``field__oper=value``
+
+        :param str oper: query operator, eg. ``eq``
+        :param value: the value the user is querying for
+        :rtype: ``set`` of primary keys or None if this index can't
+            answer the given operator
+        """
+        return None
+
+
+class HashIndex(Index):
+    """
+    maps a field value to the set of primary keys holding that value,
+    answers ``eq`` and ``in`` queries.
+    """
+
+    def __len__(self):
+        return len(self._values)
+
+    def clear(self):
+        self._values = collections.defaultdict(set)
+
+    def add(self, pk, value):
+        try:
+            self._values[value].add(pk)
+        except TypeError: # unhashable, eg. a set
+            pass
+
+    def remove(self, pk, value):
+        try:
+            pks = self._values[value]
+        except (KeyError, TypeError):
+            return
+
+        pks.discard(pk)
+        if not pks:
+            del self._values[value]
+
+    def key(self, value):
+        """
+        convert a queried value into the value stored in the index
+
+        a ForeignKey stores the foreign pk but is compared against
+        model instances
+
+        :raises TypeError: if value can't be equal to any stored value
+            or can't be used as a dict key
+        """
+        from .fields import ForeignKey
+
+        if isinstance(self.field, ForeignKey):
+            if isinstance(value, self.field.foreign_model):
+                return value.pk
+            raise TypeError("not a {}".format(self.field.foreign_model.__name__))
+
+        hash(value)
+        return value
+
+    def get(self, value):
+        """
+        :rtype: ``set`` of primary keys whose field equals ``value``
+        """
+        try:
+            key = self.key(value)
+        except TypeError:
+            return set()
+
+        return self.get_key(key)
+
+    def get_key(self, key):
+        """
+        like ``get`` but for a value as it's stored in the index,
+        eg. the foreign pk of a ForeignKey
+
+        :rtype: ``set`` of primary keys
+        """
+        try:
+            pks = self._values.get(key, None)
+        except TypeError:
+            return set()
+
+        return set(pks) if pks else set()
+
+    def lookup(self, oper, value):
+        if oper in ('eq', 'exact'):
+            try:
+                self.key(value)
+            except TypeError:
+                return None
+            return self.get(value)
+
+        if oper == 'in':
+            # a string would be a substring search, not a value lookup
+            if not isinstance(value, (list, tuple, set, frozenset)):
+                return None
+
+            pks = set()
+            for v in value:
+                pks |= self.get(v)
+            return pks
+
+        return None
+
+
+class _Top:
+    """
+    sorts after everything, ``(value, _TOP)`` comes after every
+    ``(value, pk)`` entry
+    """
+    def __lt__(self, other):
+        return False
+
+    def __gt__(self, other):
+        return True
+
+_TOP = _Top()
+
+
+class SortedIndex(Index):
+    """
+    keeps field values in sorted order, answers ``gt``, ``ge``, ``lt``,
+    ``le`` and ``range`` queries with a binary search plus a slice.
+
+    entries are ``(value, pk)`` so an instance is found with a binary
+    search however many share its value. they're kept in blocks of about
+    ``load`` entries so a delete only moves the entries of one block, not
+    the whole index. new entries wait in a set until the next range query
+    sorts them in, saves in a row don't pay for sorting at all.
+    ``None`` values are not indexed since they can't be ordered.
+    """
+
+    # entries per block, a block is split when it gets twice as big
+    load = 512
+
+    # batches at least this big are merged in with one sort
+    batch_size = 256
+
+    def __len__(self):
+        return self._len + len(self._pending)
+
+    def clear(self):
+        self._blocks = [] # sorted lists of (field value, pk)
+        self._maxes = []  # last entry of each block
+        self._len = 0     # entries in _blocks
+        self._pending = set() # (field value, pk) not sorted in yet
+
+    def add(self, pk, value):
+        if value is None:
+            return
+
+        self._pending.add( (value, pk) )
+
+    def _insert(self, key):
+        """
+        helper function that sorts ``key`` into its block
+        """
+        blocks, maxes = self._blocks, self._maxes
+
+        if not blocks:
+            blocks.append( [key] )
+            maxes.append( key )
+            self._len = 1
+            return
+
+        i = bisect.bisect_right(maxes, key)
+
+        if i == len(maxes):
+            i -= 1
+            blocks[i].append(key)
+            maxes[i] = key
+        else:
+            bisect.insort_right(blocks[i], key)
+
+        self._len += 1
+
+        block = blocks[i]
+        if len(block) > 2 * self.load:
+            half = len(block) // 2
+            blocks[i:i+1] = [block[:half], block[half:]]
+            maxes[i:i+1] = [block[half-1], block[-1]]
+
+    def remove(self, pk, value):
+        if value is None:
+            return
+
+        key = (value, pk)
+
+        if key in self._pending:
+            self._pending.remove(key)
+            return
+
+        blocks, maxes = self._blocks, self._maxes
+
+        i = bisect.bisect_left(maxes, key)
+        if i == len(maxes):
+            return
+
+        block = blocks[i]
+        j = bisect.bisect_left(block, key)
+
+        if j == len(block) or block[j][1] != pk:
+            return
+
+        del block[j]
+        self._len -= 1
+
+        if not block:
+            del blocks[i]
+            del maxes[i]
+        elif j == len(block):
+            maxes[i] = block[-1]
+
+    def update_many(self, name, changes):
+        if len(changes) < max(self.batch_size, len(self) // 8):
+            return super().update_many(name, changes)
+
+        latest = {}
+        for pk, old, new in changes:
+            latest[pk] = new
+
+        keys = [key for block in self._blocks for key in block if key[1] not in latest]
+        keys.extend( key for key in self._pending if key[1] not in latest )
+
+        for pk, new in latest.items():
+            if new is not None and new.__dict__[name] is not None:
+                keys.append( (new.__dict__[name], pk) )
+
+        self._set(keys)
+
+    def rebuild(self, instances):
+        name = self.field.name
+
+        keys = [(elem.__dict__[name], pk) for pk, elem in instances.items()]
+        self._set([key for key in keys if key[0] is not None])
+
+    def _set(self, keys):
+        """
+        helper function that sorts ``keys`` and makes them our entries
+        """
+        keys.sort()
+        load = self.load
+
+        self._blocks = [keys[i:i+load] for i in range(0, len(keys), load)]
+        self._maxes = [block[-1] for block in self._blocks]
+        self._len = len(keys)
+        self._pending = set()
+
+    def _flush(self):
+        """
+        helper function that sorts the pending entries in, all at once
+        when there are a lot of them
+        """
+        pending = self._pending
+        if not pending:
+            return
+
+        if len(pending) >= max(self.batch_size, self._len // 8):
+            keys = [key for block in self._blocks for key in block]
+            keys.extend(pending)
+            self._set(keys)
+            return
+
+        for key in sorted(pending):
+            self._insert(key)
+            pending.discard(key)
+
+    def _position(self, probe, right):
+        """
+        helper function that finds where ``probe`` would go
+
+        :param bool right: after entries equal to ``probe``
+        :rtype: ``tuple`` of (block, offset)
+        """
+        find = bisect.bisect_right if right else bisect.bisect_left
+
+        i = find(self._maxes, probe)
+        if i == len(self._maxes):
+            return i, 0
+
+        return i, find(self._blocks[i], probe)
+
+    def range(self, lo=None, hi=None, lo_incl=True, hi_incl=True):
+        """
+        :param lo: smallest value, None for no lower bound
+        :param hi: largest value, None for no upper bound
+        :param lo_incl: include values equal to ``lo``
+        :param hi_incl: include values equal to ``hi``
+        :rtype: ``list`` of primary keys in value order
+        """
+        self._flush()
+        blocks = self._blocks
+
+        # (value,) sorts before and (value, _TOP) after every (value, pk)
+        if lo is None:
+            start = (0, 0)
+        elif lo_incl:
+            start = self._position((lo,), False)
+        else:
+            start = self._position((lo, _TOP), True)
+
+        if hi is None:
+            stop = (len(blocks), 0)
+        elif hi_incl:
+            stop = self._position((hi, _TOP), True)
+        else:
+            stop = self._position((hi,), False)
+
+        if start >= stop:
+            return []
+
+        (i, j), (k, l) = start, stop
+
+        if i == k:
+            return [pk for _, pk in blocks[i][j:l]]
+
+        parts = [blocks[i][j:]] + blocks[i+1:k] + [blocks[k][:l]] if k < len(blocks) \
+                else [blocks[i][j:]] + blocks[i+1:k]
+
+        return [pk for part in parts for _, pk in part]
+
+    def lookup(self, oper, value):
+        if value is None:
+            return None
+
+        if oper == 'range':
+            lo, hi = value
+            if lo is None or hi is None:
+                return None
+            bounds = {'range': dict(lo=lo, hi=hi)}
+        else:
+            bounds = {
+                'gt': dict(lo=value, lo_incl=False),
+                'ge': dict(lo=value),
+                'lt': dict(hi=value, hi_incl=False),
+                'le': dict(hi=value),
+            }
+
+        try:
+            return set(self.range(**bounds[oper]))
+        except KeyError:
+            return None
+        except TypeError: # eg. naive vs aware datetime, let the scan complain
+            return None
+
+
+class FoldedIndex(Index):
+    """
+    keeps the casefolded value of every string so case insensitive
+    queries compare against them instead of folding every row for
+    every query. answers ``iexact``, ``icontains``, ``istartswith``
+    and ``iendswith``.
+    """
+    operators = predicate.FOLDED
+
+    def __len__(self):
+        return len(self._values)
+
+    def clear(self):
+        self._values = {} # pk, casefolded value
+        self._exact = collections.defaultdict(set)
+
+    def add(self, pk, value):
+        if not isinstance(value, str):
+            return
+
+        value = value.casefold()
+        self._values[pk] = value
+        self._exact[value].add(pk)
+
+    def remove(self, pk, value):
+        value = self._values.pop(pk, None)
+        if value is None:
+            return
+
+        pks = self._exact[value]
+        pks.discard(pk)
+        if not pks:
+            del self._exact[value]
+
+    def lookup(self, oper, value):
+        if oper not in self.operators or not isinstance(value, str):
+            return None
+
+        value = value.casefold()
+
+        if oper == 'iexact':
+            return set(self._exact.get(value, ()))
+
+        if oper == 'icontains':
+            return {pk for pk, v in self._values.items() if value in v}
+
+        test = str.startswith if oper == 'istartswith' else str.endswith
+        return {pk for pk, v in self._values.items() if test(v, value)}
+
+
+class DatePartIndex(Index):
+    """
+    maps each part of a datetime (year, month, week_day, etc) to the
+    primary keys holding it, answers the ``DATE_PARTS`` operators of
+    :mod:`alkali.predicate` with a dict lookup.
+
+    ``None`` values are not indexed.
+    """
+    operators = predicate.DATE_PARTS
+
+    def __len__(self):
+        return len(self._values)
+
+    def clear(self):
+        self._values = {} # pk, indexed datetime
+        self._parts = {part: collections.defaultdict(set) for part in self.operators}
+
+    def add(self, pk, value):
+        if value is None:
+            return
+
+        self._values[pk] = value
+        for part, values in self._parts.items():
+            values[predicate.date_part(value, part)].add(pk)
+
+    def remove(self, pk, value):
+        value = self._values.pop(pk, None)
+        if value is None:
+            return
+
+        for part, values in self._parts.items():
+            key = predicate.date_part(value, part)
+            values[key].discard(pk)
+            if not values[key]:
+                del values[key]
+
+    def lookup(self, oper, value):
+        if oper not in self.operators:
+            return None
+
+        try:
+            return set(self._parts[oper].get(value, ()))
+        except TypeError: # unhashable
+            return None
+
+
+class TokenIndex(Index):
+    """
+    inverted index from each word in a string to the primary keys that
+    contain it, answers ``search`` queries.
+
+    words are casefolded, see :func:`alkali.predicate.tokenize`. a search
+    is parsed by :func:`alkali.predicate.parse_search`.
+    """
+
+    def __len__(self):
+        return len(self._postings)
+
+    def clear(self):
+        self._postings = collections.defaultdict(set) # word, pks
+        self._words = {}     # pk, words in its value
+        self._vocab = None   # sorted words, for prefix searches
+
+    def add(self, pk, value):
+        if not isinstance(value, str):
+            return
+
+        words = frozenset(predicate.tokenize(value))
+        self._words[pk] = words
+
+        for word in words:
+            pks = self._postings[word]
+            if not pks:
+                self._vocab = None
+            pks.add(pk)
+
+    def remove(self, pk, value):
+        words = self._words.pop(pk, ())
+
+        for word in words:
+            pks = self._postings[word]
+            pks.discard(pk)
+            if not pks:
+                del self._postings[word]
+                self._vocab = None
+
+    def postings(self, word, prefix=False):
+        """
+        :param str word: casefolded word
+        :param prefix: match every word that starts with ``word``
+        :rtype: ``set`` of primary keys (not a copy when not ``prefix``)
+        """
+        if not prefix:
+            return self._postings.get(word, set())
+
+        if self._vocab is None:
+            self._vocab = sorted(self._postings.keys())
+
+        vocab = self._vocab
+        pks = set()
+
+        for i in range(bisect.bisect_left(vocab, word), len(vocab)):
+            if not vocab[i].startswith(word):
+                break
+            pks |= self._postings[vocab[i]]
+
+        return pks
+
+    def search(self, search):
+        """
+        :param search: parsed search, see :func:`alkali.predicate.parse_search`
+        :rtype: ``set`` of primary keys
+        """
+        found = set()
+
+        for terms in search:
+            postings = sorted(
+                    (self.postings(word, prefix) for word, prefix in terms),
+                    key=len)
+
+            # intersect starting with the rarest word
+            pks = set(postings[0])
+            for p in postings[1:]:
+                if not pks:
+                    break
+                pks &= p
+
+            found |= pks
+
+        return found
+
+    def lookup(self, oper, value):
+        if oper != 'search' or not isinstance(value, str):
+            return None
+
+        return self.search(predicate.parse_search(value))
+
+
+def _runs(items, runs):
+    """
+    helper function that collects the runs of literal characters that
+    must appear in any match of a parsed regex
+
+    :param items: parsed regex, see ``sre_parse.parse``
+    :param runs: ``list`` of ``str`` that gets appended to
+    """
+    run = []
+
+    def _flush():
+        if run:
+            runs.append( ''.join(run) )
+            del run[:]
+
+    for op, av in items:
+        if op is sre_parse.LITERAL:
+            run.append( chr(av) )
+            continue
+
+        _flush()
+
+        if op is sre_parse.SUBPATTERN:
+            _runs(av[-1], runs)
+        elif op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT) and av[0] >= 1:
+            _runs(av[2], runs)
+
+        # anything else (alternatives, classes, etc) just ends the run
+
+    _flush()
+
+
+def trigrams(value):
+    """
+    :param str value:
+    :rtype: ``set`` of casefolded three letter substrings of ``value``
+    """
+    value = value.casefold()
+    return {value[i:i+3] for i in range(len(value) - 2)}
+
+
+class TrigramIndex(Index):
+    """
+    maps every three letter substring of a string (casefolded) to the
+    primary keys that contain it, answers ``re``, ``rei``, ``contains``
+    and ``icontains`` queries.
+
+    the literal text a pattern requires is broken into trigrams, only
+    instances holding all of them are checked against the real pattern.
+    patterns without three literal characters in a row can't be answered.
+    """
+    operators = ('re', 'rei', 'contains', 'icontains')
+
+    def __len__(self):
+        return len(self._grams)
+
+    def clear(self):
+        self._grams = collections.defaultdict(set) # trigram, pks
+        self._values = {} # pk, indexed value
+
+    def add(self, pk, value):
+        if not isinstance(value, str):
+            return
+
+        self._values[pk] = value
+        for gram in trigrams(value):
+            self._grams[gram].add(pk)
+
+    def remove(self, pk, value):
+        value = self._values.pop(pk, None)
+        if value is None:
+            return
+
+        for gram in trigrams(value):
+            pks = self._grams[gram]
+            pks.discard(pk)
+            if not pks:
+                del self._grams[gram]
+
+    def literals(self, oper, value):
+        """
+        :rtype: ``list`` of strings any match must contain or None if
+            the pattern can't be used
+        """
+        if oper in ('contains', 'icontains'):
+            return [value] if isinstance(value, str) else None
+
+        flags = 0
+
+        # flags like VERBOSE change what the literal text is
+        if isinstance(value, re.Pattern):
+            flags = value.flags
+            value = value.pattern
+
+        if not isinstance(value, str):
+            return None
+
+        runs = []
+        try:
+            _runs(sre_parse.parse(value, flags), runs)
+        except (re.error, TypeError, ValueError):
+            return None
+
+        return runs
+
+    def candidates(self, oper, value):
+        """
+        :rtype: ``set`` of primary keys that may match or None if
+            every instance would have to be checked
+        """
+        literals = self.literals(oper, value)
+        if literals is None:
+            return None
+
+        grams = set()
+        for literal in literals:
+            grams |= trigrams(literal)
+
+        if not grams:
+            return None
+
+        postings = sorted((self._grams.get(g, set()) for g in grams), key=len)
+
+        pks = set(postings[0])
+        for p in postings[1:]:
+            if not pks:
+                break
+            pks &= p
+
+        return pks
+
+    def lookup(self, oper, value):
+        if oper not in self.operators:
+            return None
+
+        pks = self.candidates(oper, value)
+        if pks is None:
+            return None
+
+        values = self._values
+
+        if oper == 'contains':
+            return {pk for pk in pks if value in values[pk]}
+
+        if oper == 'icontains':
+            value = value.casefold()
+            return {pk for pk in pks if value in values[pk].casefold()}
+
+        if oper == 're':
+            regex = predicate._regex(value, re.UNICODE)
+        else:
+            regex = predicate._regex(value, re.UNICODE | re.IGNORECASE)
+
+        return {pk for pk in pks if regex.search(values[pk])}
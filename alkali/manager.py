@@ -1,7 +1,13 @@
 import inspect
 import copy
+import collections
+import weakref
 
 from .query import Query
+from .utils import tznow
+from .cache import ResultCache
+from .index import HashIndex, SortedIndex, FoldedIndex, DatePartIndex, \
+    TokenIndex, TrigramIndex
 from . import fields
 from . import signals
 
@@ -9,6 +15,9 @@ import logging
 logger = logging.getLogger(__name__)
 
 
+Changes = collections.namedtuple('Changes', 'inserted updated deleted')
+
+
 class Manager:
     """
     the ``Manager`` class is the parent/owner of all the
@@ -16,6 +25,9 @@ class Manager:
     manager. ``Manager`` could rightly be called ``Table``.
     """
 
+    # how many query results to remember, see :mod:`alkali.cache`
+    cache_size = 128
+
     def __init__( self, model_class ):
         """
         :param Model model_class: the model that we should store (not an instance)
@@ -23,7 +35,20 @@ class Manager:
         assert inspect.isclass(model_class)
         self._model_class = model_class
         self._instances = {}
+        self._shared = False
+        self._indexes = self._make_indexes()
+        self._derived = {} # field name, derived indexes built on demand
+        self._fk_fields = [f for f in model_class.Meta.fields.values()
+                if isinstance(f, fields.ForeignKey)]
+
+        # instance __dict__ keys of cached related instances, the
+        # ``<child>_set`` caches are added by metamodel._add_relmanagers()
+        self._caches = [f.cache_name for f in self._fk_fields]
+        self._indexing = True
+        self._version = 0
+        self._cache = ResultCache(self.cache_size)
         self._dirty = False
+        self._synced = None # weakref to the storage our changes are relative to
 
         self.clear()
 
@@ -50,6 +75,30 @@ class Manager:
         """
         return len(self)
 
+    @property
+    def version(self):
+        """
+        **property**: a number that goes up every time our instances
+        change, eg. via ``save``, ``delete``, ``clear`` or ``load``
+
+        :rtype: ``int``
+        """
+        return self._version
+
+    def cache_info(self):
+        """
+        statistics about our query result cache
+
+        :rtype: ``CacheInfo`` named tuple of hits, misses, maxsize, currsize
+        """
+        return self._cache.info()
+
+    def cache_clear(self):
+        """
+        empty our query result cache and reset its statistics
+        """
+        self._cache.clear()
+
     @property
     def _name(self):
         """
@@ -86,6 +135,236 @@ class Manager:
         if self._dirty:
             return True
 
+    @property
+    def changes(self):
+        """
+        **property**: primary keys inserted, updated and deleted since we
+        were last stored or loaded, see :func:`Manager.store`
+
+        :rtype: ``Changes`` named tuple of ``set``
+        """
+        return Changes(set(self._inserted), set(self._updated), set(self._deleted))
+
+    def _track_save(self, pk, existed):
+        """
+        remember that ``pk`` was saved, ``existed`` if it replaced an instance
+        """
+        if pk in self._inserted:
+            return
+
+        if existed or pk in self._deleted:
+            # deleted then saved again is just a change on disk
+            self._deleted.discard(pk)
+            self._updated.add(pk)
+        else:
+            self._inserted.add(pk)
+
+    def _track_delete(self, pk):
+        """
+        remember that ``pk`` was deleted
+        """
+        self._updated.discard(pk)
+
+        if pk in self._inserted:
+            # never got to disk
+            self._inserted.discard(pk)
+        else:
+            self._deleted.add(pk)
+
+    def _reset_changes(self, full=False, storage=None):
+        """
+        forget the tracked changes, ``full`` if only a full write will do.
+        from now on changes are relative to what's in ``storage``
+        """
+        self._inserted = set()
+        self._updated = set()
+        self._deleted = set()
+        self._full = full
+        self._synced = None if storage is None else weakref.ref(storage)
+
+    @property
+    def _synced_storage(self):
+        """
+        **property**: the storage we last loaded or stored, if it's still around
+        """
+        return None if self._synced is None else self._synced()
+
+    def _snapshot(self):
+        """
+        return our dict of instances without copying it, we make our own
+        copy before the next change so the caller never sees it change.
+
+        :rtype: ``dict`` of pk, model instance
+        """
+        self._shared = True
+        return self._instances
+
+    def _unshare(self):
+        """
+        called before changing our instances, copy them if somebody
+        is holding on to a snapshot
+        """
+        if self._shared:
+            self._instances = dict(self._instances)
+            self._shared = False
+
+    def _make_indexes(self):
+        """
+        create the indexes for all our fields that have ``indexed=True``,
+        ``searchable=True`` or ``trigrams=True``. ForeignKeys are always
+        indexed, it's how a foreign instance finds its children.
+
+        :rtype: ``dict`` of field name, ``list`` of :class:`alkali.index.Index`
+        """
+        indexes = {}
+        ordered = (fields.IntField, fields.FloatField, fields.DateTimeField)
+
+        for name, field in self.model_class.Meta.fields.items():
+            if field.indexed or isinstance(field, fields.ForeignKey):
+                indexes[name] = [HashIndex(field)]
+
+                if isinstance(field, ordered):
+                    indexes[name].append( SortedIndex(field) )
+
+            if field.searchable and isinstance(field, fields.StringField):
+                indexes.setdefault(name, []).append( TokenIndex(field) )
+
+            if field.trigrams and isinstance(field, fields.StringField):
+                indexes.setdefault(name, []).append( TrigramIndex(field) )
+
+        return indexes
+
+    def _rebuild_indexes(self):
+        """
+        rebuild all our indexes from scratch, much quicker than adding
+        instances one by one when loading
+        """
+        self._version += 1
+        self._derived = {}
+
+        for indexes in self._indexes.values():
+            for index in indexes:
+                index.rebuild(self._instances)
+
+    def _index(self, pk, old, new):
+        """
+        move instance with primary key ``pk`` in our indexes from
+        ``old`` instance values to ``new`` instance values, either
+        may be None
+        """
+        self._version += 1
+
+        if not self._indexing:
+            return
+
+        for all_indexes in (self._indexes, self._derived):
+            for name, indexes in all_indexes.items():
+                for index in indexes:
+                    if old is not None:
+                        index.remove(pk, old.__dict__[name])
+                    if new is not None:
+                        index.add(pk, new.__dict__[name])
+
+    def _index_many(self, changes, names=None):
+        """
+        like ``_index`` but for a whole batch of ``(pk, old, new)`` changes
+        with a single version bump, each index is visited once
+
+        :param names: only these field names changed, None for all fields
+        """
+        self._version += 1
+
+        if not self._indexing or not changes:
+            return
+
+        for all_indexes in (self._indexes, self._derived):
+            for name, indexes in all_indexes.items():
+                if names is not None and name not in names:
+                    continue
+
+                for index in indexes:
+                    index.update_many(name, changes)
+
+    def _lookup(self, field, oper, value):
+        """
+        ask our indexes for the primary keys matching ``field__oper=value``
+
+        :rtype: ``set`` of primary keys or None if no index can answer
+        """
+        return self._find(field, oper, value)[1]
+
+    def _find(self, field, oper, value):
+        """
+        like ``_lookup`` but also returns the index that answered
+
+        :rtype: ``tuple`` of (:class:`alkali.index.Index` or None,
+            ``set`` of primary keys or None)
+        """
+        for index in self._indexes.get(field, []):
+            pks = index.lookup(oper, value)
+            if pks is not None:
+                return index, pks
+
+        index = self._derived_index(field, oper)
+        if index is not None:
+            return index, index.lookup(oper, value)
+
+        return None, None
+
+    def _children(self, field, foreign):
+        """
+        the primary keys of our instances whose ForeignKey ``field``
+        points at ``foreign``
+
+        :param str field: ForeignKey field name
+        :param foreign: foreign model instance or its pk
+        :rtype: ``set`` of primary keys
+        """
+        model_field = self.model_class.Meta.fields[field]
+
+        if isinstance(foreign, model_field.foreign_model):
+            foreign = foreign.pk
+
+        if self._indexing:
+            return self._indexes[field][0].get_key(foreign)
+
+        # indexes aren't up to date while we're loading
+        return {pk for pk, elem in self._instances.items()
+                if elem.__dict__[field] == foreign}
+
+    def _derived_index(self, field, oper):
+        """
+        return the derived index that answers ``field__oper``, building
+        it the first time it's asked for
+
+        :rtype: :class:`alkali.index.Index` or None
+        """
+        if not self._indexing:
+            return None
+
+        model_field = self.model_class.Meta.fields.get(field, None)
+
+        if isinstance(model_field, fields.StringField) \
+        and oper in FoldedIndex.operators:
+            index_class = FoldedIndex
+        elif isinstance(model_field, fields.DateTimeField) \
+        and oper in DatePartIndex.operators:
+            index_class = DatePartIndex
+        else:
+            return None
+
+        indexes = self._derived.setdefault(field, [])
+
+        for index in indexes:
+            if isinstance(index, index_class):
+                return index
+
+        index = index_class(model_field)
+        index.rebuild(self._instances)
+        indexes.append(index)
+
+        return index
+
     @staticmethod
     def sorter(elements, reverse=False ):
         """
@@ -114,11 +393,20 @@ class Manager:
         assert instance.pk is not None, \
                 "{}.save(): instance '{}' has None for pk".format(self._name, instance)
 
+        old = self._instances.get(instance.pk, None)
+        self._unshare()
+
         if copy_instance:
             instance = self._instances[instance.pk] = copy.copy(instance)
         else:
             self._instances[instance.pk] = instance
 
+        # don't hold on to related instances from Query.select_related()
+        # and prefetch_related()
+        self._uncache(instance)
+
+        self._index(instance.pk, old, instance)
+
         # THINK may be mistake to send the actual object out via the signal but probably
         # what any reciever actually wants
         signals.post_save.send( self.model_class, instance=instance )
@@ -127,6 +415,234 @@ class Manager:
         # if we add a clean model instance
         if dirty:
             self._dirty = True
+            self._track_save(instance.pk, old is not None)
+
+    def _uncache(self, instance):
+        """
+        helper function that drops the related instances cached in
+        ``instance``, a stored instance would keep them alive and stale
+        """
+        d = instance.__dict__
+
+        for name in self._caches:
+            d.pop(name, None)
+
+    def _send(self, signal, **kw):
+        """
+        helper function that only builds and sends a batched signal
+        when somebody is listening
+        """
+        if signal.has_receivers_for(self.model_class):
+            signal.send(self.model_class, **kw)
+
+    def _store_many(self, instances, copy_instances=True, dirty=True):
+        """
+        helper function that puts a batch of instances in our collection,
+        replacing any with the same primary key
+
+        :rtype: ``list`` of our stored instances
+        """
+        changes = []
+        stored = []
+        self._unshare()
+
+        for instance in instances:
+            pk = instance.pk
+            old = self._instances.get(pk, None)
+
+            if copy_instances:
+                instance = copy.copy(instance)
+
+            self._instances[pk] = instance
+
+            self._uncache(instance)
+
+            changes.append( (pk, old, instance) )
+            stored.append( instance )
+
+            if dirty:
+                self._track_save(pk, old is not None)
+
+        self._index_many(changes)
+
+        if dirty and stored:
+            self._dirty = True
+
+        return stored
+
+    def bulk_create(self, instances):
+        """
+        add many new instances at once. the instances are copied like
+        :func:`Manager.save` but there is a single index update, dirty mark
+        and version change for the whole batch.
+
+        per instance ``pre_save`` and ``post_save`` signals are not sent,
+        :data:`alkali.signals.pre_bulk_save` and ``post_bulk_save`` are sent
+        with the whole list instead
+
+        :param instances: iterable of :class:`alkali.model.Model` instances
+        :raises EmptyPrimaryKey: if an instance has None for its pk
+        :raises KeyError: if a primary key already exists or is repeated,
+            nothing is saved
+        :rtype: ``list`` of the saved instances
+
+        ::
+
+            MyModel.objects.bulk_create( MyModel(id=i) for i in range(1000) )
+        """
+        instances = list(instances)
+        seen = set()
+
+        for instance in instances:
+            pk = instance.pk
+
+            if pk is None:
+                raise self.model_class.EmptyPrimaryKey()
+
+            if pk in self._instances or pk in seen:
+                raise KeyError( '{}.bulk_create(): pk already exists: {}'.format(
+                    self._name, str(pk)) )
+
+            seen.add(pk)
+
+        self._send(signals.pre_bulk_save, instances=instances)
+        stored = self._store_many(instances)
+        self._send(signals.post_bulk_save, instances=stored)
+
+        return instances
+
+    def bulk_update(self, instances, fields=None):
+        """
+        replace many existing instances at once, see :func:`Manager.bulk_create`
+
+        :param instances: iterable of :class:`alkali.model.Model` instances
+        :param fields: only copy these field names from the given instances,
+            any ``auto_now`` fields are also updated. None copies everything.
+        :raises KeyError: if an instance doesn't exist, nothing is updated
+        :raises AttributeError: unknown or primary key field name
+        :rtype: ``int`` number of updated instances
+
+        ::
+
+            for m in instances:
+                m.size = 0
+            MyModel.objects.bulk_update(instances, fields=['size'])
+        """
+        instances = list(instances)
+
+        for instance in instances:
+            if instance.pk not in self._instances:
+                raise KeyError( '{}.bulk_update(): no such pk: {}'.format(
+                    self._name, str(instance.pk)) )
+
+        if fields is None:
+            self._send(signals.pre_bulk_save, instances=instances)
+            stored = self._store_many(instances)
+            self._send(signals.post_bulk_save, instances=stored)
+            return len(stored)
+
+        names = self._updatable(fields)
+        updates = [(instance.pk, {name: instance.__dict__[name] for name in names})
+                for instance in instances]
+
+        return len(self._update_many(updates, names))
+
+    def _updatable(self, names):
+        """
+        helper function that checks the field names given to an update
+
+        :raises AttributeError: unknown or primary key field name
+        :rtype: ``set`` of field names
+        """
+        meta = self.model_class.Meta
+        names = set(names)
+
+        for name in names:
+            if name not in meta.fields or name in meta.pk_fields:
+                raise AttributeError( '{}: can not update field: {}'.format(
+                    self._name, name) )
+
+        return names
+
+    def _update_many(self, updates, names):
+        """
+        helper function that sets already cast field values on copies of
+        our stored instances, any ``auto_now`` fields are set to now.
+        indexes are only updated for the changed fields.
+
+        :param updates: ``list`` of (pk, ``dict`` of field name, value)
+        :param names: ``set`` of all the field names being updated
+        :rtype: ``list`` of our new stored instances
+        """
+        now = tznow()
+        auto = {name for name, field in self.model_class.Meta.fields.items()
+                if field.auto_now and name not in names}
+
+        stored = []
+
+        for pk, values in updates:
+            new = copy.copy(self._instances[pk])
+            new.__dict__.update(values)
+            new.__dict__.update( (name, now) for name in auto )
+
+            self._uncache(new)
+
+            stored.append( new )
+
+        self._send(signals.pre_bulk_save, instances=stored)
+
+        changes = []
+        self._unshare()
+
+        for new in stored:
+            pk = new.pk
+            changes.append( (pk, self._instances[pk], new) )
+            self._instances[pk] = new
+            self._track_save(pk, True)
+
+        self._index_many(changes, names | auto)
+
+        if stored:
+            self._dirty = True
+
+        self._send(signals.post_bulk_save, instances=stored)
+        return stored
+
+    def bulk_delete(self, pks):
+        """
+        remove many instances at once by primary key, unknown primary
+        keys are ignored. see :func:`Manager.bulk_create` for signals.
+
+        :param pks: iterable of primary keys
+        :rtype: ``int`` number of deleted instances
+        """
+        found = []
+        seen = set()
+
+        for pk in pks:
+            if pk in self._instances and pk not in seen:
+                seen.add(pk)
+                found.append( self._instances[pk] )
+
+        if not found:
+            return 0
+
+        self._send(signals.pre_bulk_delete, instances=found)
+
+        self._unshare()
+        changes = []
+
+        for old in found:
+            pk = old.pk
+            del self._instances[pk]
+            changes.append( (pk, old, None) )
+            self._track_delete(pk)
+
+        self._index_many(changes)
+        self._dirty = True
+
+        self._send(signals.post_bulk_delete, instances=found)
+        return len(found)
 
     def clear(self):
         """
@@ -139,7 +655,15 @@ class Manager:
         logger.debug( "%s: clearing all models", self._name )
 
         self._dirty = len(self) > 0
+        self._reset_changes(full=self._dirty, storage=self._synced_storage)
         self._instances = {}
+        self._shared = False
+        self._version += 1
+        self._derived = {}
+
+        for indexes in self._indexes.values():
+            for index in indexes:
+                index.clear()
 
     def delete(self, instance):
         """
@@ -152,13 +676,17 @@ class Manager:
 
         signals.pre_delete.send(self.model_class, instance=instance)
 
-        try:
-            del self._instances[ instance.pk ]
-            self._dirty = True
+        if instance.pk not in self._instances:
+            return
 
-            signals.post_delete.send(self.model_class, instance=instance)
-        except KeyError:
-            pass
+        self._unshare()
+
+        old = self._instances.pop( instance.pk )
+        self._index(instance.pk, old, None)
+        self._dirty = True
+        self._track_delete(instance.pk)
+
+        signals.post_delete.send(self.model_class, instance=instance)
 
     def cb_delete_foreign(self, sender, instance ):
         """
@@ -171,14 +699,46 @@ class Manager:
         for elem in getattr(instance, fk_set).all():
             self.delete(elem)
 
+    def cb_bulk_delete_foreign(self, sender, instances):
+        """
+        called when a batch of our foreign parents is about to be deleted
+        """
+        pks = set()
+
+        for field in self._fk_fields:
+            if field.foreign_model is not sender:
+                continue
+
+            for instance in instances:
+                pks.update( self._children(field.name, instance.pk) )
+
+        self.bulk_delete(pks)
+
     def cb_create_foreign(self, sender, instance ):
         """
         called when our foreign parent (likely OneToOneField) is created
         """
         # keep in sync with metamodel._add_relmanagers()
         elem = self.model_class(pk=instance)
+        created = elem.pk not in self._instances
         self.save(elem, dirty=False, copy_instance=False)
 
+        # not dirty but a storage that only writes changes still needs it
+        if created:
+            self._track_save(elem.pk, False)
+
+    def cb_bulk_create_foreign(self, sender, instances):
+        """
+        called when a batch of our foreign parents (likely OneToOneField)
+        is created
+        """
+        elems = [self.model_class(pk=instance) for instance in instances]
+        created = [e.pk for e in elems if e.pk not in self._instances]
+        self._store_many(elems, copy_instances=False, dirty=False)
+
+        for pk in created:
+            self._track_save(pk, False)
+
     def store(self, storage, force=False):
         """
         save all our instances to storage
@@ -199,16 +759,40 @@ class Manager:
             logger.debug( "%s: has dirty records, saving", self._name )
             logger.debug( "%s: storing models via storage class: %s", self._name, storage._name )
 
-            gen = Manager.sorter(self._instances)
-            storage.write(self.model_class, gen)
+            # our changes only make sense to the storage we loaded or stored
+            delta = not force and not self._full and storage is self._synced_storage
+
+            if not delta or not self._write_delta(storage):
+                gen = Manager.sorter(self._instances)
+                storage.write(self.model_class, gen)
+                logger.debug( "%s: finished storing %d records", self._name, len(self) )
 
-            logger.debug( "%s: finished storing %d records", self._name, len(self) )
+            self._reset_changes(storage=storage)
             signals.post_store.send(self.model_class)
         else:
             logger.debug( "%s: has no dirty records, not saving", self._name )
 
         self._dirty = False
 
+    def _write_delta(self, storage):
+        """
+        helper function that offers our tracked changes to ``storage``
+
+        :rtype: ``bool`` True if the storage wrote them
+        """
+        instances = self._instances
+
+        inserted = Manager.sorter({pk: instances[pk] for pk in self._inserted})
+        updated = Manager.sorter({pk: instances[pk] for pk in self._updated})
+        deleted = sorted(self._deleted)
+
+        if not storage.write_delta(self.model_class, inserted, updated, deleted):
+            return False
+
+        logger.debug( "%s: stored changes, %d inserted, %d updated, %d deleted",
+                self._name, len(self._inserted), len(self._updated), len(deleted) )
+        return True
+
     def load(self, storage):
         """
         load all our instances from storage
@@ -248,29 +832,58 @@ class Manager:
         dirty = False
         fk_fields = self.model_class.Meta.field_filter(fields.ForeignKey)
 
-        for elem in storage.read( self.model_class ):
-            if isinstance(elem, dict):
-                elem = self.model_class( **elem )
+        # indexes are built in one go after all instances are loaded
+        self._indexing = False
 
-            if not validate_fk_fields(fk_fields, elem):
-                logger.debug("failed to validate_fk_fields")
-                dirty = True
-                continue
+        try:
+            for elem in storage.read( self.model_class ):
+                if isinstance(elem, dict):
+                    elem = self.model_class( **elem )
 
-            if elem.pk in self._instances: # THINK
-                raise KeyError( '%s: pk collision detected during load: %s'
-                        % (self.model_class.__name__, str(elem.pk)) )
+                if not validate_fk_fields(fk_fields, elem):
+                    logger.debug("failed to validate_fk_fields")
+                    dirty = True
+                    continue
 
-            if elem.pk is None:
-                raise self.model_class.EmptyPrimaryKey()
+                if elem.pk in self._instances: # THINK
+                    raise KeyError( '%s: pk collision detected during load: %s'
+                            % (self.model_class.__name__, str(elem.pk)) )
 
-            self.save(elem, dirty=False, copy_instance=False)
+                if elem.pk is None:
+                    raise self.model_class.EmptyPrimaryKey()
+
+                self.save(elem, dirty=False, copy_instance=False)
+        finally:
+            self._indexing = True
+            self._rebuild_indexes()
 
         self._dirty = dirty
+        self._reset_changes(full=dirty, storage=storage)
 
         logger.debug( "%s: finished loading %d records", self._name, len(self) )
         signals.post_load.send(self.model_class)
 
+    def tail(self, storage):
+        """
+        add the instances appended to storage since we last read it,
+        instances with a primary key we already have replace ours.
+        see :func:`alkali.storage.JSONLinesStorage.tail`
+
+        :param Storage storage: an instance that has a ``tail`` method
+        :rtype: ``int`` number of instances read
+        """
+        count = 0
+
+        for elem in storage.tail(self.model_class):
+            if isinstance(elem, dict):
+                elem = self.model_class( **elem )
+
+            self.save(elem, dirty=False, copy_instance=False)
+            count += 1
+
+        logger.debug( "%s: read %d appended records", self._name, count )
+        return count
+
     def get(self, *pk, **kw):
         """
         perform a query that returns a single instance of a model
@@ -279,26 +892,54 @@ class Manager:
         :type pk: value or ``tuple`` if multi-pk
         :param kw: optional ``field_name=value``
         :rtype: single :class:`alkali.model.Model` instance
+        :raises KeyError: if the given primary key doesn't exist
         :raises DoesNotExist: if 0 instances returned
         :raises MultipleObjectsReturned: if more than 1 instance returned
 
+        a primary key, or all the primary key fields by name, is a direct
+        lookup instead of a query
+
         ::
 
             m = MyModel.objects.get(1)      # equiv to
             m = MyModel.objects.get(pk=1)
 
+            m = MyMulti.objects.get((1, 2)) # equiv to
+            m = MyMulti.objects.get(pk1=1, pk2=2)
+
             m = MyModel.objects.get(some_field='a unique value')
             m = MyModel.objects.get(field1='a unique', field2='value')
         """
-        # FIXME need to support direct access multi pk models
+        pk_fields = self.model_class.Meta.pk_fields
 
         if len(pk) == 0 and list(kw.keys()) == ['pk']:
             pk = list(kw.values())
 
         # NOTE without this, direct access ForeignKeys are 100x slower
-        if len(pk) == 1:
-            pk = self.model_class.Meta.pk_fields.values()[0].cast(pk[0])
-            return copy.copy( self._instances[pk] )
+        if pk:
+            # get((1, 2)) or get(1, 2) for compound primary keys
+            if len(pk) == 1 and len(pk_fields) > 1 and isinstance(pk[0], tuple):
+                pk = pk[0]
+
+            if len(pk) != len(pk_fields):
+                raise KeyError( "{}.get(): expected {} primary key values, got: {}".format(
+                    self._name, len(pk_fields), str(pk)) )
+
+            return copy.copy( self._instances[self._pk_key(pk)] )
+
+        # all the primary key fields by name, in any order
+        if kw and kw.keys() == pk_fields._keys():
+            try:
+                key = self._pk_key([kw[name] for name in pk_fields._keys()])
+            except (TypeError, ValueError): # can't cast, let the query decide
+                key = None
+
+            if key is not None:
+                try:
+                    return copy.copy( self._instances[key] )
+                except KeyError:
+                    raise self.model_class.DoesNotExist("{}: no results for: {}".format(
+                        self.model_class.__name__, str(kw)) )
 
         results = Query(self).filter(**kw)
 
@@ -312,10 +953,38 @@ class Manager:
 
         return results[0]
 
+    def _pk_key(self, values):
+        """
+        helper function that casts primary key values, in primary key
+        field order, into the key of our instances
+
+        :rtype: value or ``tuple`` if multi-pk
+        """
+        key = tuple(field.cast(value)
+                for field, value in zip(self.model_class.Meta.pk_fields.values(), values))
+
+        if len(key) == 1:
+            return key[0]
+
+        return key
+
     def get_or_create(self, **kw):
+        """
+        return the instance matching ``kw`` or create and save a new one,
+        a full set of primary key fields is looked up directly
+
+        :param kw: ``field_name=value``
+        :rtype: single :class:`alkali.model.Model` instance
+        """
+        pk_fields = self.model_class.Meta.pk_fields
+
+        # a compound pk=(a, b) is passed on as field names
+        if 'pk' in kw and len(pk_fields) > 1 and isinstance(kw['pk'], tuple):
+            kw.update( zip(pk_fields.keys(), kw.pop('pk')) )
+
         try:
             return self.get(**kw)
-        except self.model_class.DoesNotExist:
+        except (self.model_class.DoesNotExist, KeyError):
             pass
 
         return self.model_class(**kw).save()
@@ -1,6 +1,6 @@
 from collections import OrderedDict
 
-from .relmanager import RelManager
+from .relmanager import RelDescriptor
 from .fields import Field, ForeignKey, OneToOneField
 from .utils import tznow
 from . import signals
@@ -18,6 +18,16 @@ from . import signals
 # it's exact Model instance, only it's parent Model class.
 
 
+def _foreign(dumps, value):
+    """
+    helper function for serializers, dumps the stored pk of a ForeignKey
+    """
+    if value is None:
+        raise RuntimeError("ForeignKey value is not a Model")
+
+    return dumps(value)
+
+
 # from: http://stackoverflow.com/questions/12006267/how-do-django-models-work
 # from: lib/python2.7/site-packages/django/db/models/base.py
 #
@@ -62,6 +72,7 @@ class MetaModel(type):
         new_class = super_new(meta_class, name, bases, {})
         new_class._add_meta( attrs )
         new_class._add_fields()
+        new_class._add_serializer()
         new_class._add_manager()
         new_class._add_relmanagers()
         new_class._add_exceptions()
@@ -75,6 +86,38 @@ class MetaModel(type):
 
         return new_class
 
+    def _add_serializer( new_class ):
+        """
+        compile ``Meta.serializer(instance)``, it returns the json
+        consumable ``dict`` of an instance straight from its ``__dict__``,
+        only fields that need it go through ``Field.dumps``
+        """
+        namespace = {}
+        items = []
+
+        for i, (name, field) in enumerate(new_class.Meta.fields.items()):
+            value = 'd[{!r}]'.format(name)
+
+            if isinstance(field, ForeignKey):
+                # the stored value is already the foreign pk
+                namespace['dumps_%d' % i] = field.pk_field.dumps
+                value = '_foreign(dumps_{}, {})'.format(i, value)
+            elif type(field).dumps is not Field.dumps:
+                namespace['dumps_%d' % i] = field.dumps
+                value = 'dumps_{}({})'.format(i, value)
+
+            items.append( '{!r}: {}'.format(name, value) )
+
+        source = "\n".join([
+            "def serializer(e):",
+            "    d = e.__dict__",
+            "    return {{{}}}".format(', '.join(items)),
+            ])
+
+        namespace['_foreign'] = _foreign
+        exec(source, namespace)
+        new_class.Meta.serializer = namespace['serializer']
+
     def _add_manager( new_class ):
         from .manager import Manager
         setattr( new_class, 'objects', Manager(new_class) )
@@ -88,23 +131,28 @@ class MetaModel(type):
             if not isinstance(field, ForeignKey):
                 continue
 
-            # note the name=name in the lambda, this is vital to capture
-            # the current value of name and not the last of the loop
-            # more info: http://stackoverflow.com/questions/2295290
-            rel_manager = property(
-                    lambda fm_instance, name=name: RelManager(fm_instance, new_class, name)
-                    )
             set_name = "{}_set".format(new_class.__name__).lower()
+            rel_manager = RelDescriptor(new_class, name, set_name)
             setattr( field.foreign_model, set_name, rel_manager )
 
+            caches = field.foreign_model.objects._caches
+            if rel_manager.cache_name not in caches:
+                caches.append( rel_manager.cache_name )
+
             signals.pre_delete.connect(
                     new_class.objects.cb_delete_foreign,
                     sender=field.foreign_model)
+            signals.pre_bulk_delete.connect(
+                    new_class.objects.cb_bulk_delete_foreign,
+                    sender=field.foreign_model)
 
             if isinstance(field, OneToOneField):
                 signals.post_save.connect(
                     new_class.objects.cb_create_foreign,
                     sender=field.foreign_model)
+                signals.post_bulk_save.connect(
+                    new_class.objects.cb_bulk_create_foreign,
+                    sender=field.foreign_model)
 
     def _add_exceptions( new_class ):
         from .model import ObjectDoesNotExist
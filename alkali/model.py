@@ -1,4 +1,3 @@
-from collections import OrderedDict
 from collections.abc import Iterable
 import json
 
@@ -149,10 +148,9 @@ class Model(metaclass=MetaModel):
         **property**: returns a dict of all the fields, the fields are
         json consumable
 
-        :rtype: ``OrderedDict``
+        :rtype: ``dict`` in field order
         """
-        return OrderedDict( [(name, field.dumps(getattr(self, name)))
-                for name, field in self.Meta.fields.items() ])
+        return self.Meta.serializer(self)
 
     @property
     def json(self):
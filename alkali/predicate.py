@@ -0,0 +1,463 @@
+"""
+turns the conditions of a :func:`alkali.query.Query.filter` into a single
+python function that decides if a model instance passes all of them.
+the sort key for :func:`alkali.query.Query.order_by` is built the same way.
+
+conditions can also be trees of ``and``, ``or`` and ``not``, eg. built with
+:class:`alkali.query.Q`, which compile into python's short circuiting
+boolean operators.
+
+the generated code is cached by the *shape* of the conditions (the field
+names and operators) so queries that only differ by their values share
+the same compiled function.
+
+::
+
+    pred = compile_filter(MyModel, [('int_type', 'gt', 5), ('str_type', 'eq', 'foo')])
+
+    # pred is roughly equivalent to
+    def pred(e):
+        d = e.__dict__
+        return d['int_type'] > 5 and d['str_type'] == 'foo'
+"""
+
+import collections.abc
+import functools
+import operator
+import re
+
+from . import fields
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+def in_(coll, val):
+    if not isinstance(coll, str) \
+    and isinstance(coll, collections.abc.Iterable):
+        return bool( set(coll) & set(val) ) # intersection
+    else:
+        return coll in val
+
+def rin_(coll, val):
+    if not isinstance(val, str) \
+    and isinstance(val, collections.abc.Iterable):
+        return bool( set(coll) & set(val) ) # intersection
+    else:
+        return val in coll
+
+
+# python expressions for each operator, {a} is replaced by the code that
+# gets the instance value and {v} by the variable holding the query value
+OPERATORS = {
+    'eq':  '{a} == {v}',
+    'ne':  '{a} != {v}',
+    'lt':  '{a} < {v}',
+    'le':  '{a} <= {v}',
+    'gt':  '{a} > {v}',
+    'ge':  '{a} >= {v}',
+    'in':  'in_({a}, {v})',
+    'rin': 'rin_({a}, {v})',
+    're':  '({a} is not None and {v}.search({a}))',
+    'rei': '({a} is not None and {v}.search({a}))',
+
+    'exact':       '{a} == {v}',
+    'iexact':      '({a} is not None and _fold({a}) == {v})',
+    'contains':    '({a} is not None and {v} in {a})',
+    'icontains':   '({a} is not None and {v} in _fold({a}))',
+    'startswith':  '({a} is not None and {a}.startswith({v}))',
+    'istartswith': '({a} is not None and _fold({a}).startswith({v}))',
+    'endswith':    '({a} is not None and {a}.endswith({v}))',
+    'iendswith':   '({a} is not None and _fold({a}).endswith({v}))',
+    'range':       '({v}[0] <= {a} <= {v}[1])',
+
+    'date':     '({a} is not None and {a}.date() == {v})',
+    'year':     '({a} is not None and {a}.year == {v})',
+    'month':    '({a} is not None and {a}.month == {v})',
+    'day':      '({a} is not None and {a}.day == {v})',
+    'hour':     '({a} is not None and {a}.hour == {v})',
+    'minute':   '({a} is not None and {a}.minute == {v})',
+    'second':   '({a} is not None and {a}.second == {v})',
+    'week_day': '({a} is not None and week_day({a}) == {v})',
+
+    'search':   'search_({a}, {v})',
+}
+
+# operators whose query value is compared casefolded
+FOLDED = ('iexact', 'icontains', 'istartswith', 'iendswith')
+
+# operators that compare part of a datetime
+DATE_PARTS = ('date', 'year', 'month', 'day', 'hour', 'minute', 'second', 'week_day')
+
+
+def _fold(value):
+    return value.casefold() if value is not None else ''
+
+
+def week_day(value):
+    """
+    :param datetime value:
+    :rtype: day of the week, sunday is 1 and saturday is 7
+    """
+    return value.isoweekday() % 7 + 1
+
+
+_token_re = re.compile(r'\w+', re.UNICODE)
+
+def tokenize(value):
+    """
+    :param str value: text to break into words
+    :rtype: ``list`` of casefolded words
+    """
+    return _token_re.findall(value.casefold())
+
+
+def parse_search(text):
+    """
+    break a search into terms, terms separated by whitespace must all
+    match, ``OR`` separates alternatives and a trailing ``*`` matches
+    any word starting with the term
+
+    ::
+
+        parse_search('python OR rust* web')
+        # ((('python', False),), (('rust', True), ('web', False)))
+
+    :rtype: ``tuple`` of alternatives, each a ``tuple`` of (word, prefix)
+    """
+    alternatives = []
+    terms = []
+
+    for term in text.split():
+        if term == 'OR':
+            alternatives.append( tuple(terms) )
+            terms = []
+            continue
+
+        prefix = term.endswith('*')
+        words = tokenize(term)
+
+        for i, word in enumerate(words):
+            terms.append( (word, prefix and i == len(words) - 1) )
+
+    alternatives.append( tuple(terms) )
+    return tuple(alt for alt in alternatives if alt)
+
+
+def search_(value, search):
+    """
+    scan version of a ``search`` lookup, see :class:`alkali.index.TokenIndex`
+
+    :param search: parsed search, see ``parse_search``
+    """
+    if not isinstance(value, str):
+        return False
+
+    words = set(tokenize(value))
+
+    def _match(word, prefix):
+        if not prefix:
+            return word in words
+        return any(w.startswith(word) for w in words)
+
+    return any(
+        all(_match(word, prefix) for word, prefix in terms)
+        for terms in search
+        )
+
+
+def date_part(value, part):
+    """
+    :param datetime value:
+    :param str part: one of ``DATE_PARTS``
+    :rtype: the given part of ``value``
+    """
+    if part == 'date':
+        return value.date()
+    if part == 'week_day':
+        return week_day(value)
+    return getattr(value, part)
+
+@functools.total_ordering
+class Descending:
+    """
+    wraps a sort key value so that it sorts in reverse order, used
+    when sort fields are in mixed directions
+    """
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+    def __lt__(self, other):
+        return other.value < self.value
+
+
+# names available to the generated code
+_helpers = {
+    'in_': in_,
+    'rin_': rin_,
+    'operator': operator,
+    'Descending': Descending,
+    '_fold': _fold,
+    'week_day': week_day,
+    'search_': search_,
+}
+
+# fields whose values are never a collection, so membership is a
+# simple set lookup
+_scalar_fields = (
+    fields.IntField, fields.FloatField, fields.StringField,
+    fields.BoolField, fields.DateTimeField, fields.UUIDField,
+)
+
+
+def check(oper, value):
+    """
+    make sure ``oper`` is a known operator, called when a filter is
+    created so mistakes are caught before the query is executed
+
+    :raises AttributeError: unknown operator
+    :raises AssertionError: bad value for operator
+    """
+    if oper == 'in':
+        assert isinstance(value, collections.abc.Iterable)
+    elif oper == 'range':
+        assert isinstance(value, (list, tuple)) and len(value) == 2
+    elif oper == 'search':
+        assert isinstance(value, str)
+    elif oper not in OPERATORS:
+        getattr(operator, oper)
+
+
+def _regex(value, flags):
+    if isinstance(value, re.Pattern):
+        return value
+    return re.compile(value, flags)
+
+
+def _accessor(model_class, field, raw=False):
+    """
+    :param raw: use the stored value of a ForeignKey, not the foreign instance
+    :rtype: python expression that gets ``field`` from instance ``e``
+        whose ``__dict__`` is ``d``
+    """
+    meta = model_class.Meta
+
+    if field == 'pk':
+        names = meta.pk_fields.keys()
+        if len(names) == 1:
+            return 'd[{!r}]'.format(names[0])
+        return '({},)'.format(', '.join(['d[{!r}]'.format(n) for n in names]))
+
+    if field in meta.fields:
+        if raw or not isinstance(meta.fields[field], fields.ForeignKey):
+            return 'd[{!r}]'.format(field)
+
+    # property, annotation or ForeignKey, let the descriptor do its thing
+    return 'getattr(e, {!r})'.format(field)
+
+
+def prepare(model_class, field, oper, value):
+    """
+    work out how to evaluate ``field__oper=value``
+
+    :rtype: ``tuple`` of (accessor, expression, value) where accessor and
+        expression are strings that make up the shape of the condition
+    """
+    accessor = _accessor(model_class, field)
+    expression = OPERATORS.get(oper, 'operator.' + oper + '({a}, {v})')
+    model_field = model_class.Meta.fields.get(field, None)
+
+    if isinstance(model_field, fields.ForeignKey):
+        # compare the stored foreign pk instead of looking up the instance
+        foreign_model = model_field.foreign_model
+
+        if oper in ('eq', 'ne') and isinstance(value, foreign_model):
+            accessor = 'd[{!r}]'.format(field)
+            value = value.pk
+        elif oper == 'in' and not isinstance(value, str) \
+        and all(isinstance(v, foreign_model) for v in value):
+            accessor = 'd[{!r}]'.format(field)
+            expression = '{a} in {v}'
+            value = frozenset(v.pk for v in value)
+
+    elif oper == 'in' and isinstance(model_field, _scalar_fields) \
+    and not isinstance(value, str):
+        try:
+            value = frozenset(value)
+            expression = '{a} in {v}'
+        except TypeError: # unhashable, stay with in_
+            pass
+
+    elif oper == 're':
+        value = _regex(value, re.UNICODE)
+
+    elif oper == 'rei':
+        value = _regex(value, re.UNICODE | re.IGNORECASE)
+
+    elif oper in FOLDED:
+        value = _fold(value)
+
+    elif oper == 'search':
+        value = parse_search(value)
+
+    return accessor, expression, value
+
+
+def _expression(shape, args):
+    """
+    helper function that turns a shape into a python expression,
+    appending the names of the value variables it uses to ``args``
+
+    :param shape: (accessor, expression) for a single condition or
+        (connector, negated, shapes) for a tree of conditions
+    """
+    if len(shape) == 2:
+        accessor, expression = shape
+        arg = 'v{}'.format(len(args))
+        args.append(arg)
+        return '(' + expression.format(a=accessor, v=arg) + ')'
+
+    connector, negated, children = shape
+    terms = [_expression(child, args) for child in children]
+
+    if terms:
+        expression = '(' + ' {} '.format(connector).join(terms) + ')'
+    else:
+        expression = 'True' if connector == 'and' else 'False'
+
+    if negated:
+        expression = '(not ' + expression + ')'
+
+    return expression
+
+
+@functools.lru_cache(maxsize=512)
+def _factory(shape):
+    """
+    compile a function that takes the query values and returns the
+    predicate for the given shape
+
+    :param shape: ``tuple`` of shapes that must all pass, see ``_expression``
+    """
+    args = []
+    terms = [_expression(s, args) for s in shape]
+
+    source = "\n".join([
+        "def factory({}):".format(', '.join(args)),
+        "    def predicate(e):",
+        "        d = e.__dict__",
+        "        return {}".format(' and '.join(terms) or 'True'),
+        "    return predicate",
+    ])
+
+    namespace = dict(_helpers)
+    exec(source, namespace)
+    return namespace['factory']
+
+
+def _shape(model_class, condition, values):
+    """
+    helper function that returns the shape of a condition and appends
+    its values to ``values``, in the same order ``_expression`` uses them
+    """
+    if isinstance(condition, tuple):
+        accessor, expression, value = prepare(model_class, *condition)
+        values.append( value )
+        return (accessor, expression)
+
+    children = tuple(_shape(model_class, c, values) for c in condition.children)
+    return (condition.connector, condition.negated, children)
+
+
+def compile_filter(model_class, conditions):
+    """
+    :param model_class: the model being queried
+    :param conditions: ``list`` of (field, oper, value) or trees of them,
+        a tree has ``connector`` ('and' or 'or'), ``negated`` and ``children``
+        attributes, eg. :class:`alkali.query.Q`
+    :rtype: function that takes a model instance and returns True if
+        it passes all ``conditions``
+    """
+    values = []
+    shape = tuple(_shape(model_class, c, values) for c in conditions)
+
+    return _factory(shape)(*values)
+
+
+@functools.lru_cache(maxsize=512)
+def _key_factory(shape):
+    """
+    compile a sort key function for the given shape
+
+    :param shape: ``tuple`` of (accessor, wrap in Descending)
+    """
+    terms = []
+
+    for accessor, descending in shape:
+        if descending:
+            accessor = 'Descending({})'.format(accessor)
+        terms.append(accessor)
+
+    source = "\n".join([
+        "def key(e):",
+        "    d = e.__dict__",
+        "    return ({},)".format(', '.join(terms)),
+    ])
+
+    namespace = dict(_helpers)
+    exec(source, namespace)
+    return namespace['key']
+
+
+def compile_key(model_class, ordering, ascending=False):
+    """
+    build a single composite sort key, the first field is the most
+    significant. ForeignKeys sort by their foreign pk.
+
+    :param model_class: the model being sorted
+    :param ordering: ``list`` of (field, reverse)
+    :param ascending: always wrap descending fields so the key can be
+        used with ``bisect``, ``reverse`` is then always False
+    :rtype: ``tuple`` of (key function, reverse) suitable for ``sorted``
+    """
+    # use reverse=True when everything is descending, otherwise only
+    # wrap the descending fields
+    reverse = not ascending and bool(ordering) and all(desc for _, desc in ordering)
+
+    shape = tuple(
+        (_accessor(model_class, field, raw=True), desc and not reverse)
+        for field, desc in ordering
+        )
+
+    return _key_factory(shape), reverse
+
+
+@functools.lru_cache(maxsize=512)
+def _getter_factory(accessor):
+    """
+    compile a function that returns the value of ``accessor``
+    """
+    source = "\n".join([
+        "def getter(e):",
+        "    d = e.__dict__",
+        "    return {}".format(accessor),
+    ])
+
+    namespace = dict(_helpers)
+    exec(source, namespace)
+    return namespace['getter']
+
+
+def compile_getter(model_class, field, raw=False):
+    """
+    :param model_class: the model being queried
+    :param str field: field, property or annotation name
+    :param raw: return the stored value of a ForeignKey, not the foreign instance
+    :rtype: function that takes a model instance and returns its ``field`` value
+    """
+    return _getter_factory(_accessor(model_class, field, raw))
@@ -27,15 +27,39 @@ import types
 import operator
 import collections
 import copy
-import re
+import heapq
+import math
+import bisect
+import base64
+import json
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from . import fields
+from . import predicate
 
 import logging
 logger = logging.getLogger(__name__)
 
+# numpy dtypes of the fields that can be aggregated as arrays
+_dtypes = {
+    fields.IntField: 'int64',
+    fields.FloatField: 'float64',
+}
+
 
 class Aggregate:
     """
     A reducing function that returns a single value
+
+    derived classes implement ``reduce`` which is handed the field values,
+    or override ``__call__`` to work on the whole query
+
+    when NumPy is installed the values of an ``IntField`` or ``FloatField``
+    are handed to ``reduce`` as a ``numpy.ndarray``, otherwise as a ``list``
     """
     def __init__(self, field):
         """
@@ -43,6 +67,12 @@ class Aggregate:
         """
         self.field = field
 
+    def __call__(self, query):
+        return self.reduce( _column(query.model_class, self.field, query._instances()) )
+
+    def reduce(self, values):
+        raise NotImplementedError()
+
 class Count(Aggregate):
     """
     number of objects in query
@@ -50,26 +80,381 @@ class Count(Aggregate):
     def __call__(self, query):
         return len( query )
 
+    def reduce(self, values):
+        return len( values )
+
 class Sum(Aggregate):
     """
     sum of given field (numeric field required)
     """
-    def __call__(self, query):
-        return sum( query.values_list(self.field, flat=True) )
+    def reduce(self, values):
+        if _is_array(values):
+            # int64 sums wrap around silently, python ints don't
+            if values.dtype.kind == 'i' and len(values):
+                largest = max(-int(values.min()), int(values.max()))
+                if largest * len(values) >= 2**63:
+                    return sum( values.tolist() )
+
+            return values.sum().item()
+        return sum( values )
 
 class Max(Aggregate):
     """
     largest field (numeric field required)
     """
-    def __call__(self, query):
-        return max( query.values_list(self.field, flat=True) )
+    def reduce(self, values):
+        if _is_array(values):
+            return values.max().item()
+        return max( values )
 
 class Min(Aggregate):
     """
     smallest field (numeric field required)
     """
-    def __call__(self, query):
-        return min( query.values_list(self.field, flat=True) )
+    def reduce(self, values):
+        if _is_array(values):
+            return values.min().item()
+        return min( values )
+
+class Avg(Aggregate):
+    """
+    mean of given field (numeric field required), None if there
+    are no values
+    """
+    def reduce(self, values):
+        if not len(values):
+            return None
+        if _is_array(values):
+            return values.mean().item()
+        return sum( values ) / len( values )
+
+class Variance(Aggregate):
+    """
+    variance of given field (numeric field required), None if there
+    are no values (or only one for a sample variance)
+    """
+    def __init__(self, field, sample=False):
+        """
+        :param field str:
+        :param sample: sample variance instead of population variance
+        """
+        super().__init__(field)
+        self.sample = sample
+
+    def reduce(self, values):
+        ddof = 1 if self.sample else 0
+
+        if len(values) <= ddof:
+            return None
+        if _is_array(values):
+            return values.var(ddof=ddof).item()
+
+        mean = sum( values ) / len( values )
+        return sum( (v - mean) ** 2 for v in values ) / (len( values ) - ddof)
+
+class StdDev(Variance):
+    """
+    standard deviation of given field (numeric field required), None if
+    there are no values (or only one for a sample standard deviation)
+    """
+    def reduce(self, values):
+        if _is_array(values) and len(values) > (1 if self.sample else 0):
+            return values.std(ddof=1 if self.sample else 0).item()
+
+        variance = super().reduce(values)
+        return math.sqrt(variance) if variance is not None else None
+
+
+def _is_array(values):
+    return numpy is not None and isinstance(values, numpy.ndarray)
+
+
+def _column(model_class, field, instances):
+    """
+    helper function that extracts the values of ``field`` from instances,
+    numeric fields become a ``numpy.ndarray`` when NumPy is available
+
+    :rtype: ``list`` or ``numpy.ndarray``
+    """
+    getter = predicate.compile_getter(model_class, field)
+    values = [getter(e) for e in instances]
+
+    if numpy is None:
+        return values
+
+    model_field = model_class.Meta.fields.get(field, None)
+    dtype = _dtypes.get(type(model_field), None)
+
+    if dtype is None:
+        return values
+
+    try:
+        return numpy.fromiter(values, dtype=dtype, count=len(values))
+    except (TypeError, ValueError, OverflowError): # eg. None or a huge int
+        return values
+
+
+def _aggregates(args, kw):
+    """
+    helper function that names the given aggregates
+
+    :rtype: ``list`` of (key, Aggregate)
+    """
+    aggregates = []
+
+    for agg in args:
+        key = '{}__{}'.format(agg.field, agg.__class__.__name__.lower())
+        aggregates.append( (key, agg) )
+
+    aggregates.extend( kw.items() )
+    return aggregates
+
+
+def _reduce(query, aggregates, instances):
+    """
+    helper function that runs aggregates over the given instances,
+    field values are only extracted once per field and shared by
+    every aggregate of that field
+
+    :param Query query: query holding ``instances``, for aggregates that
+        don't implement ``reduce``
+    :rtype: ``dict``
+    """
+    columns = {}
+    ret = {}
+
+    for key, agg in aggregates:
+        if type(agg).reduce is Aggregate.reduce:
+            ret[key] = agg(query)
+            continue
+
+        if agg.field not in columns:
+            columns[agg.field] = _column(query.model_class, agg.field, instances)
+
+        ret[key] = agg.reduce( columns[agg.field] )
+
+    return ret
+
+
+def _attach(model_class, related, elem, found):
+    """
+    helper function that looks up the foreign instances of ``elem`` and
+    stores them where :class:`alkali.fields.ForeignKey` will find them
+
+    :param related: ``dict`` of ForeignKey name, ``dict`` of the foreign
+        model's ForeignKey names to attach
+    :param found: ``dict`` of (field, foreign pk), foreign instance,
+        so each foreign instance is only looked up once
+    """
+    for name, children in related.items():
+        field = model_class.Meta.fields[name]
+        fk_value = elem.__dict__[name]
+
+        if fk_value is None:
+            continue
+
+        try:
+            foreign = found[(field, fk_value)]
+        except KeyError:
+            try:
+                foreign = field.lookup(fk_value)
+            except KeyError: # dangling, let the descriptor complain
+                continue
+
+            _attach(field.foreign_model, children, foreign, found)
+            found[(field, fk_value)] = foreign
+
+        elem.__dict__[field.cache_name] = (fk_value, foreign)
+
+
+def _children(model_class, name, pks):
+    """
+    helper function that finds the children of many foreign instances
+
+    :param name: the ``<child model>_set`` name, eg. ``entry_set``
+    :param pks: foreign primary keys
+    :rtype: ``tuple`` of (RelDescriptor, child manager version,
+        ``dict`` of foreign pk, ``set`` of child pks)
+    """
+    descriptor = getattr(model_class, name)
+    objects = descriptor.child_class.objects
+
+    children = {pk: objects._children(descriptor.child_field, pk) for pk in pks}
+    return descriptor, objects.version, children
+
+
+def _freeze(value):
+    """
+    helper function that makes a hashable version of a query value,
+    the type is kept since 1 == 1.0 == True
+
+    :raises TypeError: unhashable value
+    """
+    if isinstance(value, (list, tuple)):
+        return (type(value), tuple(_freeze(v) for v in value))
+
+    if isinstance(value, (set, frozenset)):
+        return (type(value), frozenset(_freeze(v) for v in value))
+
+    hash(value)
+    return (type(value), value)
+
+
+# rough fraction of rows a scanned condition keeps, for explain()
+_selectivity = {
+    'eq': 0.1, 'exact': 0.1, 'iexact': 0.1, 'in': 0.1, 'rin': 0.1,
+    'search': 0.1, 'ne': 0.9,
+}
+
+
+def _describe(condition):
+    """
+    helper function that writes a condition for an explain() report
+    """
+    if isinstance(condition, Q):
+        connector = ' {} '.format(condition.connector.lower())
+        text = '(' + connector.join(_describe(c) for c in condition.children) + ')'
+        return 'not ' + text if condition.negated else text
+
+    field, oper, value = condition
+    value = repr(value)
+
+    if len(value) > 20:
+        value = value[:17] + '...'
+
+    return '{} {} {}'.format(field, oper, value)
+
+
+def _describe_ordering(ordering):
+    """
+    helper function that writes an ordering for an explain() report
+    """
+    return ', '.join(('-' if reverse else '') + field for field, reverse in ordering)
+
+
+def _describe_aggregates(aggregates):
+    """
+    helper function that writes aggregates for an explain() report
+    """
+    return ', '.join(key for key, _ in aggregates)
+
+
+class Groups(dict):
+    """
+    returned by :func:`alkali.query.Query.group_by`, a ``dict`` of distinct
+    values and :class:`alkali.query.Query` objects that can also aggregate
+    every group in one go
+    """
+    def __init__(self, query, partitions):
+        """
+        :param Query query: the query that was grouped
+        :param partitions: ``dict`` of distinct value, list of pks
+        """
+        super().__init__(
+            (value, query._subquery(pks)) for value, pks in partitions.items()
+            )
+
+        self._query = query
+        self._partitions = partitions
+
+    def aggregate(self, *args, **kw):
+        """
+        like :func:`alkali.query.Query.aggregate` but for every group
+
+        :rtype: ``dict`` of distinct value, aggregate ``dict``
+
+        ::
+
+            MyModel.objects.group_by('str_type').aggregate(Count('int_type'), total=Sum('size'))
+            # { 's1': {'int_type__count': 2, 'total': 30},
+            #   's2': {'int_type__count': 1, 'total': 12} }
+        """
+        aggregates = _aggregates(args, kw)
+        get = self._query._getter()
+
+        report = self._query._explain
+        elapsed = report.timer() if report is not None else None
+
+        ret = {
+            value: _reduce(self[value], aggregates, [get(pk) for pk in pks])
+            for value, pks in self._partitions.items()
+            }
+
+        if report is not None:
+            rows = sum(len(pks) for pks in self._partitions.values())
+            strategy = 'per group: ' + _describe_aggregates(aggregates)
+            report.add('aggregate', strategy, rows, rows, elapsed())
+
+        return ret
+
+
+def _condition(key, value):
+    """
+    helper function that turns ``field__oper=value`` into a
+    (field, oper, value) condition
+
+    :raises AttributeError: unknown operator
+    """
+    try:
+        field, oper = key.split('__')
+        oper = oper or 'eq'
+    except ValueError: # no __ in field name
+        field = key
+        oper = 'eq'
+
+    predicate.check(oper, value)
+    return (field, oper, value)
+
+
+class Q:
+    """
+    a tree of filter conditions that can be combined with ``|``, ``&``
+    and ``~`` then passed to :func:`alkali.query.Query.filter` or
+    :func:`alkali.query.Query.exclude`
+
+    ::
+
+        MyModel.objects.filter( Q(str_type='foo') | Q(int_type__gt=5) )
+        MyModel.objects.filter( ~Q(str_type='foo'), int_type__lt=3 )
+    """
+    AND = 'and'
+    OR = 'or'
+
+    def __init__(self, *args, **kw):
+        """
+        :param args: ``Q`` objects
+        :param kw: ``field_name__op=value``, all must pass
+        """
+        self.connector = Q.AND
+        self.negated = False
+        self.children = list(args) + [_condition(k, v) for k, v in kw.items()]
+
+    def __repr__(self):
+        children = ", ".join([repr(c) for c in self.children])
+        text = "{}({})".format(self.connector.upper(), children)
+        return "<Q: {}>".format("NOT " + text if self.negated else text)
+
+    def _combine(self, other, connector):
+        if not isinstance(other, Q):
+            raise TypeError(other)
+
+        q = Q()
+        q.connector = connector
+        q.children = [self, other]
+        return q
+
+    def __and__(self, other):
+        return self._combine(other, Q.AND)
+
+    def __or__(self, other):
+        return self._combine(other, Q.OR)
+
+    def __invert__(self):
+        q = Q()
+        q.connector = self.connector
+        q.negated = not self.negated
+        q.children = list(self.children)
+        return q
 
 
 # def copy_instances(func):
@@ -106,36 +491,486 @@ class Query:
         """
         self.manager = manager
 
-        # THINK: Query should work on the keys of manager instances,
-        # this might save a copy or two, then only dereferencing a query
-        # should return a copy. If we ever get multiple indexes then
-        # that might also dramatically speed up queries
-
-        # THINK: I tried really hard to make Query._instances an
-        # manager._instances.itervalues() but this is fraught with
-        # peril. You have to convert to a list to get it's length, you
-        # have to convert to a list to get __getitem__, and if you
-        # iterate over it once then it's "empty" if you need to do so
-        # again. I'm afraid that for now each Query object needs to get
-        # a copy of the Manager values. Note, you still need to copy the
-        # individual elements as they leave the Query.
-        self._instances = list(manager._instances.values())
-        self.order_by('pk')
+        # we hold on to the managers dict of instances, the manager
+        # copies it before its next change so we keep seeing the
+        # instances as they were when we were created. nothing is
+        # filtered or sorted until somebody asks for results.
+        self._source = manager._snapshot()
+        self._version = manager._version
+
+        # a query works on the primary keys of the instances, only
+        # dereferencing a query (iterating, indexing, etc) makes a copy
+        self._pks = None        # results, None until first executed
+        self._annotated = {}    # pk, annotated copy of instance
+        self._filters = []      # pending (field, oper, value)
+        self._ordering = []     # (field, reverse), most significant first
+        self._sorted = False    # are _pks in _ordering order
+        self._related = {}      # select_related() tree of ForeignKey names
+        self._prefetch = []     # prefetch_related() <model>_set names
+        self._explain = None    # explain() report, None if not explaining
 
+        self.order_by('pk')
 
     def __len__(self):
-        return len(self._instances)
+        if self._pks is None and not self._filters:
+            return len(self._source)
+
+        return len(self._execute(ordered=False))
 
     def __iter__(self):
-        for elem in self._instances:
-            yield copy.copy(elem)
+        pks = self._execute()
+        make = self._copier(pks)
+        for pk in pks:
+            yield make(pk)
 
     def __getitem__(self, i):
-        return copy.copy(self._instances[i])
+        if isinstance(i, slice):
+            pks = self._execute()[i]
+            make = self._copier(pks)
+            return [make(pk) for pk in pks]
+
+        pk = self._execute()[i]
+        return self._copier([pk])(pk)
 
     def __str__(self):
         return "<Query: {}>".format(", ".join([str(q) for q in self]))
 
+    def __and__(self, other):
+        """
+        instances that are in both queries, ordered by pk
+        """
+        other_pks = set(other._execute(ordered=False))
+        pks = [pk for pk in self._execute(ordered=False) if pk in other_pks]
+        return self._combine(other, pks)
+
+    def __or__(self, other):
+        """
+        instances that are in either query, ordered by pk
+        """
+        pks = self._execute(ordered=False)
+        seen = set(pks)
+        pks = pks + [pk for pk in other._execute(ordered=False) if pk not in seen]
+        return self._combine(other, pks)
+
+    def __sub__(self, other):
+        """
+        instances that are in this query but not the other, ordered by pk
+        """
+        other_pks = set(other._execute(ordered=False))
+        pks = [pk for pk in self._execute(ordered=False) if pk not in other_pks]
+        return self._combine(other, pks)
+
+    def _combine(self, other, pks):
+        """
+        helper function that makes a new query from the results of a
+        set operation on self and other
+        """
+        assert self.manager is other.manager, "can't combine queries on different models"
+
+        query = self._subquery(pks)
+
+        if self._source is not other._source:
+            # taken at different times, don't trust any indexes
+            query._source = collections.ChainMap(self._source, other._source)
+            query._version = None
+
+        query._annotated = dict(other._annotated)
+        query._annotated.update(self._annotated)
+        query._ordering = []
+
+        return query.order_by('pk')
+
+    def _subquery(self, pks):
+        """
+        helper function that makes a new query holding the given subset
+        of our (already executed) pks, keeping our ordering
+        """
+        query = Query.__new__(Query)
+        query.manager = self.manager
+        query._source = self._source
+        query._version = self._version
+
+        query._pks = list(pks)
+        query._annotated = {pk: self._annotated[pk] for pk in pks if pk in self._annotated} \
+                if self._annotated else {}
+        query._filters = []
+        query._ordering = list(self._ordering)
+        query._sorted = self._sorted
+        query._related = self._related
+        query._prefetch = self._prefetch
+        query._explain = self._explain
+
+        return query
+
+    def _getter(self):
+        """
+        helper function that returns a function to turn a pk into
+        our version of the instance (not a copy)
+        """
+        if not self._annotated:
+            return self._source.__getitem__
+
+        annotated, source = self._annotated, self._source
+        return lambda pk: annotated[pk] if pk in annotated else source[pk]
+
+    def _copier(self, pks):
+        """
+        helper function that returns a function to turn a pk into a
+        copy of our version of the instance, the copy leaves the query
+        so it gets any ``select_related`` foreign instances and
+        ``prefetch_related`` children attached
+
+        :param pks: the primary keys that are about to be copied
+        """
+        get = self._getter()
+        report = self._explain
+
+        if report is not None:
+            def _count(pk):
+                report.copies += 1
+                return copy.copy(get(pk))
+            make = _count
+        else:
+            make = lambda pk: copy.copy(get(pk))
+
+        if not self._related and not self._prefetch:
+            return make
+
+        from .relmanager import RelManager
+
+        model_class = self.model_class
+        related = self._related
+        found = {} # (field, foreign pk), foreign instance
+        children = [_children(model_class, name, pks) for name in self._prefetch]
+
+        def _copy(pk):
+            elem = make(pk)
+            _attach(model_class, related, elem, found)
+
+            for descriptor, version, pks in children:
+                rel = RelManager(elem, descriptor.child_class, descriptor.child_field,
+                        prefetched=(version, pks.get(pk, set())))
+                elem.__dict__[descriptor.cache_name] = rel
+
+            return elem
+
+        return _copy
+
+    def _instances(self, ordered=False):
+        """
+        helper function that returns our versions of the result
+        instances (not copies)
+        """
+        get = self._getter()
+        return [get(pk) for pk in self._execute(ordered)]
+
+    def _execute(self, ordered=True):
+        """
+        helper function that runs any pending filters and, if ``ordered``,
+        any pending sorts. sorting happens after filtering so only the
+        survivors get sorted.
+
+        :rtype: ``list`` of primary keys
+        """
+        cache = self.manager._cache
+        plan = self._cache_key() if self._pks is None else None
+
+        if plan is not None:
+            cached = cache.get(self._version, plan)
+
+            if cached is not None:
+                pks, self._sorted = cached
+                self._pks = list(pks)
+                self._filters = []
+
+                if self._sorted or not ordered:
+                    return self._pks
+
+        if self._pks is None or self._filters:
+            pks, passes = self._candidates()
+
+            if passes:
+                get = self._getter()
+                pks = [pk for pk in pks if passes(get(pk))]
+
+            self._pks = list(pks)
+            self._filters = []
+
+        if ordered and not self._sorted:
+            key, reverse = self._key()
+            self._pks.sort(key=key, reverse=reverse)
+            self._sorted = True
+
+        if plan is not None:
+            cache.put(self._version, plan, (tuple(self._pks), self._sorted))
+
+        return self._pks
+
+    def _cache_key(self):
+        """
+        helper function that describes our pending filters and ordering
+        as a key for the manager's result cache
+
+        only stored field values are allowed, a property or the fields of
+        a foreign instance can change without the manager's version changing
+
+        :rtype: hashable ``tuple`` or None if our results can't be cached
+        """
+        if self._version != self.manager._version or self._annotated:
+            return None
+
+        fields = self.fields
+
+        try:
+            filters = frozenset(self._cache_condition(c) for c in self._filters)
+        except TypeError:
+            return None
+
+        for field, _ in self._ordering:
+            if field not in fields:
+                return None
+
+        return (filters, tuple(self._ordering))
+
+    def _cache_condition(self, condition):
+        """
+        helper function that makes a hashable version of a condition
+
+        :raises TypeError: the condition can't be cached
+        """
+        if isinstance(condition, Q):
+            children = tuple(self._cache_condition(c) for c in condition.children)
+            return (condition.connector, condition.negated, children)
+
+        field, oper, value = condition
+        model_field = self.fields.get(field, None)
+
+        if isinstance(model_field, fields.ForeignKey):
+            # only comparisons of the stored foreign pk
+            if oper not in ('eq', 'ne') or not isinstance(value, model_field.foreign_model):
+                raise TypeError(field)
+            return (field, oper, _freeze(value.pk))
+
+        if model_field is None and field != 'pk':
+            raise TypeError(field)
+
+        return (field, oper, _freeze(value))
+
+    def _key(self):
+        """
+        helper function that returns the sort key for our ordering
+
+        :rtype: ``tuple`` of (key function that takes a pk, reverse)
+        """
+        key, reverse = predicate.compile_key(self.model_class, self._ordering)
+        get = self._getter()
+        return (lambda pk: key(get(pk))), reverse
+
+    def _top(self, n):
+        """
+        helper function that returns the first ``n`` pks in our ordering
+        (or last ``-n`` pks), only sorting everything if we have to
+
+        :rtype: ``list`` of primary keys
+        """
+        pks = self._execute(ordered=False)
+
+        report = self._explain
+        elapsed = report.timer() if report is not None else None
+
+        # a heap is O(n log k) but much slower than sorting in C
+        # when k is a good fraction of n
+        if self._sorted or n == 0 or abs(n) * 4 > len(pks):
+            strategy = 'slice of sorted'
+            pks = self._execute()
+            top = pks[:n] if n > 0 else pks[n:] if n < 0 else pks
+        else:
+            strategy = 'heap'
+            key, reverse = self._key()
+
+            if n > 0:
+                select = heapq.nlargest if reverse else heapq.nsmallest
+                top = select(n, pks, key=key)
+            else:
+                select = heapq.nsmallest if reverse else heapq.nlargest
+                top = select(-n, pks, key=key)[::-1]
+
+        if report is not None:
+            strategy = '{} {} by {}'.format(strategy, n, _describe_ordering(self._ordering))
+            report.add('limit', strategy, abs(n) or len(pks), len(top), elapsed())
+
+        return top
+
+    def _candidates(self):
+        """
+        helper function that answers as many pending filters as possible
+        from indexes and per value lookup tables and compiles the rest
+        into a single predicate
+
+        :rtype: ``tuple`` of (primary keys, predicate or None)
+        """
+        conditions = []
+        found = None
+        tables = {}
+
+        filters = list(self._filters)
+
+        while filters:
+            condition = filters.pop(0)
+
+            # a plain AND is just more filters
+            if isinstance(condition, Q) and not condition.negated \
+            and condition.connector == Q.AND:
+                filters[0:0] = condition.children
+                continue
+
+            if isinstance(condition, tuple):
+                pks = self._lookup(*condition)
+            else:
+                pks = self._resolve(condition, tables)
+
+            if pks is None:
+                conditions.append( condition )
+            elif found is None:
+                found = pks
+            else:
+                found = found & pks
+
+        pks = self._pks
+
+        if found is not None:
+            if pks is None:
+                pks = found
+            else:
+                pks = [pk for pk in pks if pk in found]
+        elif pks is None:
+            pks = self._source.keys()
+
+        if not conditions:
+            return pks, None
+
+        return pks, predicate.compile_filter(self.model_class, conditions)
+
+    def _resolve(self, condition, tables):
+        """
+        helper function that answers a tree of conditions with set
+        operations on primary keys, a tree is all or nothing
+
+        :param tables: ``dict`` of field, lookup table, shared between calls
+        :rtype: ``set`` of primary keys or None if a scan is required
+        """
+        plan = {}
+
+        if not self._plan(condition, plan):
+            return None
+
+        return self._answer(condition, plan, tables)
+
+    def _plan(self, condition, plan):
+        """
+        helper function that asks the indexes about every condition in
+        a tree, conditions they can't answer need a lookup table
+
+        :param plan: ``dict`` of id(condition), primary keys from an
+            index or None for a lookup table
+        :rtype: False if any condition requires a scan
+        """
+        if not isinstance(condition, tuple):
+            return all(self._plan(c, plan) for c in condition.children)
+
+        pks = self._lookup(*condition)
+
+        if pks is None and not self._tabular(*condition):
+            return False
+
+        plan[id(condition)] = pks
+        return True
+
+    def _tabular(self, field, oper, value):
+        """
+        helper function that decides if a lookup table can answer
+        ``field__oper=value``
+        """
+        if oper == 'eq':
+            values = [value]
+        elif oper == 'in' and isinstance(value, (list, tuple, set, frozenset)):
+            values = value
+        else:
+            return False
+
+        if field != 'pk':
+            model_field = self.fields.get(field, None)
+            if not isinstance(model_field, predicate._scalar_fields):
+                return False
+
+        try:
+            for v in values:
+                hash(v)
+        except TypeError:
+            return False
+
+        return True
+
+    def _answer(self, condition, plan, tables):
+        """
+        helper function that walks a planned tree of conditions
+        """
+        if isinstance(condition, tuple):
+            pks = plan[id(condition)]
+            if pks is not None:
+                return pks
+
+            field, oper, value = condition
+
+            table = tables.get(field, None)
+            if table is None:
+                table = tables[field] = self._table(field)
+
+            if oper == 'eq':
+                return set(table.get(value, ()))
+
+            pks = set()
+            for v in value:
+                pks.update( table.get(v, ()) )
+            return pks
+
+        results = [self._answer(c, plan, tables) for c in condition.children]
+
+        if not results:
+            pks = set(self._source.keys()) if condition.connector == Q.AND else set()
+        elif condition.connector == Q.AND:
+            pks = set.intersection(*results)
+        else:
+            pks = set.union(*results)
+
+        if condition.negated:
+            pks = set(self._source.keys()) - pks
+
+        return pks
+
+    def _table(self, field):
+        """
+        helper function that maps every value of ``field`` to the primary
+        keys holding it
+
+        :rtype: ``dict`` of value, ``list`` of primary keys
+        """
+        getter = predicate.compile_getter(self.model_class, field)
+        source = self._source
+        table = {}
+
+        for pk in source.keys():
+            value = getter(source[pk])
+
+            try:
+                table[value].append(pk)
+            except KeyError:
+                table[value] = [pk]
+            except TypeError: # unhashable, can never be equal to a query value
+                pass
+
+        return table
+
     @property
     def count(self):
         """
@@ -171,8 +1006,9 @@ class Query:
     def all(self):
         return self
 
-    def filter(self, **kw):
+    def filter(self, *args, **kw):
         """
+        :param args: :class:`alkali.query.Q` objects
         :param kw: ``field_name__op=value``, note: ``field_name`` can be a ``property``
         :rtype: Query
 
@@ -189,100 +1025,282 @@ class Query:
 
             # 'foo' is in field/property myset
             MyModel.objects.filter( myset__rin='foo' )
+
+            # f is 'foo' or g is greater than 3
+            MyModel.objects.filter( Q(f='foo') | Q(g__gt=3) )
         """
-        for field, query in kw.items():
-            try:
-                field, oper = field.split('__')
-                oper = oper or 'eq'
-            except ValueError: # no __ in field name
-                field = field
-                oper = 'eq'
+        for q in args:
+            if not isinstance(q, Q):
+                raise TypeError("filter() positional arguments must be Q objects")
+            self._filters.append( q )
 
-            self._instances = self._filter(field, oper, query, self._instances)
+        for field, value in kw.items():
+            self._filters.append( _condition(field, value) )
 
         return self
 
-    @as_list
-    def _filter(self, field, oper, value, instances):
+    def exclude(self, *args, **kw):
         """
-        helper function that does the actual work of filtering out instances
+        :param args: :class:`alkali.query.Q` objects
+        :param kw: ``field_name__op=value``
+        :rtype: Query
+
+        the opposite of :func:`alkali.query.Query.filter`, keep model
+        instances that fail the criteria (all of ``args`` and ``kw`` together)
+
+        ::
+
+            # everything but f == 'foo' and g > 3
+            MyModel.objects.exclude( f='foo', g__gt=3 )
         """
+        return self.filter( ~Q(*args, **kw) )
 
-        def in_(coll, val):
-            if not isinstance(coll, str) \
-            and isinstance(coll, collections.abc.Iterable):
-                return bool( set(coll) & set(val) ) # intersection
-            else:
-                return coll in val
+    def _lookup(self, field, oper, value):
+        """
+        helper function that asks the manager indexes for matching primary keys
 
-        def rin_(coll, val):
-            if not isinstance(val, str) \
-            and isinstance(val, collections.abc.Iterable):
-                return bool( set(coll) & set(val) ) # intersection
-            else:
-                return val in coll
-
-        def regex(coll, val):
-            return re.search(val, coll, re.UNICODE)
-
-        def regexi(coll, val):
-            return re.search(val, coll, re.UNICODE | re.IGNORECASE)
-
-        if oper == 'in':
-            assert isinstance(value, collections.abc.Iterable)
-            oper = in_
-        elif oper == 'rin':
-            assert isinstance(field, collections.abc.Iterable)
-            oper = rin_
-        elif oper == 're':
-            oper = regex
-        elif oper == 'rei':
-            oper = regexi
-        else:
-            oper = getattr(operator, oper)
+        :rtype: ``set`` of primary keys or None if a scan is required
+        """
+        if field == 'pk' and oper == 'eq':
+            try:
+                return {value} if value in self._source else set()
+            except TypeError: # unhashable
+                return None
 
-        # TODO: exact, iexact, (i)contains == rin, (i)startswith, (i)endswith,
-        # range (for dates), date (return datetime as date), year/month/day,
-        # hour/minute/second, week_day (sun=1, sat=7)
+        # the indexes describe the manager as it is now, not as
+        # it was when we took our snapshot of its instances
+        if self.manager._version != self._version:
+            return None
 
-        return filter( lambda e: oper(getattr(e, field), value), instances)
+        return self.manager._lookup(field, oper, value)
 
     def order_by(self, *fields):
         """
-        change order of self.instances
+        change order of self.instances, the actual sort is deferred
+        until results are required
 
         :param str fields: field names, prefixed with optional '-' to
             indicate reverse order
         :rtype: Query
 
-        **warning**: because this isn't a real database and we don't have
-        grouping, passing in multiple fields will very possibly sort
-        on the last field only. python sorting is stable however, so a
-        multiple field sort may work as intended.
+        the first field is the most significant, each following field
+        breaks ties of the fields before it. any previous ordering (the
+        primary key to begin with) breaks any remaining ties.
+
+        ::
+
+            MyModel.objects.order_by('-date', 'title')
         """
         def _order_by( field ):
-            "return reversed, field_name"
+            "return field_name, reversed"
             if field.startswith('-'):
-                return True, field[1:]
+                return field[1:], True
             else:
-                return False, field
+                return field, False
 
-        if fields == ('pk',):
-            fields = self.model_class.Meta.pk_fields.keys()
+        ordering = []
 
         for field in fields:
-            reverse, field = _order_by( field )
-            key = operator.attrgetter(field)
-            self._instances = sorted(self._instances, key=key, reverse=reverse)
+            field, reverse = _order_by( field )
+
+            if field == 'pk':
+                names = self.model_class.Meta.pk_fields.keys()
+                ordering.extend( [(name, reverse) for name in names] )
+            else:
+                ordering.append( (field, reverse) )
+
+        names = {field for field, _ in ordering}
+        self._ordering = ordering + [o for o in self._ordering if o[0] not in names]
+        self._sorted = False
+
+        return self
+
+    def select_related(self, *fields):
+        """
+        look up ForeignKey instances once per distinct foreign pk and
+        attach them to the instances leaving this query, instead of
+        looking them up every time the field is accessed
+
+        instances that reference the same foreign pk share the same
+        foreign instance
+
+        :param fields: ForeignKey names, follow ForeignKeys of the foreign
+            model with ``__``, eg. ``'entry__blog'``
+        :rtype: Query
+
+        ::
+
+            for e in Entry.objects.select_related('blog', 'blog__owner'):
+                print(e.blog.title, e.blog.owner.name)
+        """
+        from .fields import ForeignKey
+
+        related = copy.deepcopy(self._related)
+
+        for path in fields:
+            model_class = self.model_class
+            node = related
+
+            for name in path.split('__'):
+                field = model_class.Meta.fields.get(name, None)
+
+                assert isinstance(field, ForeignKey), \
+                    "{}.{} is not a ForeignKey".format(model_class.__name__, name)
+
+                node = node.setdefault(name, {})
+                model_class = field.foreign_model
+
+        self._related = related
+        return self
 
+    def prefetch_related(self, *names):
+        """
+        find the children of every instance leaving this query in one
+        batch, ``<child model>_set.all()``, ``get()`` and ``count`` then
+        use them until the child manager changes
+
+        :param names: ``<child model>_set`` names
+        :rtype: Query
+
+        ::
+
+            for blog in Blog.objects.prefetch_related('entry_set'):
+                print(blog.title, blog.entry_set.count)
+        """
+        from .relmanager import RelDescriptor
+
+        for name in names:
+            assert isinstance(getattr(self.model_class, name, None), RelDescriptor), \
+                "{}.{} is not a related set".format(self.model_class.__name__, name)
+
+        self._prefetch = self._prefetch + [n for n in names if n not in self._prefetch]
         return self
 
+    def paginate(self, after=None, size=20):
+        """
+        return a page of instances that follow the ``after`` cursor in
+        our ordering
+
+        the sorted keys of the query are kept in the manager's result
+        cache (see :mod:`alkali.cache`) so every page is found with a
+        binary search, deep pages cost the same as the first page
+
+        :param str after: cursor returned with the previous page,
+            None for the first page
+        :param int size: most instances per page
+        :rtype: ``tuple`` of (``list`` of instances, cursor of the next
+            page or None if this is the last page)
+        :raises ValueError: the cursor isn't for this query's ordering
+
+        ::
+
+            page, cursor = MyModel.objects.order_by('-date').paginate(size=10)
+            while cursor:
+                page, cursor = MyModel.objects.order_by('-date').paginate(after=cursor, size=10)
+        """
+        assert size > 0, "page size must be positive"
+
+        key, _ = predicate.compile_key(self.model_class, self._ordering, ascending=True)
+
+        cache = self.manager._cache
+        plan = self._cache_key() if self._pks is None else None
+        plan = ('paginate', plan) if plan is not None else None
+
+        cached = cache.get(self._version, plan) if plan is not None else None
+
+        if cached is None:
+            pks = self._execute()
+            get = self._getter()
+            cached = (tuple(pks), [key(get(pk)) for pk in pks])
+
+            if plan is not None:
+                cache.put(self._version, plan, cached)
+
+        pks, keys = cached
+
+        start = 0
+        if after is not None:
+            start = bisect.bisect_right(keys, key(self._decode_cursor(after)))
+
+        page = pks[start:start + size]
+        make = self._copier(page)
+        instances = [make(pk) for pk in page]
+
+        cursor = None
+        if start + size < len(pks):
+            cursor = self._encode_cursor(self._getter()(page[-1]))
+
+        return instances, cursor
+
+    def _cursor_fields(self):
+        """
+        helper function that returns the (field, reverse) of our ordering
+        with the model Field, if any, that can dump/load its values
+        """
+        fields = self.fields
+
+        for name, reverse in self._ordering:
+            yield name, reverse, fields.get(name, None)
+
+    def _encode_cursor(self, elem):
+        """
+        helper function that turns the sort values of ``elem`` into an
+        opaque string
+        """
+        from .fields import ForeignKey
+
+        names = []
+        values = []
+
+        for name, reverse, field in self._cursor_fields():
+            if isinstance(field, ForeignKey):
+                value = field.pk_field.dumps(elem.__dict__[name])
+            elif field is not None:
+                value = field.dumps(elem.__dict__[name])
+            else:
+                value = getattr(elem, name)
+
+            names.append( [name, reverse] )
+            values.append( value )
+
+        text = json.dumps([names, values], separators=(',', ':'))
+        return base64.urlsafe_b64encode(text.encode('utf-8')).decode('ascii')
+
+    def _decode_cursor(self, cursor):
+        """
+        helper function that turns a cursor back into an object with
+        the sort values of the instance it was made from
+        """
+        from .fields import ForeignKey
+
+        try:
+            names, values = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        except (ValueError, TypeError, AttributeError) as e:
+            raise ValueError("invalid cursor: {}".format(e))
+
+        ordering = [[name, reverse] for name, reverse, _ in self._cursor_fields()]
+        if names != ordering or len(values) != len(ordering):
+            raise ValueError("cursor is for a different ordering")
+
+        elem = types.SimpleNamespace()
+
+        for (name, reverse, field), value in zip(self._cursor_fields(), values):
+            if isinstance(field, ForeignKey):
+                value = field.pk_field.cast(field.pk_field.loads(value))
+            elif field is not None:
+                value = field.cast(field.loads(value))
+
+            elem.__dict__[name] = value
+
+        return elem
+
     def group_by(self, field):
         """
-        returns a dict of distinct values and Query objects
+        returns a dict of distinct values and Query objects, the
+        instances in this query are partitioned in a single pass
 
         :param field: field name
-        :rtype: ``dict``
+        :rtype: :class:`alkali.query.Groups`
 
         ::
 
@@ -290,16 +1308,33 @@ class Query:
 
             { 's1': <Query MyModel(1), MyModel(3)>
               's2': <Query MyModel(2)> }
+
+            MyModel.objects.group_by('str_type').aggregate(Count('int_type'))
+
+            { 's1': {'int_type__count': 2},
+              's2': {'int_type__count': 1} }
         """
-        def _filter(value):
-            # need to start with a fresh query object to work with all objects
-            return Query(self.manager).filter(**{field: value})
+        getter = predicate.compile_getter(self.model_class, field)
+        get = self._getter()
+        partitions = {}
 
-        values = self.distinct(field)[0]
-        groups = { value: _filter(value) for value in values }
-        return groups
+        pks = self._execute(ordered=False)
+        report = self._explain
+        elapsed = report.timer() if report is not None else None
+
+        for pk in pks:
+            value = getter(get(pk))
+
+            try:
+                partitions[value].append(pk)
+            except KeyError:
+                partitions[value] = [pk]
+
+        if report is not None:
+            report.add('group_by', 'hash on {}'.format(field), None, len(partitions), elapsed())
+
+        return Groups(self, partitions)
 
-    @as_list
     def limit(self, n):
         """
         return first(+) or last(-) n elements
@@ -308,26 +1343,32 @@ class Query:
         list of instances and not a Query. passing in 0 is a no-op and
         returns all instances
 
+        a small ``n`` on an unsorted query is found with a heap instead
+        of sorting every instance
+
         :param int n: non-zero integer
         :rtype: ``list``
         """
-        if n > 0:
-            return map(copy.copy, self._instances[:n])
-        elif n < 0:
-            return map(copy.copy, self._instances[n:])
-        else: # n == 0, return all instead of [] because why not?
-            return map(copy.copy, self._instances)
+        # n == 0, return all instead of [] because why not?
+        pks = self._top(n)
+
+        make = self._copier(pks)
+        return [make(pk) for pk in pks]
 
     def first(self):
         """
         return first object from query, depends on ordering
         raise if query is empty
+
+        the query doesn't need to be sorted to find the first object
         """
-        try:
-            return self[0]
-        except IndexError:
+        pks = self._top(1)
+
+        if not pks:
             raise self.model_class.DoesNotExist()
 
+        return self._copier(pks)(pks[0])
+
     @as_list
     def values(self, *fields):
         """
@@ -348,7 +1389,8 @@ class Query:
             vals = [ (field, getattr(obj, field)) for field in fields ]
             return collections.OrderedDict(vals)
 
-        return map(lambda obj: _mk_dict(obj, fields), self._instances)
+        get = self._getter()
+        return map(lambda pk: _mk_dict(get(pk), fields), self._execute())
 
     def values_list(self, *fields, **kw):
         """
@@ -368,24 +1410,36 @@ class Query:
         if not fields:
             fields = self.field_names
 
+        instances = self._instances(ordered=True)
+
         if flat:
             return [
                 getattr(e, field) for field in fields
-                for e in self._instances
+                for e in instances
                 ]
         else:
             return [
                 [getattr(e, field) for field in fields]
-                for e in self._instances
+                for e in instances
                 ]
 
     def exists(self):
         """
-        does the current query hold any elements
+        does the current query hold any elements, stops looking as
+        soon as one is found
 
-        :rtype: int
+        :rtype: bool
         """
-        return len(self) > 0
+        if self._pks is not None and not self._filters:
+            return len(self._pks) > 0
+
+        pks, passes = self._candidates()
+
+        if passes is None:
+            return len(pks) > 0
+
+        get = self._getter()
+        return any(passes(get(pk)) for pk in pks)
 
     def aggregate(self, *args, **kw):
         """
@@ -395,7 +1449,8 @@ class Query:
         The returned dictionary has key ``<field_name>__<agg function>`` unless
         keyword is given.
 
-        :param Aggregate args: ``Count`` ``Sum`` ``Max`` ``Min``
+        :param Aggregate args: ``Count`` ``Sum`` ``Max`` ``Min`` ``Avg``
+            ``Variance`` ``StdDev``
         :param kw: ``key_value=Aggregate``, note: ``field_name`` can be a ``property``
         :rtype: ``dict``
 
@@ -404,17 +1459,229 @@ class Query:
             MyModel.objects.aggregate( the_count=Count('id'), Sum('size') )
             # { 'the_count': 12, 'size__sum': 24957 }
         """
+        aggregates = _aggregates(args, kw)
+        instances = self._instances()
 
-        ret = {}
+        report = self._explain
+        if report is None:
+            return _reduce(self, aggregates, instances)
 
-        for agg in args:
-            key = '{}__{}'.format(agg.field, agg.__class__.__name__.lower())
-            ret[key] = agg(self)
+        elapsed = report.timer()
+        ret = _reduce(self, aggregates, instances)
+        report.add('aggregate', _describe_aggregates(aggregates), len(instances), len(instances), elapsed())
+        return ret
 
-        for field, agg in kw.items():
-            ret[field] = agg(self)
+    def update(self, **kw):
+        """
+        set fields of every instance in the query, each value is cast
+        once and the manager's indexes are updated once for the batch.
+        like :func:`alkali.manager.Manager.bulk_update` per instance
+        save signals aren't sent and ``auto_now`` fields are set to now.
 
-        return ret
+        afterwards the query holds the same (updated) instances
+
+        :param kw: ``field_name=value``
+        :raises AttributeError: unknown or primary key field name
+        :rtype: ``int`` number of updated instances
+
+        ::
+
+            MyModel.objects.filter(size__gt=100).update(size=100, note='big')
+        """
+        manager = self.manager
+        names = manager._updatable(kw.keys())
+        model_fields = self.fields
+        values = {}
+
+        for name, value in kw.items():
+            field = model_fields[name]
+
+            if isinstance(field, fields.UUIDField):
+                raise RuntimeError("UUIDFields are not settable after creation")
+
+            values[name] = field.cast(value)
+
+        # mutable values can't be shared between instances
+        mutable = [name for name, value in values.items()
+                if isinstance(value, (set, list, dict))]
+
+        def _values():
+            if not mutable:
+                return values
+            ret = dict(values)
+            ret.update( (name, copy.copy(values[name])) for name in mutable )
+            return ret
+
+        current = manager._instances
+        updates = [(pk, _values()) for pk in self._execute(ordered=False) if pk in current]
+        count = len(manager._update_many(updates, names))
+
+        self._refresh()
+        return count
+
+    def delete(self):
+        """
+        remove every instance in the query from the manager in one go,
+        see :func:`alkali.manager.Manager.bulk_delete`
+
+        afterwards the query is empty
+
+        :rtype: ``int`` number of deleted instances
+
+        ::
+
+            MyModel.objects.filter(date__lt=last_year).delete()
+        """
+        count = self.manager.bulk_delete(self._execute(ordered=False))
+
+        self._refresh()
+        return count
+
+    def _refresh(self):
+        """
+        helper function that takes a new snapshot of the manager after
+        we changed it, we keep the primary keys that are still there
+        """
+        self._source = self.manager._snapshot()
+        self._version = self.manager._version
+        self._annotated = {}
+        self._pks = [pk for pk in self._execute(ordered=False) if pk in self._source]
+        self._sorted = False
+
+    def explain(self):
+        """
+        run any pending filters and ordering one stage at a time and
+        report how each was answered: which index (or a scan), the
+        estimated and actual number of rows and how long it took
+
+        the report keeps recording whatever is done with the query
+        afterwards, ``limit``, ``group_by``, ``aggregate`` and the
+        number of instances copied out of it
+
+        the result cache is skipped so the report shows the real work
+
+        :rtype: :class:`alkali.explain.Explain`
+
+        ::
+
+            q = MyModel.objects.filter(name='foo', size__gt=10)
+            report = q.explain()
+            q.aggregate(Sum('size'))
+            print(report)
+        """
+        from .explain import Explain
+
+        report = self._explain = Explain(self.model_class)
+
+        if self._pks is None or self._filters:
+            self._explain_filters(report)
+
+        elapsed = report.timer()
+        rows = len(self._pks)
+
+        if self._sorted:
+            strategy = 'already sorted'
+        else:
+            key, reverse = self._key()
+            self._pks.sort(key=key, reverse=reverse)
+            self._sorted = True
+            strategy = 'sort on ' + _describe_ordering(self._ordering)
+
+        report.add('order_by', strategy, rows, rows, elapsed())
+        return report
+
+    def _explain_filters(self, report):
+        """
+        helper function that does what ``_execute`` does with our pending
+        filters but one condition at a time, recording each in ``report``
+        """
+        elapsed = report.timer()
+
+        if self._pks is None:
+            pks = list(self._source.keys())
+            strategy = '{} instances'.format(len(pks))
+        else:
+            pks = self._pks
+            strategy = 'previous results'
+
+        report.add('source', strategy, len(pks), len(pks), elapsed())
+
+        conditions = []
+        found = None
+        tables = {}
+
+        filters = list(self._filters)
+
+        while filters:
+            condition = filters.pop(0)
+
+            if isinstance(condition, Q) and not condition.negated \
+            and condition.connector == Q.AND:
+                filters[0:0] = condition.children
+                continue
+
+            elapsed = report.timer()
+
+            if isinstance(condition, tuple):
+                strategy, estimated, answer = self._explain_lookup(*condition)
+            else:
+                strategy, answer = 'set operations', self._resolve(condition, tables)
+                estimated = None if answer is None else len(answer)
+
+            if answer is None:
+                conditions.append( condition )
+                continue
+
+            found = answer if found is None else found & answer
+            strategy = '{}: {}'.format(_describe(condition), strategy)
+            report.add('filter', strategy, estimated, len(found), elapsed())
+
+        if found is not None:
+            pks = [pk for pk in pks if pk in found]
+
+        get = self._getter()
+
+        for condition in conditions:
+            elapsed = report.timer()
+
+            oper = condition[1] if isinstance(condition, tuple) else None
+            estimated = math.ceil(len(pks) * _selectivity.get(oper, 0.33))
+
+            passes = predicate.compile_filter(self.model_class, [condition])
+            pks = [pk for pk in pks if passes(get(pk))]
+
+            strategy = '{}: scan'.format(_describe(condition))
+            report.add('filter', strategy, estimated, len(pks), elapsed())
+
+        self._pks = pks
+        self._filters = []
+
+    def _explain_lookup(self, field, oper, value):
+        """
+        helper function that does what ``_lookup`` does but also says
+        which index answered and how many rows it expected
+
+        :rtype: ``tuple`` of (strategy, estimated rows, primary keys or None)
+        """
+        if field == 'pk' and oper == 'eq':
+            pks = self._lookup(field, oper, value)
+            return 'primary key', 1, pks
+
+        if self.manager._version != self._version:
+            return None, None, None
+
+        index, pks = self.manager._find(field, oper, value)
+
+        if pks is None:
+            return None, None, None
+
+        estimated = len(pks)
+
+        # a hash index can tell what an average value would have found
+        if oper in ('eq', 'exact') and len(index):
+            estimated = len(self.manager) // len(index)
+
+        return index.__class__.__name__, estimated, pks
 
     def annotate(self, **kw):
         """
@@ -438,13 +1705,22 @@ class Query:
         """
 
         # make sure instances are a copy so we don't annotate the originals
-        self._instances = [copy.copy(obj) for obj in self._instances]
+        pks = self._execute(ordered=False)
+        annotated, source = self._annotated, self._source
+
+        for pk in pks:
+            if pk not in annotated:
+                annotated[pk] = copy.copy(source[pk])
+
+                if self._explain is not None:
+                    self._explain.copies += 1
 
         for name, func in kw.items():
             if not callable(func):
                 func = lambda elem, val=func: val
 
-            for elem in self._instances:
+            for pk in pks:
+                elem = annotated[pk]
                 setattr( elem, name, func(elem) )
 
         return self
@@ -470,9 +1746,10 @@ class Query:
             # [[u'there', u'hi']]
         """
         ret = []
+        instances = self._instances()
 
         for field in fields:
-            distinct = {getattr(elem, field) for elem in self._instances} # set
+            distinct = {getattr(elem, field) for elem in instances} # set
             ret.append( list(distinct) )
 
         return ret
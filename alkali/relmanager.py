@@ -1,3 +1,4 @@
+import copy
 import inspect
 
 from .query import Query
@@ -14,11 +15,13 @@ class RelManager:
     models that have a :class:`alkali.fields.ForeignKey` (or equivalent) field.
     """
 
-    def __init__( self, foreign, child_class, child_field ):
+    def __init__( self, foreign, child_class, child_field, prefetched=None ):
         """
         :param Model foreign: instance of the model that is pointed at
         :param Model child_class: the model class that contains the ForeignKey
         :param str child_field: the field name that points to ForeignKey
+        :param prefetched: (child manager version, child pks) found by
+            :func:`alkali.query.Query.prefetch_related`
         """
         assert not inspect.isclass(foreign)
         assert inspect.isclass(child_class)
@@ -27,6 +30,7 @@ class RelManager:
         self._foreign = foreign
         self._child_class = child_class
         self._child_field = child_field
+        self._prefetched = prefetched
 
     def __repr__(self):
         return "RelManager<{} <- {}.{}>".format(
@@ -48,7 +52,23 @@ class RelManager:
 
     @property
     def count(self):
-        return len(self.all())
+        return len(self._pks())
+
+    def _pks(self):
+        """
+        helper function that returns the primary keys of our children,
+        prefetched ones are good until the child manager changes
+
+        :rtype: ``set``
+        """
+        objects = self.child_class.objects
+
+        if self._prefetched is not None:
+            version, pks = self._prefetched
+            if version == objects.version:
+                return pks
+
+        return objects._children(self.child_field, self.foreign)
 
     def add(self, child):
         assert isinstance(child, self.child_class)
@@ -68,7 +88,9 @@ class RelManager:
 
         :rtype: :class:`alkali.query.Query`
         """
-        return self.child_class.objects.filter(**{self.child_field: self.foreign})
+        query = Query(self.child_class.objects)
+        query._pks = list(self._pks())
+        return query
 
     def get(self, **kw):
         """
@@ -77,7 +99,59 @@ class RelManager:
 
         :rtype: :class:`alkali.model.Model`
         """
-        if not kw:
-            return self.child_class.objects.get( **{self.child_field: self.foreign} )
+        if kw:
+            return self.child_class.objects.get(**kw)
+
+        pks = self._pks()
+        objects = self.child_class.objects
+        name = self.child_class.__name__
+
+        if len(pks) == 0:
+            raise self.child_class.DoesNotExist("{}: no results for: {}".format(
+                name, self.foreign) )
+
+        if len(pks) > 1:
+            raise self.child_class.MultipleObjectsReturned("{}: got {} results for: {}".format(
+                name, len(pks), self.foreign) )
+
+        pk, = pks
+        return copy.copy( objects._instances[pk] )
+
+
+class RelDescriptor:
+    """
+    the ``<child model>_set`` attribute that :class:`alkali.metamodel.MetaModel`
+    adds to a foreign model. returns the same :class:`RelManager` every time
+    it's accessed on the same instance.
+    """
+
+    def __init__( self, child_class, child_field, name ):
+        """
+        :param Model child_class: the model class that contains the ForeignKey
+        :param str child_field: the field name that points to ForeignKey
+        :param str name: our attribute name, eg. ``auxinfo_set``
+        """
+        self.child_class = child_class
+        self.child_field = child_field
+        self.name = name
+
+    @property
+    def cache_name(self):
+        """
+        **property**: key in the foreign instance's ``__dict__`` that
+        holds its ``RelManager``
+        """
+        return '___' + self.name
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+
+        rel = instance.__dict__.get(self.cache_name, None)
+
+        # copies of an instance share its __dict__ contents
+        if rel is None or rel.foreign is not instance:
+            rel = RelManager(instance, self.child_class, self.child_field)
+            instance.__dict__[self.cache_name] = rel
 
-        return self.child_class.objects.get(**kw)
+        return rel
@@ -11,6 +11,12 @@ post_save   = signal('post_save'  , doc='called after an Model object is saved')
 pre_delete  = signal('pre_delete' , doc='called before an Model object is deleted')
 post_delete = signal('post_delete', doc='called after an Model object is deleted')
 
+pre_bulk_save    = signal('pre_bulk_save'   , doc='called before a list of Model objects are saved in bulk')
+post_bulk_save   = signal('post_bulk_save'  , doc='called after a list of Model objects are saved in bulk')
+
+pre_bulk_delete  = signal('pre_bulk_delete' , doc='called before a list of Model objects are deleted in bulk')
+post_bulk_delete = signal('post_bulk_delete', doc='called after a list of Model objects are deleted in bulk')
+
 pre_load    = signal('pre_load'   , doc='called before all Model objects are loaded from disk')
 post_load   = signal('post_load'  , doc='called after all Model objects are loaded from disk')
 
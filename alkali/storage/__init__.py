@@ -4,3 +4,5 @@ from .file import FileStorage, FileAlreadyLocked
 from .json import JSONStorage
 from .csv import CSVStorage
 from .multi import MultiStorage
+from .journal import JournalStorage
+from .jsonl import JSONLinesStorage
@@ -0,0 +1,416 @@
+import os
+import json
+import itertools
+import threading
+from collections import OrderedDict
+
+from alkali import signals
+from alkali import fields
+from .json import JSONStorage
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+def _key(model_class):
+    """
+    helper function that returns a function that gives the primary
+    key of a record (dict) read from json
+
+    :rtype: function
+    """
+    names = model_class.Meta.pk_fields.keys()
+    return lambda record: tuple(record[name] for name in names)
+
+
+def _dump_pk(model_class, pk):
+    """
+    helper function that writes a primary key the way it appears
+    in a record read from json
+
+    :rtype: ``list``
+    """
+    pk_fields = model_class.Meta.pk_fields.values()
+    values = pk if len(pk_fields) > 1 else (pk,)
+    ret = []
+
+    for field, value in zip(pk_fields, values):
+        if isinstance(field, fields.ForeignKey):
+            field = field.pk_field
+        ret.append( field.dumps(value) )
+
+    return ret
+
+
+class JournalStorage(JSONStorage):
+    """
+    save models as a json snapshot, the same format as
+    :class:`alkali.storage.JSONStorage`, plus a journal of the saves and
+    deletes since, ``<filename>.journal``, one json object per line.
+
+    once the storage has loaded or stored its model every ``save`` and
+    ``delete`` is appended to the journal as it happens, a store only has
+    to make sure it's on disk. reading replays the journal over the snapshot.
+    when the journal gets bigger than ``compact_size`` bytes it's folded
+    into a new snapshot, in a background thread unless ``background`` is False.
+
+    every append is flushed to the operating system so a dying process
+    loses nothing, ``fsync`` (surviving the machine crashing) happens every
+    ``sync_every`` records and/or ``sync_interval`` seconds.
+
+    **Note**: :func:`alkali.manager.Manager.clear` isn't journaled, it's
+    written by the next store
+
+    ::
+
+        db = Database(models=[MyModel], storage=JournalStorage)
+    """
+    extension = 'json'
+
+    def __init__(self, filename=None, sync_every=1, sync_interval=None,
+            compact_size=16 * 2**20, background=True, *args, **kw ):
+        """
+        :param int sync_every: fsync after this many records, None to
+            only use ``sync_interval``
+        :param float sync_interval: fsync at most this many seconds after
+            a record was written, None to only use ``sync_every``
+        :param int compact_size: journal size in bytes that triggers a compaction
+        :param bool background: compact in a background thread
+        """
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self.compact_size = compact_size
+        self.background = background
+
+        self._lock = threading.RLock()
+        self._jhandle = None        # journal, opened on first append
+        self._pending = 0           # records written since last fsync
+        self._timer = None          # pending sync_interval fsync
+        self._thread = None         # running background compaction
+        self._model_class = None
+        self._attached = None       # model class whose signals we journal
+        self._replaying = False     # don't journal our own load
+
+        # a file handle we were given belongs to the caller
+        self._owned = not hasattr(filename, 'read')
+
+        super().__init__(filename, *args, **kw)
+
+    def __del__(self):
+        if getattr(self, '_lock', None) is not None:
+            self.close()
+
+        super().__del__()
+
+    @property
+    def journal(self):
+        """
+        **property**: the journal filename
+        """
+        if self.filename is None:
+            return None
+
+        return self.filename + '.journal'
+
+    @property
+    def _rotated(self):
+        """
+        **property**: the journal being compacted
+        """
+        return self.journal + '.1'
+
+    def read(self, model_class):
+        self.wait()
+        self._model_class = model_class
+        self._replaying = True
+
+        try:
+            key = _key(model_class)
+            records = OrderedDict()
+
+            for record in super().read(model_class):
+                records[key(record)] = record
+
+            if self.journal is not None:
+                self._replay(self._rotated, records, key)
+                self._replay(self.journal, records, key)
+
+            for record in records.values():
+                yield record
+        finally:
+            self._replaying = False
+
+        self._attach(model_class)
+
+    def _replay(self, filename, records, key):
+        """
+        helper function that applies a journal to ``records``, replaying
+        a journal more than once gives the same result
+        """
+        try:
+            f = open(filename)
+        except FileNotFoundError:
+            return
+
+        with f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError: # a write that never finished
+                    logger.warning( "%s: skipping bad journal line: %s", self._name, line )
+                    continue
+
+                if 'put' in entry:
+                    record = entry['put']
+                    records[key(record)] = record
+                else:
+                    records.pop(tuple(entry['delete']), None)
+
+    def write(self, model_class, iterator):
+        """
+        write a new snapshot, the journal is no longer needed
+        """
+        if iterator is None:
+            return False
+
+        self.wait()
+
+        with self._lock:
+            self._model_class = model_class
+            self._write_snapshot(e.dict for e in iterator)
+            self._remove_journal()
+
+        self._attach(model_class)
+        return True
+
+    def write_delta(self, model_class, inserted, updated, deleted):
+        """
+        append the changes to the journal, unless they already are
+        """
+        self._model_class = model_class
+
+        if self._attached is not model_class:
+            entries = [{'put': e.dict} for e in itertools.chain(inserted, updated)]
+            entries.extend( {'delete': _dump_pk(model_class, pk)} for pk in deleted )
+
+            self._append(entries)
+            self._attach(model_class)
+
+        self.sync()
+        return True
+
+    def _attach(self, model_class):
+        """
+        journal every save and delete of ``model_class`` from now on
+        """
+        if self._attached is model_class:
+            return
+
+        self._detach()
+        self._attached = model_class
+
+        signals.post_save.connect(self._on_save, sender=model_class)
+        signals.post_delete.connect(self._on_delete, sender=model_class)
+        signals.post_bulk_save.connect(self._on_bulk_save, sender=model_class)
+        signals.post_bulk_delete.connect(self._on_bulk_delete, sender=model_class)
+
+    def _detach(self):
+        model_class = self._attached
+
+        if model_class is None:
+            return
+
+        signals.post_save.disconnect(self._on_save, sender=model_class)
+        signals.post_delete.disconnect(self._on_delete, sender=model_class)
+        signals.post_bulk_save.disconnect(self._on_bulk_save, sender=model_class)
+        signals.post_bulk_delete.disconnect(self._on_bulk_delete, sender=model_class)
+
+        self._attached = None
+
+    def _on_save(self, sender, instance):
+        if not self._replaying:
+            self._append( [{'put': instance.dict}] )
+
+    def _on_bulk_save(self, sender, instances):
+        if not self._replaying:
+            self._append( [{'put': e.dict} for e in instances] )
+
+    def _on_delete(self, sender, instance):
+        self._append( [{'delete': _dump_pk(sender, instance.pk)}] )
+
+    def _on_bulk_delete(self, sender, instances):
+        self._append( [{'delete': _dump_pk(sender, e.pk)} for e in instances] )
+
+    def _journal_handle(self):
+        """
+        helper function that opens the journal for appending
+        """
+        if self._jhandle is None:
+            self._jhandle = open(self.journal, 'a+')
+
+            # a write that never finished gets a line of its own
+            if self._jhandle.tell():
+                self._jhandle.seek(self._jhandle.tell() - 1)
+                last = self._jhandle.read(1)
+                if last != '\n':
+                    self._jhandle.write('\n')
+
+        return self._jhandle
+
+    def _append(self, entries):
+        """
+        helper function that appends records to the journal, compacting
+        when it gets too big
+        """
+        if not entries or self.journal is None:
+            return
+
+        with self._lock:
+            f = self._journal_handle()
+
+            for entry in entries:
+                f.write(json.dumps(entry))
+                f.write('\n')
+
+            f.flush()
+            self._pending += len(entries)
+
+            if self.sync_every is not None and self._pending >= self.sync_every:
+                self.sync()
+            elif self.sync_interval is not None and self._timer is None:
+                self._timer = threading.Timer(self.sync_interval, self.sync)
+                self._timer.daemon = True
+                self._timer.start()
+
+            full = f.tell() >= self.compact_size
+
+        if full:
+            self.compact(wait=not self.background)
+
+    def sync(self):
+        """
+        make sure the journal is on disk
+        """
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+            if self._jhandle is not None and self._pending:
+                self._jhandle.flush()
+                os.fsync(self._jhandle.fileno())
+
+            self._pending = 0
+
+    def compact(self, wait=True):
+        """
+        fold the journal into a new snapshot. saves and deletes go
+        to a new journal while the old one is folded.
+
+        :param bool wait: wait for the compaction to finish
+        """
+        self.wait()
+
+        with self._lock:
+            if self._model_class is None or self.journal is None:
+                return
+
+            # a compaction that never finished is folded first
+            if not os.path.exists(self._rotated):
+                if not os.path.exists(self.journal) or not os.path.getsize(self.journal):
+                    return
+
+                self.sync()
+                self._close_journal()
+                os.replace(self.journal, self._rotated)
+
+        if wait:
+            self._fold()
+        else:
+            self._thread = threading.Thread(target=self._fold, daemon=True)
+            self._thread.start()
+
+    def _fold(self):
+        try:
+            key = _key(self._model_class)
+            records = OrderedDict()
+
+            for record in JSONStorage.read(self, self._model_class):
+                records[key(record)] = record
+
+            self._replay(self._rotated, records, key)
+            self._write_snapshot(records.values())
+
+            os.remove(self._rotated)
+            logger.debug( "%s: compacted %d records", self._name, len(records) )
+        except Exception as e: # pragma: nocover
+            logger.exception(e)
+
+    def wait(self):
+        """
+        wait for a background compaction to finish
+        """
+        thread = self._thread
+
+        if thread is not None:
+            thread.join()
+            self._thread = None
+
+    def _write_snapshot(self, records):
+        """
+        helper function that writes ``records`` (dicts) to a new file and
+        then swaps it in, the old snapshot is intact until then
+        """
+        filename = self.filename
+        tmp = filename + '.tmp'
+
+        with open(tmp, 'w') as f:
+            self._dump(f, records)
+            f.flush()
+            os.fsync(f.fileno())
+
+        with self._lock:
+            os.replace(tmp, filename)
+
+            # open and lock the new snapshot
+            old = self._fhandle
+            self.filename = filename
+
+            if self._owned:
+                old.close()
+            self._owned = True
+
+    def _close_journal(self):
+        if self._jhandle is not None:
+            self._jhandle.close()
+            self._jhandle = None
+
+    def _remove_journal(self):
+        """
+        helper function that throws away the journal once it's in the snapshot
+        """
+        self.sync()
+        self._close_journal()
+
+        for filename in (self._rotated, self.journal):
+            try:
+                os.remove(filename)
+            except FileNotFoundError:
+                pass
+
+    def close(self):
+        """
+        finish any compaction, sync the journal, stop journaling
+        and let go of our files
+        """
+        self.wait()
+        self._detach()
+
+        with self._lock:
+            self.sync()
+            self._close_journal()
+
+            if self._owned:
+                self.filename = None
+            else:
+                self.unlock()
@@ -1,21 +1,109 @@
+import re
 import json
 
-from alkali.peekorator import Peekorator
 from .file import FileStorage
 
+_whitespace = re.compile(r'[ \t\n\r]*')
+_delimiter = re.compile(r'[ \t\n\r]*([,\]])[ \t\n\r]*')
+
+
+def _iter_array(f, chunk_size):
+    """
+    helper generator that yields the elements of the json array in file
+    ``f`` one at a time. only a buffer of about ``chunk_size`` characters
+    plus the current element are held in memory.
+
+    :raises json.JSONDecodeError: if the file isn't a json array
+    """
+    decode = json.JSONDecoder().raw_decode
+    skip = _whitespace.match
+    delimiter = _delimiter.match
+
+    buf = f.read(chunk_size)
+    pos = skip(buf).end()
+
+    while pos == len(buf):
+        data = f.read(chunk_size)
+        if not data: # empty file
+            return
+        buf += data
+        pos = skip(buf, pos).end()
+
+    if buf[pos] != '[':
+        raise json.JSONDecodeError("Expecting '['", buf, pos)
+
+    pos += 1
+    first = True
+    size = chunk_size
+
+    while True:
+        pos = skip(buf, pos).end()
+        start = pos
+
+        if first and buf[pos:pos+1] == ']':
+            return
+
+        # everything in the buffer, a C call to decode each element
+        # and a regex call for the delimiter after it
+        while True:
+            try:
+                elem, end = decode(buf, pos)
+            except json.JSONDecodeError:
+                break
+
+            # an element is followed by ',' or ']', a buffer ending
+            # before one may have cut it short, eg. a number at '3.'
+            m = delimiter(buf, end)
+            if m is None:
+                break
+
+            yield elem
+            pos = m.end()
+            first = False
+
+            if m.group(1) == ']':
+                return
+
+        # elements bigger than the buffer get a bigger read
+        size = chunk_size if pos > start else size * 2
+        data = f.read(size)
+
+        if not data:
+            # at the end of the file, raise the error decoding gives
+            elem, end = decode(buf, pos)
+            raise json.JSONDecodeError("Expecting ',' delimiter", buf, end)
+
+        buf = buf[pos:] + data
+        pos = 0
+
+
 class JSONStorage(FileStorage):
     """
     save models in json format
+
+    ``compact`` files have no whitespace between records, they are
+    several times quicker to write. either kind can be read.
     """
     extension = 'json'
 
-    def read(self, model_class):
-        data = super().read(model_class)
+    # characters read at a time, records written at a time
+    chunk_size = 2**16
+    write_chunk = 1000
 
-        if not data:
-            return
+    def __init__(self, filename=None, compact=False, *args, **kw ):
+        """
+        :param bool compact: write without indentation
+        """
+        self._compact = compact
+        super().__init__(filename, *args, **kw)
 
-        for elem in json.loads(data):
+    def read(self, model_class):
+        """
+        yield one record (dict) at a time, the file is parsed as it's read
+        """
+        self._fhandle.seek(0)
+
+        for elem in _iter_array(self._fhandle, self.chunk_size):
             yield elem
 
     def write(self, model_class, iterator):
@@ -26,17 +114,7 @@ class JSONStorage(FileStorage):
         f = self._fhandle
         f.seek(0)
 
-        f.write('[\n')
-
-        _peek = Peekorator(iter(iterator))
-        for e in _peek:
-            data = json.dumps(e.dict, indent='  ')
-            f.write(data)
-
-            if not _peek.is_last():
-                f.write(',\n')
-
-        f.write('\n]')
+        self._dump(f, (e.dict for e in iterator))
 
         # since the file may shrink (we've deleted records) then
         # we must truncate the file at our current position to avoid
@@ -45,3 +123,35 @@ class JSONStorage(FileStorage):
         f.flush()
 
         return True
+
+    def _dump(self, f, records):
+        """
+        helper function that writes ``records`` (dicts) to ``f`` as a
+        json array, ``write_chunk`` records at a time
+        """
+        if self._compact:
+            # one call to the C encoder per chunk, json.dumps() with
+            # indent is pure python
+            encode = json.JSONEncoder(separators=(',', ':')).encode
+            chunk_text = lambda records: encode(records)[1:-1]
+        else:
+            encode = json.JSONEncoder(indent='  ').encode
+            chunk_text = lambda records: ',\n'.join(map(encode, records))
+
+        chunk = []
+        first = True
+
+        for record in records:
+            chunk.append( record )
+
+            if len(chunk) >= self.write_chunk:
+                f.write('[\n' if first else ',\n')
+                f.write(chunk_text(chunk))
+                chunk = []
+                first = False
+
+        if chunk or first:
+            f.write('[\n' if first else ',\n')
+            f.write(chunk_text(chunk))
+
+        f.write('\n]')
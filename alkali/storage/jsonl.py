@@ -0,0 +1,134 @@
+import json
+
+from .file import FileStorage
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+class JSONLinesStorage(FileStorage):
+    """
+    save models in json lines format, one json object per line
+
+    new instances are appended to the end of the file, a store with
+    updates or deletes rewrites the file. :func:`JSONLinesStorage.tail`
+    reads only the records appended since a byte offset, by default
+    since we last read the file.
+
+    like other storages every record must have its own primary key, a
+    record appended by somebody else for an existing primary key replaces
+    ours when tailed but needs a full store before the next load
+
+    ::
+
+        db = Database(models=[Episode], storage=JSONLinesStorage)
+        ...
+        Episode.objects.tail( db.get_storage(Episode) )
+    """
+    extension = 'jsonl'
+
+    def __init__(self, filename=None, *args, **kw ):
+        self.offset = 0 # end of the last complete record we've seen
+        super().__init__(filename, *args, **kw)
+
+    @property
+    def _binary(self):
+        """
+        **property**: our file as bytes so offsets are byte offsets
+        """
+        f = self._fhandle
+        f.flush()
+        return getattr(f, 'buffer', f)
+
+    def read(self, model_class):
+        """
+        yield one record (dict) per line
+        """
+        return self.tail(model_class, offset=0)
+
+    def tail(self, model_class, offset=None):
+        """
+        yield the records (dicts) after byte ``offset``, a last line that's
+        still being written is left for next time
+
+        :param offset: byte offset, None for where we last stopped reading
+        :rtype: ``generator``
+        """
+        f = self._binary
+        f.seek(self.offset if offset is None else offset)
+
+        while True:
+            line = f.readline()
+
+            if not line.endswith(b'\n'):
+                break
+
+            self.offset = f.tell()
+            line = line.strip()
+
+            if not line:
+                continue
+
+            try:
+                record = json.loads(line)
+            except ValueError: # a write that never finished
+                logger.warning( "%s: skipping bad line: %s", self._name, line )
+                continue
+
+            yield record
+
+    def write(self, model_class, iterator):
+        if iterator is None:
+            return False
+
+        f = self._binary
+        f.seek(0)
+
+        # f is buffered, records only hit the disk a buffer at a time
+        for e in iterator:
+            f.write( json.dumps(e.dict).encode() )
+            f.write( b'\n' )
+
+        f.truncate()
+        f.flush()
+
+        self.offset = f.tell()
+        return True
+
+    def append(self, model_class, iterator):
+        """
+        add records to the end of the file
+
+        :param iterator: model instances
+        """
+        f = self._binary
+        start = f.seek(0, 2)
+
+        # a line that never finished gets a line of its own
+        if start:
+            f.seek(start - 1)
+            if f.read(1) != b'\n':
+                f.write( b'\n' )
+
+        for e in iterator:
+            f.write( json.dumps(e.dict).encode() )
+            f.write( b'\n' )
+
+        f.flush()
+
+        # we don't need to read our own records
+        if self.offset == start:
+            self.offset = f.tell()
+
+        return True
+
+    def write_delta(self, model_class, inserted, updated, deleted):
+        """
+        append new instances, anything else needs a full ``write``
+        """
+        updated = list(updated)
+
+        if updated or deleted:
+            return False
+
+        return self.append(model_class, inserted)
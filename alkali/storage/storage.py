@@ -15,3 +15,15 @@ class Storage:
 
     def write(self, model_class, iterator):
         raise NotImplementedError()
+
+    def write_delta(self, model_class, inserted, updated, deleted):
+        """
+        write only what changed since the last write, storages that can't
+        return False and get a full ``write`` instead
+
+        :param inserted: iterable of new model instances
+        :param updated: iterable of changed model instances
+        :param deleted: iterable of primary keys that are gone
+        :rtype: ``bool`` True if the changes were written
+        """
+        return False
@@ -25,6 +25,23 @@ class MyDepModel(Model):
     pk1     = fields.IntField(primary_key=True)
     foreign = fields.ForeignKey(MyModel)
 
+class MyDepDepModel(Model):
+    id  = fields.IntField(primary_key=True)
+    dep = fields.ForeignKey(MyDepModel)
+
+class MyIndexed(Model):
+    id    = fields.IntField(primary_key=True)
+    name  = fields.StringField(indexed=True)
+    num   = fields.IntField(indexed=True)
+    date  = fields.DateTimeField(indexed=True)
+    other = fields.StringField()
+
+class MyDocument(Model):
+    id    = fields.IntField(primary_key=True)
+    title = fields.StringField(searchable=True)
+    body  = fields.StringField()
+    log   = fields.StringField(trigrams=True)
+
 class Entry(Model):
     date  = fields.DateTimeField(primary_key = True)
 
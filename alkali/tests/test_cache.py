@@ -0,0 +1,124 @@
+import unittest
+import tempfile
+
+from alkali.cache import ResultCache, CacheInfo
+from alkali.query import Q
+from alkali.storage import JSONStorage
+
+from . import MyModel, MyDepModel
+
+class TestCache( unittest.TestCase ):
+
+    def setUp(self):
+        MyModel.objects.cache_clear()
+
+    def tearDown(self):
+        MyModel.objects.clear()
+        MyDepModel.objects.clear()
+        MyModel.objects.cache_clear()
+
+    def test_1(self):
+        "test the lru mechanics"
+        cache = ResultCache(maxsize=2)
+
+        self.assertIsNone( cache.get(1, 'a') )
+        cache.put(1, 'a', 'A')
+        cache.put(1, 'b', 'B')
+        self.assertEqual( 'A', cache.get(1, 'a') )
+
+        cache.put(1, 'c', 'C') # b is least recently used
+        self.assertIsNone( cache.get(1, 'b') )
+        self.assertEqual( CacheInfo(1, 2, 2, 2), cache.info() )
+
+        # new version, old results are gone
+        self.assertIsNone( cache.get(2, 'a') )
+        self.assertEqual( 0, len(cache) )
+
+        cache.clear()
+        self.assertEqual( CacheInfo(0, 0, 2, 0), cache.info() )
+
+        cache = ResultCache(maxsize=0)
+        cache.put(1, 'a', 'A')
+        self.assertIsNone( cache.get(1, 'a') )
+        self.assertEqual( 0, len(cache) )
+
+    def test_2(self):
+        "version goes up with every change"
+        man = MyModel.objects
+        version = man.version
+
+        m = MyModel(int_type=1, str_type='a').save()
+        self.assertGreater( man.version, version )
+
+        version = man.version
+        man.delete(m)
+        self.assertGreater( man.version, version )
+
+        version = man.version
+        man.clear()
+        self.assertGreater( man.version, version )
+
+        tfile = tempfile.NamedTemporaryFile()
+        storage = JSONStorage(tfile.name)
+        MyModel(int_type=1, str_type='a').save()
+        man.store(storage)
+
+        version = man.version
+        man.load(storage)
+        self.assertGreater( man.version, version )
+
+    def test_3(self):
+        "identical queries are answered from the cache"
+        man = MyModel.objects
+
+        for i in range(10):
+            MyModel(int_type=i, str_type='string %d' % (i % 3)).save()
+
+        q = lambda: man.filter(str_type='string 0').order_by('-int_type')
+
+        self.assertEqual( [9, 6, 3, 0], q().values_list('int_type', flat=True) )
+        self.assertEqual( (0, 1), man.cache_info()[:2] )
+
+        self.assertEqual( [9, 6, 3, 0], q().values_list('int_type', flat=True) )
+        self.assertEqual( 4, q().count )
+        self.assertEqual( (2, 1), man.cache_info()[:2] )
+
+        # same plan, different spelling
+        q2 = man.filter(Q(int_type__in=[1, 2]) | Q(str_type='string 0'), int_type__lt=5)
+        q3 = man.filter(int_type__lt=5).filter(Q(int_type__in=[1, 2]) | Q(str_type='string 0'))
+        self.assertEqual( [0, 1, 2, 3], q2.values_list('int_type', flat=True) )
+        self.assertEqual( [0, 1, 2, 3], q3.values_list('int_type', flat=True) )
+        self.assertEqual( (3, 2), man.cache_info()[:2] )
+
+        # values of a different type are a different plan
+        self.assertEqual( 1, len(man.filter(int_type=1.0)) )
+        self.assertEqual( (3, 3), man.cache_info()[:2] )
+
+        MyModel(int_type=12, str_type='string 0').save()
+        self.assertEqual( [12, 9, 6, 3, 0], q().values_list('int_type', flat=True) )
+        self.assertEqual( (3, 4), man.cache_info()[:2] )
+
+    def test_4(self):
+        "results that can change without a new version aren't cached"
+        man = MyModel.objects
+
+        for i in range(3):
+            MyModel(int_type=i, str_type='string').save()
+
+        man.filter(iter_type__rin=1).count
+        man.order_by('iter_type').first()
+        self.assertEqual( (0, 0, 128, 0), man.cache_info() )
+
+        q = man.all().annotate(foo=lambda e: e.int_type)
+        info = man.cache_info()
+        self.assertEqual( 1, q.filter(foo=1).count )
+        self.assertEqual( info, man.cache_info() )
+
+        # a foreign key compared by pk is fine
+        m = man.get(int_type=1)
+        MyDepModel(pk1=1, foreign=m).save()
+        MyDepModel.objects.cache_clear()
+
+        MyDepModel.objects.filter(foreign=m).count
+        MyDepModel.objects.filter(foreign=m).count
+        self.assertEqual( (1, 1), MyDepModel.objects.cache_info()[:2] )
@@ -349,12 +349,27 @@ class TestField( unittest.TestCase ):
         self.assertEqual(1, AuxInfoSync.objects.count)
         self.assertEqual(1, e.auxinfosync_set.count)
 
+        # not dirty, but a store of just the changes has to write it
+        self.assertEqual({e.pk}, AuxInfoSync.objects.changes.inserted)
+
         Entry.objects.delete(e)
         self.assertEqual(0, AuxInfoSync.objects.count)
 
         del e
         self.assertEqual(0, AuxInfoSync.objects.count)
 
+        # and in bulk
+        entries = [Entry(pk=now + dt.timedelta(seconds=i)) for i in range(3)]
+        Entry.objects.bulk_create(entries)
+        self.assertEqual(3, AuxInfoSync.objects.count)
+        self.assertEqual(1, entries[0].auxinfosync_set.count)
+        self.assertEqual({e.pk for e in entries}, AuxInfoSync.objects.changes.inserted)
+
+        Entry.objects.bulk_delete([e.pk for e in entries[:2]])
+        self.assertEqual(1, AuxInfoSync.objects.count)
+        Entry.objects.clear()
+        AuxInfoSync.objects.clear()
+
     def test_uuid(self):
         class AutoModel1(Model):
             auto = IntField(primary_key=True, auto_increment=True)
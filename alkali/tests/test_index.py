@@ -0,0 +1,413 @@
+import unittest
+import tempfile
+import datetime as dt
+
+from alkali.index import Index, HashIndex, SortedIndex
+from alkali.query import Query
+from alkali.storage import JSONStorage
+from alkali import tznow
+
+from . import MyModel, MyIndexed, MyDocument
+
+class TestIndex( unittest.TestCase ):
+
+    def tearDown(self):
+        MyDocument.objects.clear()
+        MyIndexed.objects.clear()
+        MyModel.objects.clear()
+
+    def test_1(self):
+        "verify class/instance implementation"
+        field = MyIndexed.Meta.fields['name']
+        index = HashIndex(field)
+
+        self.assertTrue( repr(index) )
+        self.assertEqual( 0, len(index) )
+
+        with self.assertRaises(NotImplementedError):
+            Index(field)
+
+    def test_2(self):
+        "test adding and removing values"
+        index = HashIndex(MyIndexed.Meta.fields['name'])
+
+        index.add(1, 'a')
+        index.add(2, 'a')
+        index.add(3, 'b')
+        index.add(4, {'unhashable'})
+
+        self.assertEqual( {1, 2}, index.get('a') )
+        self.assertEqual( {3}, index.lookup('eq', 'b') )
+        self.assertEqual( {1, 2, 3}, index.lookup('in', ['a', 'b']) )
+        self.assertEqual( set(), index.get('c') )
+
+        self.assertIsNone( index.lookup('gt', 'a') )
+        self.assertIsNone( index.lookup('in', 'ab') )
+        self.assertIsNone( index.lookup('eq', ['a']) )
+
+        index.remove(1, 'a')
+        index.remove(3, 'b')
+        index.remove(3, 'c') # no-op
+        self.assertEqual( {2}, index.get('a') )
+        self.assertEqual( 1, len(index) )
+
+    def test_3(self):
+        "manager only indexes fields with indexed=True"
+        indexes = MyIndexed.objects._indexes
+        self.assertEqual( ['name', 'num', 'date'], list(indexes.keys()) )
+        self.assertEqual( {}, MyModel.objects._indexes )
+
+        # numbers and dates also get a sorted index
+        self.assertEqual( [HashIndex], [type(i) for i in indexes['name']] )
+        self.assertEqual( [HashIndex, SortedIndex], [type(i) for i in indexes['num']] )
+        self.assertEqual( [HashIndex, SortedIndex], [type(i) for i in indexes['date']] )
+
+    def test_4(self):
+        "indexes follow save, delete and clear"
+        man = MyIndexed.objects
+
+        m1 = MyIndexed(id=1, name='a').save()
+        m2 = MyIndexed(id=2, name='a').save()
+        self.assertEqual( {1, 2}, man._lookup('name', 'eq', 'a') )
+
+        m1.name = 'b'
+        m1.save()
+        self.assertEqual( {2}, man._lookup('name', 'eq', 'a') )
+        self.assertEqual( {1}, man._lookup('name', 'eq', 'b') )
+
+        man.delete(m2)
+        self.assertEqual( set(), man._lookup('name', 'eq', 'a') )
+
+        man.clear()
+        self.assertEqual( set(), man._lookup('name', 'eq', 'b') )
+        self.assertIsNone( man._lookup('other', 'eq', 'b') )
+
+    def test_5(self):
+        "queries on indexed fields give the same answer as a scan"
+        for i in range(10):
+            MyIndexed(id=i, name='name %d' % (i % 3), other='name %d' % (i % 3)).save()
+
+        for value in ['name 0', 'name 1', 'name 4']:
+            indexed = MyIndexed.objects.filter(name=value).values_list('id', flat=True)
+            scanned = MyIndexed.objects.filter(other=value).values_list('id', flat=True)
+            self.assertEqual( scanned, indexed )
+
+        values = ['name 0', 'name 2']
+        indexed = MyIndexed.objects.filter(name__in=values).values_list('id', flat=True)
+        scanned = MyIndexed.objects.filter(other__in=values).values_list('id', flat=True)
+        self.assertEqual( scanned, indexed )
+
+        q = MyIndexed.objects.order_by('-id').filter(name='name 0')
+        self.assertEqual( [9, 6, 3, 0], q.values_list('id', flat=True) )
+
+        self.assertEqual( 7, MyIndexed.objects.get(name='name 1', id__gt=5).id )
+
+    def test_6(self):
+        "a query made before the manager changed doesn't use the index"
+        MyIndexed(id=1, name='a').save()
+
+        q = Query(MyIndexed.objects)
+        MyIndexed(id=2, name='a').save()
+
+        self.assertEqual( 1, len(q.filter(name='a')) )
+
+    def test_7(self):
+        "test sorted index ranges"
+        index = SortedIndex(MyIndexed.Meta.fields['num'])
+
+        for pk, value in enumerate([5, 1, 3, 3, None, 9]):
+            index.add(pk, value)
+
+        self.assertEqual( 5, len(index) )
+        self.assertEqual( [1, 2, 3, 0, 5], index.range() )
+        self.assertEqual( [2, 3, 0], index.range(lo=3, hi=5) )
+        self.assertEqual( [0], index.range(lo=3, hi=5, lo_incl=False) )
+        self.assertEqual( [2, 3], index.range(lo=3, hi=5, hi_incl=False) )
+
+        self.assertEqual( {0, 5}, index.lookup('gt', 3) )
+        self.assertEqual( {2, 3, 0, 5}, index.lookup('ge', 3) )
+        self.assertEqual( {1}, index.lookup('lt', 3) )
+        self.assertEqual( {1, 2, 3}, index.lookup('le', 3) )
+        self.assertIsNone( index.lookup('eq', 3) )
+        self.assertIsNone( index.lookup('gt', None) )
+        self.assertIsNone( index.lookup('gt', 'a string') )
+
+        index.remove(3, 3)
+        index.remove(4, None)
+        self.assertEqual( [1, 2, 0, 5], index.range() )
+
+        # values shared by many instances, one at a time or merged in a batch
+        for batch_size in [10**6, 1]:
+            index = SortedIndex(MyIndexed.Meta.fields['num'])
+            index.batch_size = batch_size
+
+            old = [MyIndexed(id=i, num=i % 3) for i in range(30)]
+            new = [MyIndexed(id=i, num=i % 2 or None) for i in range(0, 30, 2)]
+            index.update_many('num', [(e.pk, None, e) for e in old])
+            index.update_many('num', [(e.pk, old[e.pk], e) for e in new])
+            index.update_many('num', [(1, old[1], None)])
+
+            self.assertEqual( 14, len(index) )
+            self.assertEqual( list(range(3, 30, 6)), index.range(lo=0, hi=0) )
+            self.assertEqual( list(range(7, 30, 6)), index.range(lo=1, hi=1) )
+            self.assertEqual( list(range(5, 30, 6)), index.range(lo=2) )
+
+    def test_7a(self):
+        "sorted index work per save doesn't grow with the index"
+        import random
+
+        index = SortedIndex(MyIndexed.Meta.fields['num'])
+        index.load = 4
+        index.batch_size = 10**6
+        rnd = random.Random(7)
+        values = {}
+
+        def check():
+            expected = [pk for _, pk in sorted((v, pk) for pk, v in values.items())]
+            self.assertEqual( expected, index.range() )
+            self.assertEqual( len(values), len(index) )
+            self.assertLessEqual( max(len(block) for block in index._blocks), 2 * index.load )
+
+        # saves in a row are only sorted in by the next range query
+        for pk in range(200):
+            values[pk] = rnd.randrange(20)
+            index.add(pk, values[pk])
+
+        self.assertEqual( [], index._blocks )
+        check()
+
+        # interleaved saves, deletes and queries only touch one small block
+        for step in range(500):
+            pk = rnd.randrange(250)
+
+            if pk in values:
+                index.remove(pk, values.pop(pk))
+            else:
+                values[pk] = rnd.randrange(20)
+                index.add(pk, values[pk])
+
+            if step % 7 == 0:
+                check()
+                self.assertEqual( sorted(pk for pk, v in values.items() if 5 <= v < 9),
+                        sorted(index.range(lo=5, hi=9, hi_incl=False)) )
+
+        check()
+
+    def test_8(self):
+        "range queries on indexed fields give the same answer as a scan"
+        now = tznow()
+
+        for i in range(20):
+            MyIndexed(id=i, num=i % 7, date=now - dt.timedelta(days=i)).save()
+
+        q = MyIndexed.objects.filter(num__gt=2, num__le=5)
+        self.assertEqual( [i for i in range(20) if 2 < i % 7 <= 5], q.values_list('id', flat=True) )
+
+        week_ago = now - dt.timedelta(days=7)
+        q = MyIndexed.objects.filter(date__ge=week_ago)
+        self.assertEqual( list(range(8)), q.values_list('id', flat=True) )
+
+        q = MyIndexed.objects.order_by('-id').filter(date__lt=week_ago)
+        self.assertEqual( list(range(19, 7, -1)), q.values_list('id', flat=True) )
+
+    def test_9(self):
+        "indexes are rebuilt after loading"
+        tfile = tempfile.NamedTemporaryFile()
+        storage = JSONStorage(tfile.name)
+
+        for i in range(5):
+            MyIndexed(id=i, name='name %d' % (i % 2), num=i).save()
+
+        MyIndexed.objects.store(storage)
+        MyIndexed.objects.clear()
+        self.assertEqual( set(), MyIndexed.objects._lookup('num', 'gt', 0) )
+
+        MyIndexed.objects.load(storage)
+        self.assertEqual( {0, 2, 4}, MyIndexed.objects._lookup('name', 'eq', 'name 0') )
+        self.assertEqual( {3, 4}, MyIndexed.objects._lookup('num', 'gt', 2) )
+
+    def test_10(self):
+        "Q trees use the indexes"
+        from alkali.query import Q
+
+        for i in range(10):
+            MyIndexed(id=i, name='name %d' % (i % 3), num=i).save()
+
+        q = MyIndexed.objects.all()
+        self.assertEqual( {0, 3, 6, 9, 8}, q._resolve(Q(name='name 0') | Q(num__gt=7), {}) )
+
+        q = MyIndexed.objects.filter( Q(name='name 0') | Q(num__gt=7) )
+        self.assertEqual( [0, 3, 6, 8, 9], q.values_list('id', flat=True) )
+
+    def test_11(self):
+        "derived indexes are built on demand and follow save and delete"
+        from alkali.index import FoldedIndex, DatePartIndex
+
+        date = dt.datetime(2017, 3, 5, 12, 30, tzinfo=dt.timezone.utc) # a sunday
+
+        m1 = MyModel(int_type=1, str_type='Foo Bar', dt_type=date).save()
+        MyModel(int_type=2, str_type='bar', dt_type=date + dt.timedelta(days=400)).save()
+
+        man = MyModel.objects
+        self.assertEqual( {}, man._derived )
+
+        self.assertEqual( {1}, man._lookup('str_type', 'iexact', 'FOO BAR') )
+        self.assertEqual( {1, 2}, man._lookup('str_type', 'icontains', 'BAR') )
+        self.assertEqual( {2}, man._lookup('str_type', 'istartswith', 'Ba') )
+        self.assertEqual( {1}, man._lookup('str_type', 'iendswith', 'O bAR') )
+        self.assertEqual( [FoldedIndex], [type(i) for i in man._derived['str_type']] )
+
+        self.assertEqual( {1}, man._lookup('dt_type', 'year', 2017) )
+        self.assertEqual( {1}, man._lookup('dt_type', 'week_day', 1) )
+        self.assertEqual( {1, 2}, man._lookup('dt_type', 'minute', 30) )
+        self.assertEqual( {2}, man._lookup('dt_type', 'date', dt.date(2018, 4, 9)) )
+        self.assertEqual( [DatePartIndex], [type(i) for i in man._derived['dt_type']] )
+
+        self.assertIsNone( man._lookup('str_type', 'year', 2017) )
+        self.assertIsNone( man._lookup('iter_type', 'iexact', 'a') )
+
+        m1.str_type = 'baz'
+        m1.save()
+        man.delete( man.get(int_type=2) )
+        self.assertEqual( {1}, man._lookup('str_type', 'icontains', 'BA') )
+        self.assertEqual( set(), man._lookup('dt_type', 'year', 2018) )
+
+        man.clear()
+        self.assertEqual( {}, man._derived )
+
+        # None never matches, indexed or scanned
+        for i, value in enumerate(['Foo', None, 'bar', None]):
+            MyModel(int_type=i, str_type=value).save()
+
+        for oper in ['icontains', 'istartswith', 'iendswith']:
+            kw = {'str_type__' + oper: ''}
+            indexed = man.filter(**kw).values_list('int_type', flat=True)
+
+            # a snapshot older than the indexes is scanned
+            q = man.all()
+            man.get(int_type=0).save()
+            scanned = q.filter(**kw).values_list('int_type', flat=True)
+
+            self.assertEqual( [0, 2], indexed, oper )
+            self.assertEqual( [0, 2], scanned, oper )
+
+    def test_12(self):
+        "range queries use the sorted index"
+        for i in range(10):
+            MyIndexed(id=i, num=i).save()
+
+        self.assertEqual( {3, 4, 5}, MyIndexed.objects._lookup('num', 'range', (3, 5)) )
+        self.assertIsNone( MyIndexed.objects._lookup('num', 'range', (3, None)) )
+
+        q = MyIndexed.objects.filter(num__range=(3, 5))
+        self.assertEqual( [3, 4, 5], q.values_list('id', flat=True) )
+
+    def test_13(self):
+        "search the words of a searchable field"
+        from alkali.index import TokenIndex
+
+        titles = [
+            'Python and Rust',
+            'python, web frameworks',
+            'Rusty pipes',
+            'The web in 2017',
+            None,
+        ]
+
+        for i, title in enumerate(titles):
+            MyDocument(id=i, title=title, body=title).save()
+
+        index = MyDocument.objects._indexes['title'][0]
+        self.assertIsInstance( index, TokenIndex )
+
+        expected = [
+            ( 'python', [0, 1] ),
+            ( 'PYTHON web', [1] ),
+            ( 'python OR web', [0, 1, 3] ),
+            ( 'rust', [0] ),
+            ( 'rust*', [0, 2] ),
+            ( 'rust* python OR 2017', [0, 3] ),
+            ( 'web-frameworks', [1] ),
+            ( 'java', [] ),
+            ( '', [] ),
+        ]
+
+        for search, ids in expected:
+            self.assertEqual( set(ids), index.lookup('search', search), search )
+
+            q = MyDocument.objects.filter(title__search=search)
+            self.assertEqual( ids, q.values_list('id', flat=True), search )
+
+            # scan
+            q = MyDocument.objects.filter(body__search=search)
+            self.assertEqual( ids, q.values_list('id', flat=True), search )
+
+        self.assertIsNone( index.lookup('eq', 'python') )
+
+    def test_14(self):
+        "postings follow save and delete"
+        man = MyDocument.objects
+
+        d = MyDocument(id=1, title='python').save()
+        MyDocument(id=2, title='rust').save()
+
+        d.title = 'pythonic rust'
+        d.save()
+        self.assertEqual( set(), man._lookup('title', 'search', 'python') )
+        self.assertEqual( {1}, man._lookup('title', 'search', 'python*') )
+        self.assertEqual( {1, 2}, man._lookup('title', 'search', 'rust') )
+
+        man.delete( man.get(id=2) )
+        self.assertEqual( {1}, man._lookup('title', 'search', 'rust') )
+        self.assertEqual( 2, len(man._indexes['title'][0]) )
+
+    def test_15(self):
+        "regex and substring queries narrowed by trigrams"
+        import re
+        from alkali.index import TrigramIndex
+
+        lines = [
+            'ERROR: disk 1 failed',
+            'error: Disk 22 failed',
+            'INFO: disk 3 ok',
+            'ERROR: network down',
+            None,
+            'STRASSE closed',
+        ]
+
+        for i, line in enumerate(lines):
+            MyDocument(id=i, log=line, body=line).save()
+
+        index = MyDocument.objects._indexes['log'][0]
+        self.assertIsInstance( index, TrigramIndex )
+
+        self.assertEqual( ['ERROR: disk ', ' failed'], index.literals('re', r'ERROR: disk \d+ failed') )
+        self.assertEqual( ['disk', 'fail'], index.literals('re', r'(disk)\s+\d(?:fail)+') )
+        self.assertEqual( ['a'], index.literals('re', r'a(b|c)d?') )
+        self.assertIsNone( index.literals('re', '(') )
+
+        # nothing to go on
+        self.assertIsNone( index.candidates('re', r'\d+') )
+        self.assertIsNone( index.lookup('re', r'ab') )
+        self.assertIsNone( index.lookup('eq', 'disk') )
+
+        expected = [
+            ( {'__re': r'ERROR: disk \d+ failed'}, [0] ),
+            ( {'__rei': r'ERROR: disk \d+ failed'}, [0, 1] ),
+            ( {'__re': re.compile(r'disk \d')}, [0, 2] ),
+            ( {'__re': r'^ERR'}, [0, 3] ),
+            ( {'__re': r'\w+: \w+'}, [0, 1, 2, 3] ),
+            ( {'__contains': 'disk'}, [0, 2] ),
+            ( {'__icontains': 'DISK'}, [0, 1, 2] ),
+            ( {'__contains': 'xyz'}, [] ),
+            ( {'__re': re.compile('dis k', re.VERBOSE)}, [0, 2] ),
+            ( {'__icontains': 'straße'}, [5] ),
+        ]
+
+        for kw, ids in expected:
+            for field in ['log', 'body']: # indexed and scanned
+                q = MyDocument.objects.filter(**{field + k: v for k, v in kw.items()})
+                self.assertEqual( ids, q.values_list('id', flat=True), (field, kw) )
+
+        MyDocument.objects.delete( MyDocument.objects.get(id=0) )
+        self.assertEqual( {2}, MyDocument.objects._lookup('log', 'contains', 'disk') )
@@ -276,3 +276,205 @@ class TestManager( unittest.TestCase ):
         self.assertEqual(1, MyModel.objects.get(int_type=1).int_type)
 
         self.assertEqual(1, MyModel.objects.count)
+
+    def test_bulk_create(self):
+        man = MyModel.objects
+        version = man.version
+
+        saved = man.bulk_create( MyModel(int_type=i, str_type='s%d' % i) for i in range(5) )
+        self.assertEqual( 5, len(saved) )
+        self.assertEqual( 5, man.count )
+        self.assertEqual( version + 1, man.version )
+        self.assertTrue( man.dirty )
+
+        # we hold copies
+        saved[0].str_type = 'changed'
+        self.assertEqual( 's0', man.get(0).str_type )
+
+        # nothing is saved if any pk is bad
+        with self.assertRaises(KeyError):
+            man.bulk_create( [MyModel(int_type=10), MyModel(int_type=4)] )
+        with self.assertRaises(KeyError):
+            man.bulk_create( [MyModel(int_type=10), MyModel(int_type=10)] )
+        with self.assertRaises(MyModel.EmptyPrimaryKey):
+            man.bulk_create( [MyModel(int_type=10), MyModel()] )
+        self.assertEqual( 5, man.count )
+
+        self.assertEqual( [], man.bulk_create([]) )
+
+    def test_bulk_update(self):
+        from . import MyIndexed
+
+        man = MyIndexed.objects
+        man.bulk_create( MyIndexed(id=i, name='a', num=i, other='x') for i in range(4) )
+
+        try:
+            elems = [man.get(i) for i in range(2)]
+            for elem in elems:
+                elem.name = 'b'
+                elem.other = 'y'
+
+            version = man.version
+            self.assertEqual( 2, man.bulk_update(elems, fields=['name']) )
+            self.assertEqual( version + 1, man.version )
+
+            # only the given fields are copied, the indexes follow along
+            self.assertEqual( [0, 1], man.filter(name='b').values_list('id', flat=True) )
+            self.assertEqual( 4, man.filter(other='x').count )
+
+            self.assertEqual( 2, man.bulk_update(elems) )
+            self.assertEqual( 2, man.filter(other='y').count )
+
+            with self.assertRaises(AttributeError):
+                man.bulk_update(elems, fields=['id'])
+            with self.assertRaises(AttributeError):
+                man.bulk_update(elems, fields=['foo'])
+            with self.assertRaises(KeyError):
+                man.bulk_update( [MyIndexed(id=99)] )
+
+            # auto_now fields are kept current
+            from . import AutoModel1
+            m = AutoModel1(f1='a').save()
+            modified = AutoModel1.objects.get(m.pk).modified
+            m.f1 = 'b'
+            AutoModel1.objects.bulk_update([m], fields=['f1'])
+            self.assertEqual( 'b', AutoModel1.objects.get(m.pk).f1 )
+            self.assertGreater( AutoModel1.objects.get(m.pk).modified, modified )
+            AutoModel1.objects.clear()
+        finally:
+            man.clear()
+
+    def test_bulk_delete(self):
+        man = MyModel.objects
+        man.bulk_create( MyModel(int_type=i) for i in range(5) )
+        MyDepModel.objects.bulk_create( [
+            MyDepModel(pk1=1, foreign=man.get(1)),
+            MyDepModel(pk1=2, foreign=man.get(4)) ] )
+
+        self.assertEqual( 0, man.bulk_delete([]) )
+        self.assertEqual( 2, man.bulk_delete([1, 3, 3, 99]) )
+        self.assertEqual( [0, 2, 4], sorted(man.pks) )
+
+        # children go with their parents
+        self.assertEqual( [2], MyDepModel.objects.pks )
+        self.assertEqual( 0, man.filter(int_type=1).count )
+
+    def test_get_compound_pk(self):
+        from . import MyMulti
+
+        man = MyMulti.objects
+        man.bulk_create( MyMulti(pk1=i, pk2=j, other='%d-%d' % (i, j)) for i in range(3) for j in range(3) )
+
+        try:
+            self.assertEqual( '1-2', man.get((1, 2)).other )
+            self.assertEqual( '1-2', man.get(1, 2).other )
+            self.assertEqual( '1-2', man.get(pk=(1, 2)).other )
+            self.assertEqual( '1-2', man.get(pk2=2, pk1=1).other )
+            self.assertEqual( '1-2', man.get(pk1='1', pk2='2').other )
+
+            # a copy, like any other get
+            man.get(1, 2).other = 'changed'
+            self.assertEqual( '1-2', man.get(1, 2).other )
+
+            self.assertRaises( KeyError, man.get, (1, 5) )
+            self.assertRaises( KeyError, man.get, 1 )
+            self.assertRaises( MyMulti.DoesNotExist, man.get, pk1=1, pk2=5 )
+            self.assertRaises( MyMulti.DoesNotExist, man.get, pk1=1, pk2='foo' )
+            self.assertRaises( MyMulti.MultipleObjectsReturned, man.get, pk1=1 )
+
+            m = man.get_or_create(pk1=5, pk2=6, other='new')
+            self.assertEqual( (5, 6), m.pk )
+            self.assertEqual( 10, man.count )
+            self.assertEqual( 'new', man.get_or_create(pk=(5, 6)).other )
+            self.assertEqual( 10, man.count )
+
+            # single pk fields by name are direct too
+            MyModel(int_type=1).save()
+            self.assertEqual( 1, MyModel.objects.get(int_type='1').int_type )
+            self.assertRaises( MyModel.DoesNotExist, MyModel.objects.get, int_type=2 )
+        finally:
+            man.clear()
+
+    def test_changes(self):
+        "only changes are offered to storages that can write them"
+        from alkali.storage import Storage
+
+        class DeltaStorage(Storage):
+            def __init__(self, accept=True):
+                self.accept = accept
+                self.deltas = []
+                self.writes = 0
+
+            def read(self, model_class):
+                return []
+
+            def write(self, model_class, iterator):
+                self.writes += 1
+                list(iterator)
+                return True
+
+            def write_delta(self, model_class, inserted, updated, deleted):
+                self.deltas.append( ([e.pk for e in inserted], [e.pk for e in updated], list(deleted)) )
+                return self.accept
+
+        man = MyModel.objects
+        storage = DeltaStorage()
+        man.load(storage)
+
+        for i in range(5):
+            MyModel(int_type=i).save()
+
+        self.assertEqual( ({0, 1, 2, 3, 4}, set(), set()), man.changes )
+
+        man.store(storage)
+        self.assertEqual( [([0, 1, 2, 3, 4], [], [])], storage.deltas )
+        self.assertEqual( 0, storage.writes )
+        self.assertEqual( (set(), set(), set()), man.changes )
+
+        # inserted then deleted never happened, deleted then saved is an update
+        MyModel(int_type=1, str_type='changed').save()
+        MyModel(int_type=10).save()
+        man.delete( man.get(10) )
+        man.delete( man.get(2) )
+        man.delete( man.get(3) )
+        MyModel(int_type=3).save()
+        man.bulk_create( [MyModel(int_type=11)] )
+        man.filter(int_type=4).update(str_type='changed')
+        man.bulk_delete([0])
+
+        self.assertEqual( ({11}, {1, 3, 4}, {0, 2}), man.changes )
+
+        man.store(storage)
+        self.assertEqual( ([11], [1, 3, 4], [0, 2]), storage.deltas[-1] )
+
+        # nothing changed, nothing written
+        man.store(storage)
+        self.assertEqual( 2, len(storage.deltas) )
+
+        # a storage we didn't load or store gets everything
+        other = DeltaStorage()
+        MyModel(int_type=19).save()
+        man.store(other)
+        self.assertEqual( [], other.deltas )
+        self.assertEqual( 1, other.writes )
+
+        # and so do storages that can't write changes
+        storage = DeltaStorage(accept=False)
+        man.load(storage)
+        MyModel(int_type=20).save()
+        man.store(storage)
+        self.assertEqual( 1, len(storage.deltas) )
+        self.assertEqual( 1, storage.writes )
+
+        # and so does anything after a clear or when forced
+        MyModel(int_type=21).save()
+        man.clear()
+        MyModel(int_type=22).save()
+        man.store(storage)
+        self.assertEqual( 1, len(storage.deltas) )
+        self.assertEqual( 2, storage.writes )
+
+        man.store(storage, force=True)
+        self.assertEqual( 3, storage.writes )
+
+        self.assertFalse( Storage().write_delta(MyModel, [], [], []) )
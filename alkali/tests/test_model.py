@@ -225,3 +225,35 @@ class TestModel( unittest.TestCase ):
     def test_doesnotexist(self):
         self.assertEqual( MyModel.ObjectDoesNotExist, MyMulti.ObjectDoesNotExist )
         self.assertNotEqual( MyModel.DoesNotExist, MyMulti.DoesNotExist )
+
+    def test_serializer(self):
+        "the compiled serializer matches Field.dumps"
+        from . import MyDepModel, AuxInfo, Entry, Entry2
+
+        def dumps(m):
+            return {name: field.dumps(getattr(m, name))
+                    for name, field in m.Meta.fields.items()}
+
+        now = tznow()
+        m = MyModel(int_type=3, str_type='string', dt_type=now).save()
+
+        for elem in [m, MyModel(int_type=4), EmptyModel(), MyMulti(pk1=1, pk2=2),
+                MyDepModel(pk1=1, foreign=m)]:
+            self.assertEqual( dumps(elem), elem.dict )
+            self.assertEqual( list(elem.Meta.fields.keys()), list(elem.dict.keys()) )
+
+        self.assertEqual( 'null', MyModel(int_type=4).dict['dt_type'] )
+
+        e = Entry(date=now).save()
+        e2 = Entry2(date=now).save()
+        aux = AuxInfo(entry=e, entry2=e2, mime_type='text/plain')
+        self.assertEqual( now.isoformat(), aux.dict['entry'] )
+        self.assertEqual( dumps(aux), aux.dict )
+
+        with self.assertRaises(RuntimeError):
+            MyDepModel(pk1=2).dict
+
+        MyDepModel.objects.clear()
+        AuxInfo.objects.clear()
+        Entry.objects.clear()
+        Entry2.objects.clear()
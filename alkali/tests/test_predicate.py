@@ -0,0 +1,101 @@
+import unittest
+import re
+
+from alkali import predicate
+from alkali.predicate import compile_filter, prepare
+
+from . import MyModel, MyMulti, MyDepModel
+
+class TestPredicate( unittest.TestCase ):
+
+    def tearDown(self):
+        MyModel.objects.clear()
+        MyDepModel.objects.clear()
+
+    def test_1(self):
+        "compiled predicates agree with the operators"
+        m = MyModel(int_type=5, str_type='Some String')
+
+        self.assertTrue( compile_filter(MyModel, [])(m) )
+        self.assertTrue( compile_filter(MyModel, [('int_type', 'eq', 5)])(m) )
+        self.assertTrue( compile_filter(MyModel, [('int_type', 'gt', 4), ('int_type', 'le', 5)])(m) )
+        self.assertFalse( compile_filter(MyModel, [('int_type', 'gt', 4), ('str_type', 'eq', 'foo')])(m) )
+        self.assertTrue( compile_filter(MyModel, [('str_type', 'in', ['foo', 'Some String'])])(m) )
+        self.assertTrue( compile_filter(MyModel, [('str_type', 'rin', 'String')])(m) )
+        self.assertTrue( compile_filter(MyModel, [('str_type', 're', 'String$')])(m) )
+        self.assertFalse( compile_filter(MyModel, [('str_type', 're', '^some')])(m) )
+        self.assertTrue( compile_filter(MyModel, [('str_type', 'rei', '^some')])(m) )
+        self.assertTrue( compile_filter(MyModel, [('iter_type', 'rin', 5)])(m) )
+        self.assertTrue( compile_filter(MyModel, [('pk', 'eq', 5)])(m) )
+        self.assertTrue( compile_filter(MyModel, [('str_type', 'contains', 'Some')])(m) )
+
+    def test_2(self):
+        "predicates are cached by shape, not value"
+        predicate._factory.cache_clear()
+
+        compile_filter(MyModel, [('int_type', 'gt', 1), ('str_type', 'eq', 'a')])
+        compile_filter(MyModel, [('int_type', 'gt', 2), ('str_type', 'eq', 'b')])
+        compile_filter(MyModel, [('int_type', 'lt', 2)])
+
+        info = predicate._factory.cache_info()
+        self.assertEqual( 1, info.hits )
+        self.assertEqual( 2, info.misses )
+
+    def test_3(self):
+        "values are prepared once"
+        accessor, expression, value = prepare(MyModel, 'str_type', 're', 'foo')
+        self.assertEqual( "d['str_type']", accessor )
+        self.assertTrue( isinstance(value, re.Pattern) )
+
+        accessor, expression, value = prepare(MyModel, 'int_type', 'in', [1, 2])
+        self.assertEqual( frozenset([1, 2]), value )
+        self.assertEqual( '{a} in {v}', expression )
+
+        # a string is a substring search
+        accessor, expression, value = prepare(MyModel, 'str_type', 'in', 'foo')
+        self.assertEqual( 'foo', value )
+
+        accessor, expression, value = prepare(MyModel, 'iter_type', 'eq', [1])
+        self.assertEqual( "getattr(e, 'iter_type')", accessor )
+
+        accessor, expression, value = prepare(MyMulti, 'pk', 'eq', (1, 2))
+        self.assertEqual( "(d['pk1'], d['pk2'],)", accessor )
+
+    def test_4(self):
+        "foreign keys compare the stored pk"
+        m1 = MyModel(int_type=1).save()
+        m2 = MyModel(int_type=2).save()
+        dep = MyDepModel(pk1=1, foreign=m1)
+
+        accessor, expression, value = prepare(MyDepModel, 'foreign', 'eq', m1)
+        self.assertEqual( "d['foreign']", accessor )
+        self.assertEqual( 1, value )
+
+        self.assertTrue( compile_filter(MyDepModel, [('foreign', 'eq', m1)])(dep) )
+        self.assertFalse( compile_filter(MyDepModel, [('foreign', 'eq', m2)])(dep) )
+        self.assertTrue( compile_filter(MyDepModel, [('foreign', 'ne', m2)])(dep) )
+        self.assertTrue( compile_filter(MyDepModel, [('foreign', 'in', [m1, m2])])(dep) )
+        self.assertFalse( compile_filter(MyDepModel, [('foreign', 'eq', 1)])(dep) )
+
+    def test_5(self):
+        "unknown operators are caught early"
+        with self.assertRaises(AttributeError):
+            predicate.check('foo', 1)
+
+        with self.assertRaises(AssertionError):
+            predicate.check('in', 1)
+
+    def test_6(self):
+        "trees of conditions short circuit"
+        from alkali.query import Q
+
+        m = MyModel(int_type=1, str_type='foo')
+
+        pred = compile_filter(MyModel, [Q(int_type=1) | Q(iter_type__rin=object())])
+        self.assertTrue( pred(m) ) # never got to rin_ with a bad value
+
+        pred = compile_filter(MyModel, [~(Q(int_type=2) | Q(str_type='foo'))])
+        self.assertFalse( pred(m) )
+
+        pred = compile_filter(MyModel, [~Q(int_type=2), ('str_type', 'eq', 'foo')])
+        self.assertTrue( pred(m) )
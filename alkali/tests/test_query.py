@@ -3,7 +3,7 @@ import unittest
 from alkali.query import Query
 from alkali import tznow, fromts
 
-from . import MyModel, MyMulti
+from . import MyModel, MyMulti, MyDepModel, MyDepDepModel
 
 class TestQuery( unittest.TestCase ):
 
@@ -439,3 +439,574 @@ class TestQuery( unittest.TestCase ):
 
         g2 = groups['string 2'].all().order_by('int_type').values_list('int_type', flat=True)
         self.assertEqual(set(expected['string 2']), set(g2))
+
+    def test_lazy_1(self):
+        "nothing is filtered or sorted until results are needed"
+        for i in range(5):
+            MyModel(int_type=i, str_type='string %d' % (i % 2)).save()
+
+        q = MyModel.objects.order_by('-int_type').filter(int_type__gt=1)
+        self.assertIsNone( q._pks )
+        self.assertEqual( [('int_type', True)], q._ordering )
+        self.assertFalse( q._sorted )
+
+        self.assertEqual( 3, len(q) )
+        self.assertEqual( [4, 3, 2], q.values_list('int_type', flat=True) )
+        self.assertTrue( q._sorted )
+
+        # keep filtering an already executed query
+        q.filter(str_type='string 0')
+        self.assertEqual( [4, 2], q.values_list('int_type', flat=True) )
+
+    def test_lazy_2(self):
+        "query doesn't change after manager does, even before executing"
+        for i in range(3):
+            MyModel(int_type=i).save()
+
+        q = MyModel.objects.filter(int_type__gt=0)
+        MyModel(int_type=10).save()
+        MyModel.objects.delete(MyModel.objects.get(1))
+
+        self.assertEqual( [1, 2], q.values_list('int_type', flat=True) )
+        self.assertEqual( [0, 2, 10], MyModel.objects.values_list('int_type', flat=True) )
+
+    def test_lazy_3(self):
+        "bad operators are caught when filtering, not when executing"
+        with self.assertRaises(AttributeError):
+            MyModel.objects.filter(int_type__foo=1)
+
+    def test_first_3(self):
+        "first doesn't need a full sort"
+        for i in [3, 1, 4, 2]:
+            MyModel(int_type=i, str_type='string %d' % (i % 2)).save()
+
+        self.assertEqual( 1, MyModel.objects.first().int_type )
+        self.assertEqual( 4, MyModel.objects.order_by('-int_type').first().int_type )
+        self.assertEqual( 2, MyModel.objects.order_by('str_type').first().int_type )
+        self.assertEqual( 3, MyModel.objects.filter(int_type__gt=2).order_by('-str_type').first().int_type )
+
+    def test_exists_1(self):
+        for i in range(3):
+            MyModel(int_type=i, str_type='string').save()
+
+        self.assertTrue( MyModel.objects.exists() )
+        self.assertTrue( MyModel.objects.filter(pk=2).exists() )
+        self.assertFalse( MyModel.objects.filter(pk=3).exists() )
+        self.assertFalse( MyModel.objects.filter(int_type__gt=1, str_type='foo').exists() )
+
+        q = MyModel.objects.filter(int_type__gt=0)
+        self.assertTrue( q.exists() )
+        self.assertIsNone( q._pks )
+
+    def test_slice(self):
+        "slices return copies"
+        for i in range(3):
+            MyModel(int_type=i).save()
+
+        q = MyModel.objects.all()
+        self.assertEqual( [1, 2], [e.int_type for e in q[1:]] )
+        self.assertNotEqual( id(MyModel.objects._instances[1]), id(q[1:][0]) )
+
+    def test_pks_1(self):
+        "query works on primary keys and only copies what leaves it"
+        for i in range(5):
+            MyModel(int_type=i).save()
+
+        q = MyModel.objects.filter(int_type__ge=2).order_by('-int_type')
+        self.assertEqual( [4, 3, 2], q._execute() )
+
+        man = MyModel.objects
+        self.assertNotEqual( id(man._instances[4]), id(q[0]) )
+        self.assertNotEqual( id(man._instances[4]), id(list(q)[0]) )
+        self.assertNotEqual( id(man._instances[4]), id(q.limit(1)[0]) )
+        self.assertNotEqual( id(man._instances[4]), id(q.first()) )
+
+    def test_set_operations(self):
+        for i in range(6):
+            MyModel(int_type=i, str_type='string %d' % (i % 2)).save()
+
+        evens = MyModel.objects.filter(str_type='string 0')
+        small = MyModel.objects.filter(int_type__lt=3)
+
+        self.assertEqual( [0, 2], (evens & small).values_list('int_type', flat=True) )
+        self.assertEqual( [0, 1, 2, 4], (evens | small).values_list('int_type', flat=True) )
+        self.assertEqual( [4], (evens - small).values_list('int_type', flat=True) )
+
+        # combined queries can still be filtered and ordered
+        q = (evens | small).filter(int_type__gt=0).order_by('-int_type')
+        self.assertEqual( [4, 2, 1], q.values_list('int_type', flat=True) )
+
+        # annotations are kept
+        q = evens.annotate(foo='foo') | small
+        self.assertEqual( ['foo', None, 'foo', 'foo'], [getattr(e, 'foo', None) for e in q] )
+
+        # queries taken before and after a change
+        MyModel(int_type=10, str_type='string 0').save()
+        later = MyModel.objects.filter(int_type__gt=3)
+        self.assertEqual( [0, 2, 4, 5, 10], (evens | later).values_list('int_type', flat=True) )
+
+    def test_annotate_3(self):
+        "annotations survive filtering and ordering"
+        for i in range(3):
+            MyModel(int_type=i).save()
+
+        q = MyModel.objects.annotate(double=lambda e: e.int_type * 2)
+        q.filter(double__gt=0).order_by('-double')
+
+        self.assertEqual( [4, 2], [e.double for e in q] )
+        self.assertFalse( hasattr(MyModel.objects._instances[1], 'double') )
+
+    def test_order_by_1(self):
+        "first field is the most significant, directions can be mixed"
+        data = [(0, 'b'), (1, 'a'), (2, 'b'), (3, 'a'), (4, 'c')]
+        for i, s in data:
+            MyModel(int_type=i, str_type=s).save()
+
+        q = MyModel.objects.order_by('str_type', '-int_type')
+        self.assertEqual( [3, 1, 2, 0, 4], q.values_list('int_type', flat=True) )
+
+        q = MyModel.objects.order_by('-str_type', 'int_type')
+        self.assertEqual( [4, 0, 2, 1, 3], q.values_list('int_type', flat=True) )
+
+        q = MyModel.objects.order_by('-str_type', '-int_type')
+        self.assertEqual( [4, 2, 0, 3, 1], q.values_list('int_type', flat=True) )
+
+        # earlier orderings break ties of later ones
+        q = MyModel.objects.order_by('-int_type').order_by('str_type')
+        self.assertEqual( [3, 1, 2, 0, 4], q.values_list('int_type', flat=True) )
+
+        q = MyModel.objects.order_by('-pk')
+        self.assertEqual( [4, 3, 2, 1, 0], q.values_list('int_type', flat=True) )
+
+    def test_order_by_2(self):
+        "limit and first use a heap, they must agree with a full sort"
+        import random
+        rand = random.Random(42)
+
+        for i in range(200):
+            MyModel(int_type=i, str_type='string %d' % rand.randint(0, 9)).save()
+
+        for ordering in [('str_type',), ('-str_type',), ('str_type', '-int_type'), ('-pk',)]:
+            expected = MyModel.objects.order_by(*ordering).values_list('int_type', flat=True)
+
+            for n in [1, 5, 10, -1, -5, 150, 0]:
+                q = MyModel.objects.order_by(*ordering)
+                got = [e.int_type for e in q.limit(n)]
+                want = expected[:n] if n > 0 else expected[n:] if n < 0 else expected
+                self.assertEqual( want, got )
+
+            self.assertEqual( expected[0], MyModel.objects.order_by(*ordering).first().int_type )
+
+    def test_order_by_3(self):
+        "descending wrapper"
+        from alkali.predicate import Descending
+
+        self.assertTrue( Descending(2) < Descending(1) )
+        self.assertTrue( Descending(1) == Descending(1) )
+        self.assertEqual( [3, 2, 1], [d.value for d in sorted(map(Descending, [1, 3, 2]))] )
+
+    def test_group_by_2(self):
+        "group_by partitions the current results"
+        for i in range(10):
+            MyModel(int_type=i, str_type='string %d' % (i % 3)).save()
+
+        groups = MyModel.objects.filter(int_type__gt=2).order_by('-int_type').group_by('str_type')
+        self.assertEqual( {'string 0', 'string 1', 'string 2'}, set(groups.keys()) )
+
+        self.assertEqual( [9, 6, 3], groups['string 0'].values_list('int_type', flat=True) )
+        self.assertEqual( [7, 4], groups['string 1'].values_list('int_type', flat=True) )
+
+        # groups are queries
+        self.assertEqual( [4], groups['string 1'].filter(int_type__lt=5).values_list('int_type', flat=True) )
+
+    def test_group_by_3(self):
+        "aggregate every group"
+        from alkali.query import Sum, Count, Max, Aggregate
+
+        for i in range(10):
+            MyModel(int_type=i, str_type='string %d' % (i % 2)).save()
+
+        class Last(Aggregate):
+            def __call__(self, query):
+                return query.order_by('-int_type').first().int_type
+
+        groups = MyModel.objects.filter(int_type__lt=8).group_by('str_type')
+        result = groups.aggregate(Count('int_type'), Max('int_type'), total=Sum('int_type'), last=Last('int_type'))
+
+        self.assertDictEqual( {
+            'string 0': {'int_type__count': 4, 'int_type__max': 6, 'total': 12, 'last': 6},
+            'string 1': {'int_type__count': 4, 'int_type__max': 7, 'total': 16, 'last': 7},
+            }, result )
+
+    def test_agg_stats(self):
+        "averages and spreads"
+        from alkali.query import Avg, Variance, StdDev, Sum
+        import alkali.query
+
+        for i in [2, 4, 6, 8]:
+            MyModel(int_type=i, str_type='string').save()
+
+        engine = alkali.query.numpy
+
+        try:
+            # with and without numpy
+            for use_numpy in [True, False]:
+                with self.subTest(numpy=use_numpy):
+                    if use_numpy and engine is None:
+                        self.skipTest("numpy not installed")
+
+                    alkali.query.numpy = engine if use_numpy else None
+                    q = MyModel.objects.all()
+
+                    d = q.aggregate(Avg('int_type'), Variance('int_type'), StdDev('int_type'),
+                            sample=Variance('int_type', sample=True), total=Sum('int_type'))
+
+                    self.assertAlmostEqual( 5.0, d['int_type__avg'] )
+                    self.assertAlmostEqual( 5.0, d['int_type__variance'] )
+                    self.assertAlmostEqual( 5 ** 0.5, d['int_type__stddev'] )
+                    self.assertAlmostEqual( 20 / 3, d['sample'] )
+                    self.assertEqual( 20, d['total'] )
+                    self.assertIsInstance( d['total'], int )
+
+                    self.assertAlmostEqual( 5.0, Avg('int_type')(q) )
+
+                    empty = q.filter(int_type__gt=100)
+                    self.assertEqual( {'a': None, 'v': None, 's': None, 't': 0},
+                        empty.aggregate(a=Avg('int_type'), v=Variance('int_type'),
+                            s=StdDev('int_type'), t=Sum('int_type')) )
+        finally:
+            alkali.query.numpy = engine
+
+    @unittest.skipUnless( __import__('importlib').util.find_spec('numpy'), "numpy not installed" )
+    def test_agg_numpy(self):
+        "numeric fields are aggregated as arrays"
+        from alkali.query import _column, Sum
+        import numpy
+
+        MyModel(int_type=1, str_type='string').save()
+        MyModel(int_type=2, str_type='string').save()
+
+        instances = MyModel.objects.all()._instances()
+        self.assertIsInstance( _column(MyModel, 'int_type', instances), numpy.ndarray )
+        self.assertIsInstance( _column(MyModel, 'str_type', instances), list )
+
+        # int64 would wrap around, the sum is still exact
+        big = 2**62 + 1
+        for i in range(10):
+            MyModel(int_type=big + i, str_type='string').save()
+
+        q = MyModel.objects.filter(int_type__ge=big)
+        self.assertEqual( 10 * big + 45, q.aggregate(Sum('int_type'))['int_type__sum'] )
+
+    def test_q_1(self):
+        "Q objects combine with |, & and ~"
+        from alkali.query import Q
+
+        for i in range(10):
+            MyModel(int_type=i, str_type='string %d' % (i % 3)).save()
+
+        q = MyModel.objects.filter( Q(str_type='string 0') | Q(int_type=1) )
+        self.assertEqual( [0, 1, 3, 6, 9], q.values_list('int_type', flat=True) )
+
+        q = MyModel.objects.filter( Q(str_type='string 0') & ~Q(int_type__in=[3, 6]) )
+        self.assertEqual( [0, 9], q.values_list('int_type', flat=True) )
+
+        # mix in conditions that need a scan
+        q = MyModel.objects.filter( Q(str_type='string 1') | Q(int_type__gt=7), int_type__lt=9 )
+        self.assertEqual( [1, 4, 7, 8], q.values_list('int_type', flat=True) )
+
+        q = MyModel.objects.filter( ~(Q(str_type__rei='STRING [01]') | Q(int_type__le=2)) )
+        self.assertEqual( [5, 8], q.values_list('int_type', flat=True) )
+
+        self.assertEqual( 10, len(MyModel.objects.filter(Q())) )
+        self.assertEqual( 0, len(MyModel.objects.filter(~Q())) )
+        self.assertTrue( repr(~Q(int_type=1) | Q(str_type='a')) )
+
+        with self.assertRaises(TypeError):
+            MyModel.objects.filter( ('int_type', 'eq', 1) )
+
+        with self.assertRaises(TypeError):
+            Q(int_type=1) | {'int_type': 1}
+
+    def test_q_2(self):
+        "lookup tables give the same answer as a scan"
+        from alkali.query import Q
+
+        for i in range(10):
+            MyModel(int_type=i, str_type='string %d' % (i % 3)).save()
+
+        q = MyModel.objects.all()
+        tables = {}
+        cond = Q(str_type__in=['string 1', 'string 9']) | ~Q(int_type__in=[0, 2, 3, 4, 5, 6, 7, 8])
+
+        self.assertEqual( {1, 4, 7, 9}, q._resolve(cond, tables) )
+        self.assertEqual( {'str_type', 'int_type'}, set(tables.keys()) )
+
+        # properties and other operators need a scan
+        self.assertIsNone( q._resolve(Q(iter_type=[1]) | Q(int_type=1), tables) )
+        self.assertIsNone( q._resolve(Q(int_type__gt=1) | Q(int_type=1), tables) )
+        self.assertIsNone( q._resolve(Q(str_type__in='abc'), tables) )
+
+    def test_exclude(self):
+        for i in range(10):
+            MyModel(int_type=i, str_type='string %d' % (i % 3)).save()
+
+        q = MyModel.objects.exclude(str_type='string 0')
+        self.assertEqual( [1, 2, 4, 5, 7, 8], q.values_list('int_type', flat=True) )
+
+        # not (a and b)
+        q = MyModel.objects.exclude(str_type='string 0', int_type__gt=3)
+        self.assertEqual( [0, 1, 2, 3, 4, 5, 7, 8], q.values_list('int_type', flat=True) )
+
+        q = MyModel.objects.filter(int_type__lt=5).exclude(str_type='string 1')
+        self.assertEqual( [0, 2, 3], q.values_list('int_type', flat=True) )
+
+    def test_lookups(self):
+        "extended operators, with derived indexes and with a scan"
+        import datetime as dt
+
+        date = dt.datetime(2017, 3, 5, 12, 30, tzinfo=dt.timezone.utc) # a sunday
+        words = ['Apple', 'banana', 'CHERRY', 'apple pie', None]
+
+        for i, word in enumerate(words):
+            MyModel(int_type=i, str_type=word, dt_type=date + dt.timedelta(days=i)).save()
+
+        expected = [
+            ( {'str_type__exact': 'banana'}, [1] ),
+            ( {'str_type__iexact': 'APPLE'}, [0] ),
+            ( {'str_type__contains': 'pp'}, [0, 3] ),
+            ( {'str_type__icontains': 'ERR'}, [2] ),
+            ( {'str_type__startswith': 'app'}, [3] ),
+            ( {'str_type__istartswith': 'app'}, [0, 3] ),
+            ( {'str_type__endswith': 'na'}, [1] ),
+            ( {'str_type__iendswith': 'RRY'}, [2] ),
+            ( {'int_type__range': (1, 3)}, [1, 2, 3] ),
+            ( {'dt_type__range': (date, date + dt.timedelta(days=1))}, [0, 1] ),
+            ( {'dt_type__year': 2017}, [0, 1, 2, 3, 4] ),
+            ( {'dt_type__month': 4}, [] ),
+            ( {'dt_type__day': 6}, [1] ),
+            ( {'dt_type__week_day': 1}, [0] ),
+            ( {'dt_type__week_day': 7}, [] ),
+            ( {'dt_type__hour': 12}, [0, 1, 2, 3, 4] ),
+            ( {'dt_type__date': dt.date(2017, 3, 8)}, [3] ),
+        ]
+
+        for kw, ids in expected:
+            q = MyModel.objects.filter(**kw)
+            self.assertEqual( ids, q.values_list('int_type', flat=True), kw )
+
+            # a query older than the manager has to scan
+            q = MyModel.objects.filter(**kw)
+            MyModel.objects._version += 1
+            self.assertEqual( ids, q.values_list('int_type', flat=True), kw )
+
+        with self.assertRaises(AssertionError):
+            MyModel.objects.filter(int_type__range=1)
+
+    def test_select_related(self):
+        "foreign instances are looked up once per foreign pk"
+        from unittest import mock
+
+        try:
+            for i in range(3):
+                MyModel(int_type=i, str_type='string %d' % i).save()
+                MyDepModel(pk1=i, foreign=MyModel.objects.get(i)).save()
+
+            for i in range(9):
+                MyDepDepModel(id=i, dep=MyDepModel.objects.get(i % 3)).save()
+
+            q = MyDepDepModel.objects.select_related('dep', 'dep__foreign')
+            self.assertEqual( {'dep': {'foreign': {}}}, q._related )
+
+            with mock.patch.object(MyModel.objects, 'get', wraps=MyModel.objects.get) as get:
+                names = [e.dep.foreign.str_type for e in q]
+                self.assertEqual( 3, get.call_count )
+
+            self.assertEqual( ['string %d' % (i % 3) for i in range(9)], names )
+
+            # rows share their foreign instances
+            rows = q.order_by('id')[:4]
+            self.assertIs( rows[0].dep, rows[3].dep )
+            self.assertIsNot( rows[0].dep, rows[1].dep )
+
+            # changing the fk ignores the attached instance
+            e = q.first()
+            e.dep = MyDepModel.objects.get(2)
+            self.assertEqual( 2, e.dep.pk1 )
+
+            # the manager doesn't keep attached instances
+            e.save()
+            stored = MyDepDepModel.objects._instances[e.pk]
+            self.assertNotIn( MyDepDepModel.Meta.fields['dep'].cache_name, stored.__dict__ )
+
+            self.assertEqual( 1, len(q.filter(id=0).select_related('dep').limit(1)) )
+
+            with self.assertRaises(AssertionError):
+                MyDepDepModel.objects.select_related('id')
+
+            with self.assertRaises(AssertionError):
+                MyDepDepModel.objects.select_related('dep__pk1')
+        finally:
+            MyDepDepModel.objects.clear()
+            MyDepModel.objects.clear()
+
+    def test_paginate(self):
+        "walk a query a page at a time"
+        import datetime as dt
+
+        date = dt.datetime(2017, 1, 1, tzinfo=dt.timezone.utc)
+
+        for i in range(25):
+            MyModel(int_type=i, str_type='string %d' % (i % 4), dt_type=date + dt.timedelta(hours=i % 5)).save()
+
+        for ordering in [('int_type',), ('-int_type',), ('str_type', '-dt_type'), ('-dt_type', '-str_type')]:
+            expected = MyModel.objects.order_by(*ordering).values_list('int_type', flat=True)
+
+            found = []
+            cursor = None
+            pages = 0
+
+            while True:
+                q = MyModel.objects.order_by(*ordering)
+                page, cursor = q.paginate(after=cursor, size=7)
+                found.extend( [e.int_type for e in page] )
+                pages += 1
+                if cursor is None:
+                    break
+
+            self.assertEqual( expected, found, ordering )
+            self.assertEqual( 4, pages )
+
+        # the sorted keys are reused between queries
+        MyModel.objects.cache_clear()
+        q = MyModel.objects.filter(int_type__lt=10)
+        page, cursor = q.paginate(size=4)
+        hits = MyModel.objects.cache_info().hits
+
+        page, cursor = MyModel.objects.filter(int_type__lt=10).paginate(after=cursor, size=4)
+        self.assertEqual( [4, 5, 6, 7], [e.int_type for e in page] )
+        self.assertEqual( hits + 1, MyModel.objects.cache_info().hits )
+
+        # the row a cursor came from can go away
+        MyModel.objects.delete( MyModel.objects.get(7) )
+        page, cursor = MyModel.objects.filter(int_type__lt=10).paginate(after=cursor, size=4)
+        self.assertEqual( [8, 9], [e.int_type for e in page] )
+        self.assertIsNone( cursor )
+
+        page, cursor = MyModel.objects.filter(int_type__gt=100).paginate()
+        self.assertEqual( ([], None), (page, cursor) )
+
+        _, cursor = MyModel.objects.paginate(size=2)
+
+        with self.assertRaises(ValueError):
+            MyModel.objects.order_by('-int_type').paginate(after=cursor)
+
+        with self.assertRaises(ValueError):
+            MyModel.objects.paginate(after='not a cursor')
+
+    def test_explain(self):
+        "report how a query was answered"
+        from alkali.query import Q, Sum
+        from . import MyIndexed
+
+        try:
+            for i in range(20):
+                MyIndexed(id=i, name='name %d' % (i % 4), num=i, other='other %d' % (i % 2)).save()
+
+            q = MyIndexed.objects.filter(name='name 1', other='other 1').order_by('-num')
+            report = q.explain()
+
+            self.assertEqual( ['source', 'filter', 'filter', 'order_by'], [s.stage for s in report] )
+            self.assertEqual( 20, report.stages[0].actual )
+            self.assertIn( 'HashIndex', report.stages[1].strategy )
+            self.assertEqual( (5, 5), report.stages[1][2:4] )
+            self.assertIn( 'scan', report.stages[2].strategy )
+            self.assertEqual( 5, report.stages[2].actual )
+            self.assertEqual( 'sort on -num, id', report.stages[3].strategy )
+
+            # explaining doesn't change the answer
+            self.assertEqual( [17, 13, 9, 5, 1], [e.num for e in q] )
+            self.assertEqual( 5, report.copies )
+
+            q.limit(2)
+            self.assertEqual( 'limit', report.stages[-1].stage )
+            self.assertEqual( 2, report.stages[-1].actual )
+
+            q.group_by('other').aggregate(Sum('num'))
+            self.assertEqual( ['group_by', 'aggregate'], [s.stage for s in report][-2:] )
+            self.assertEqual( 1, report.stages[-2].actual )
+
+            q = MyIndexed.objects.filter(Q(num__lt=2) | Q(num__gt=17), pk=18)
+            report = q.explain()
+            self.assertEqual( 'set operations', report.stages[1].strategy.split(': ')[1] )
+            self.assertEqual( 4, report.stages[1].actual )
+            self.assertEqual( 'primary key', report.stages[2].strategy.split(': ')[1] )
+            self.assertEqual( 1, report.stages[2].actual )
+
+            # nothing left to do the second time around
+            again = q.explain()
+            self.assertEqual( ['order_by'], [s.stage for s in again] )
+            self.assertEqual( 'already sorted', again.stages[0].strategy )
+
+            self.assertTrue( str(report).startswith('<Explain: MyIndexed>') )
+            self.assertGreaterEqual( report.seconds, 0 )
+        finally:
+            MyIndexed.objects.clear()
+
+    def test_update(self):
+        "set fields of all matches at once"
+        from . import MyIndexed, AutoModel1
+
+        try:
+            for i in range(6):
+                MyIndexed(id=i, name='a', num=i, other='x').save()
+
+            man = MyIndexed.objects
+            version = man.version
+
+            q = man.filter(num__ge=3)
+            self.assertEqual( 3, q.update(name='b', num='10') )
+            self.assertEqual( version + 1, man.version )
+            self.assertTrue( man.dirty )
+
+            # values are cast and the indexes follow along
+            self.assertEqual( [3, 4, 5], man.filter(name='b').values_list('id', flat=True) )
+            self.assertEqual( 3, man.filter(num=10).count )
+            self.assertEqual( {10}, {e.num for e in q} )
+
+            self.assertEqual( 6, man.all().update(other='y') )
+            self.assertEqual( 0, man.filter(other='x').count )
+            self.assertEqual( 0, man.filter(id=99).update(other='z') )
+
+            with self.assertRaises(AttributeError):
+                man.all().update(id=1)
+            with self.assertRaises(AttributeError):
+                man.all().update(foo=1)
+
+            m = AutoModel1(f1='a').save()
+            modified = AutoModel1.objects.get(m.pk).modified
+            AutoModel1.objects.all().update(f1='b')
+            self.assertEqual( 'b', AutoModel1.objects.get(m.pk).f1 )
+            self.assertGreater( AutoModel1.objects.get(m.pk).modified, modified )
+        finally:
+            MyIndexed.objects.clear()
+            AutoModel1.objects.clear()
+
+    def test_delete(self):
+        "remove all matches at once"
+        for i in range(6):
+            MyModel(int_type=i, str_type='s%d' % (i % 2)).save()
+
+        MyDepModel(pk1=1, foreign=MyModel.objects.get(1)).save()
+
+        try:
+            q = MyModel.objects.filter(str_type='s1')
+            self.assertEqual( 3, q.delete() )
+            self.assertEqual( 0, len(q) )
+            self.assertEqual( [0, 2, 4], MyModel.objects.values_list('int_type', flat=True) )
+
+            # children go with their parents
+            self.assertEqual( 0, MyDepModel.objects.count )
+            self.assertEqual( 0, q.delete() )
+        finally:
+            MyDepModel.objects.clear()
@@ -77,3 +77,84 @@ class TestRelManager( unittest.TestCase ):
         self.assertEqual( 1, Entry.objects.count )
         self.assertEqual( 0, Entry2.objects.count )
         self.assertEqual( 0, AuxInfo.objects.count )
+
+    def test_3(self):
+        "children are found with the reverse index"
+        from alkali.index import HashIndex
+
+        e = self.e
+        self.assertIsInstance( AuxInfo.objects._indexes['entry'][0], HashIndex )
+        self.assertIsInstance( AuxInfo.objects._indexes['entry2'][0], HashIndex )
+
+        self.assertIs( e.auxinfo_set, e.auxinfo_set )
+        self.assertEqual( 1, e.auxinfo_set.count )
+        self.assertEqual( {e.pk}, AuxInfo.objects._children('entry', e) )
+
+        e3 = Entry(date='2017-01-01').save()
+        self.assertEqual( 0, e3.auxinfo_set.count )
+        self.assertEqual( [], list(e3.auxinfo_set.all()) )
+
+        with self.assertRaises(AuxInfo.DoesNotExist):
+            e3.auxinfo_set.get()
+
+        # a copy gets its own RelManager
+        e4 = Entry.objects.get(e3.pk)
+        self.assertIsNot( e3.auxinfo_set, e4.auxinfo_set )
+        self.assertIs( e4, e4.auxinfo_set.foreign )
+
+        a = e3.auxinfo_set.create(entry2=self.e2).save()
+        self.assertEqual( 1, e3.auxinfo_set.count )
+        self.assertEqual( a, e3.auxinfo_set.get() )
+        self.assertEqual( 2, self.e2.auxinfo_set.count )
+
+        with self.assertRaises(AuxInfo.MultipleObjectsReturned):
+            self.e2.auxinfo_set.get()
+
+        # deleting the parent deletes its children
+        Entry.objects.delete(e3)
+        self.assertEqual( 1, len(AuxInfo.objects) )
+        self.assertEqual( 1, self.e2.auxinfo_set.count )
+
+    def test_prefetch(self):
+        "children of a whole query are found at once"
+        from unittest import mock
+
+        for i in range(1, 4):
+            e = Entry(date='2017-01-0%d' % i).save()
+            AuxInfo(entry=e, entry2=self.e2, mime_type=str(i)).save()
+
+        with mock.patch.object(AuxInfo.objects, '_children', wraps=AuxInfo.objects._children) as children:
+            entries = list(Entry.objects.prefetch_related('auxinfo_set'))
+            self.assertEqual( 4, children.call_count )
+
+            counts = [e.auxinfo_set.count for e in entries]
+            mime_types = [e.auxinfo_set.get().mime_type for e in entries[:3]]
+            self.assertEqual( 4, children.call_count )
+
+        self.assertEqual( [1, 1, 1, 1], counts )
+        self.assertEqual( ['1', '2', '3'], mime_types )
+
+        # prefetched children are forgotten once the children change
+        AuxInfo.objects.delete( entries[0].auxinfo_set.get() )
+        self.assertEqual( 0, entries[0].auxinfo_set.count )
+        self.assertEqual( 1, entries[1].auxinfo_set.count )
+
+        e = Entry.objects.prefetch_related('auxinfo_set').order_by('-date').first()
+        self.assertEqual( self.e, e )
+        self.assertIsNotNone( e.auxinfo_set._prefetched )
+        self.assertEqual( self.a, e.auxinfo_set.get() )
+
+        # a saved instance carries no relation caches
+        e.save()
+        stored = Entry.objects._instances[e.pk].__dict__
+        self.assertNotIn( '___auxinfo_set', stored )
+
+        aux = AuxInfo.objects.select_related('entry').first()
+        aux.entry
+        aux.save()
+        stored = AuxInfo.objects._instances[aux.pk].__dict__
+        self.assertNotIn( '___entry', stored )
+        self.assertNotIn( '___entry2', stored )
+
+        with self.assertRaises(AssertionError):
+            Entry.objects.prefetch_related('date')
@@ -50,3 +50,26 @@ class TestSignals( unittest.TestCase ):
                 MyModel(int_type=2).save()
                 pre.cb.assert_called_once()
                 post.cb.assert_called_once()
+
+    def test_bulk(self):
+        "batched signals carry the whole list"
+        pre = mock.Mock()
+        post = mock.Mock()
+
+        with signals.pre_bulk_save.connected_to(pre.cb, sender=MyModel):
+            with signals.post_bulk_save.connected_to(post.cb, sender=MyModel):
+                MyModel.objects.bulk_create( MyModel(int_type=i) for i in range(3) )
+                pre.cb.assert_called_once()
+                self.assertEqual( 3, len(post.cb.call_args[1]['instances']) )
+
+        pre = mock.Mock()
+        post = mock.Mock()
+        row = mock.Mock()
+
+        with signals.pre_bulk_delete.connected_to(pre.cb, sender=MyModel):
+            with signals.post_bulk_delete.connected_to(post.cb, sender=MyModel):
+                with signals.pre_delete.connected_to(row.cb, sender=MyModel):
+                    MyModel.objects.bulk_delete([0, 1])
+                    pre.cb.assert_called_once()
+                    post.cb.assert_called_once()
+                    row.cb.assert_not_called()
@@ -6,7 +6,7 @@ import json
 
 from alkali import Model, fields
 from alkali.storage import FileStorage, JSONStorage, CSVStorage, MultiStorage
-from alkali.storage import FileAlreadyLocked, Storage
+from alkali.storage import FileAlreadyLocked, Storage, JournalStorage, JSONLinesStorage
 from alkali import tznow
 from . import MyModel, MyDepModel, AutoModel1, AutoModel2
 
@@ -297,3 +297,350 @@ class TestStorage( unittest.TestCase ):
         self.assertEqual(2, len(data.keys()))
         self.assertEqual(2, len(data['automodel1']))
         self.assertEqual(3, len(data['automodel2']))
+
+    def test_journal_1(self):
+        "changes are journaled as they happen and replayed on load"
+        tdir = tempfile.TemporaryDirectory()
+        filename = os.path.join(tdir.name, 'MyModel.json')
+        man = MyModel.objects
+
+        storage = JournalStorage(filename)
+
+        for i in range(5):
+            MyModel(int_type=i, str_type='s%d' % i).save()
+
+        # nothing was loaded from us so the first store is a snapshot
+        man.store(storage)
+        self.assertFalse( os.path.exists(storage.journal) )
+        self.assertEqual( 5, len(json.load(open(filename))) )
+
+        # after a store every change goes to the journal
+        MyModel(int_type=1, str_type='changed').save()
+        MyModel(int_type=10, str_type='new').save()
+        man.delete( man.get(2) )
+        man.bulk_create( [MyModel(int_type=11), MyModel(int_type=12)] )
+        man.bulk_delete( [12] )
+        man.filter(int_type=4).update(str_type='updated')
+
+        with open(storage.journal) as f:
+            self.assertEqual( 7, len(f.readlines()) )
+
+        # the process died without a store
+        storage.close()
+        man.clear()
+
+        storage = JournalStorage(filename)
+        man.load(storage)
+        self.assertEqual( [0, 1, 3, 4, 10, 11], sorted(man.pks) )
+        self.assertEqual( 'changed', man.get(1).str_type )
+        self.assertEqual( 'updated', man.get(4).str_type )
+
+        # loading didn't journal anything, storing only syncs
+        with open(storage.journal) as f:
+            self.assertEqual( 7, len(f.readlines()) )
+
+        MyModel(int_type=20).save()
+        man.store(storage)
+
+        with open(storage.journal) as f:
+            self.assertEqual( 8, len(f.readlines()) )
+
+        # a half written line is skipped
+        with open(storage.journal, 'a') as f:
+            f.write('{"put": {"int_')
+
+        storage.close()
+        storage = JournalStorage(filename)
+        man.load(storage)
+        self.assertEqual( 7, man.count )
+
+        MyModel(int_type=21).save()
+        storage.close()
+
+        storage = JournalStorage(filename)
+        man.load(storage)
+        self.assertEqual( 8, man.count )
+
+        # a full store folds everything into the snapshot
+        man.store(storage, force=True)
+        self.assertFalse( os.path.exists(storage.journal) )
+        self.assertEqual( 8, len(json.load(open(filename))) )
+
+        # the json is still json
+        storage.close()
+        man.load( JSONStorage(filename) )
+        self.assertEqual( 8, man.count )
+
+    def test_journal_2(self):
+        "compaction folds the journal into the snapshot"
+        tdir = tempfile.TemporaryDirectory()
+        filename = os.path.join(tdir.name, 'MyModel.json')
+        man = MyModel.objects
+
+        for background in [False, True]:
+            man.clear()
+            storage = JournalStorage(filename, compact_size=500,
+                    sync_every=None, sync_interval=0.01, background=background)
+
+            MyModel(int_type=0).save()
+            man.store(storage, force=True)
+
+            for i in range(1, 20):
+                MyModel(int_type=i, str_type='x' * 20).save()
+
+            man.delete( man.get(0) )
+            storage.wait()
+
+            self.assertLess( os.path.getsize(storage.journal), 500 )
+            self.assertFalse( os.path.exists(storage.journal + '.1') )
+            self.assertGreater( len(json.load(open(filename))), 1 )
+
+            storage.close()
+            man.clear()
+
+            storage = JournalStorage(filename)
+            man.load(storage)
+            self.assertEqual( list(range(1, 20)), sorted(man.pks) )
+            storage.close()
+
+        # a compaction that died is finished on the next load
+        MyModel(int_type=30).save()
+        man.store(JournalStorage(filename), force=True)
+        with open(filename + '.journal.1', 'w') as f:
+            f.write('{"delete": [1]}\n')
+
+        storage = JournalStorage(filename)
+        man.load(storage)
+        self.assertEqual( 19, man.count )
+        self.assertNotIn( 1, man.pks )
+
+        storage.compact()
+        self.assertFalse( os.path.exists(filename + '.journal.1') )
+        storage.close()
+
+    def test_json_incremental(self):
+        "json arrays are parsed a record at a time"
+        import io
+        from alkali.storage.json import _iter_array
+
+        records = [
+            {'a': 1, 'b': 'x ], { "y" \\u00e9', 'c': [1, 2.5, None, True]},
+            12345678901234567890,
+            -1.5e10,
+            "string",
+            [],
+            {'nested': {'deep': [{'x': 'y' * 100}]}},
+            ]
+        text = json.dumps(records, indent='  ')
+
+        for chunk_size in [1, 2, 3, 7, 64, 2**16]:
+            found = list( _iter_array(io.StringIO(text), chunk_size) )
+            self.assertEqual( records, found, chunk_size )
+
+        # numbers cut short at '.', 'e' or a sign by the end of a chunk
+        numbers = [3.5e-07, 1, -2e+50, 0.25, -7]
+        text = json.dumps(numbers, separators=(',', ':'))
+
+        for chunk_size in range(1, 9):
+            found = list( _iter_array(io.StringIO(text), chunk_size) )
+            self.assertEqual( numbers, found, chunk_size )
+
+        for text in ['', '  \n ', '[]', ' [ \n ] ']:
+            self.assertEqual( [], list(_iter_array(io.StringIO(text), 2)) )
+
+        for text in ['{}', '[1 2]', '[1,', '[{"a": }]', '[1, 2']:
+            with self.assertRaises(json.JSONDecodeError):
+                list( _iter_array(io.StringIO(text), 2) )
+
+        # through a storage
+        tfile = tempfile.NamedTemporaryFile(mode="w")
+        for i in range(50):
+            MyModel(int_type=i, str_type='string %d' % i).save()
+
+        storage = JSONStorage(tfile.name)
+        storage.chunk_size = 16
+        MyModel.objects.store(storage)
+        MyModel.objects.load(storage)
+        self.assertEqual( 50, MyModel.objects.count )
+        self.assertEqual( 'string 49', MyModel.objects.get(49).str_type )
+
+    def test_jsonl(self):
+        "one record per line, new records are appended"
+        tfile = tempfile.NamedTemporaryFile(mode="w")
+        man = MyModel.objects
+
+        for i in range(3):
+            MyModel(int_type=i, str_type='s%d' % i).save()
+
+        storage = JSONLinesStorage(tfile.name)
+        self.assertEqual( [], list(storage.read(MyModel)) )
+
+        man.store(storage)
+
+        with open(tfile.name) as f:
+            lines = f.readlines()
+        self.assertEqual( 3, len(lines) )
+        self.assertEqual( 's0', json.loads(lines[0])['str_type'] )
+
+        # inserts are appended, the earlier lines are untouched
+        MyModel(int_type=3).save()
+        man.store(storage)
+
+        with open(tfile.name) as f:
+            self.assertEqual( lines, f.readlines()[:3] )
+
+        # anything else rewrites the file
+        man.delete( man.get(0) )
+        MyModel(int_type=1, str_type='changed').save()
+        man.store(storage)
+
+        man.load(storage)
+        self.assertEqual( [1, 2, 3], sorted(man.pks) )
+        self.assertEqual( 'changed', man.get(1).str_type )
+        self.assertFalse( man.dirty )
+
+        # somebody else appends, including a line they're still writing
+        offset = storage.offset
+        with open(tfile.name, 'a') as f:
+            f.write( MyModel(int_type=10, str_type='ten').json + '\n' )
+            f.write( MyModel(int_type=1, str_type='again').json + '\n' )
+            f.write( '{"int_type": 11' )
+
+        self.assertEqual( 2, man.tail(storage) )
+        self.assertEqual( 'ten', man.get(10).str_type )
+        self.assertEqual( 'again', man.get(1).str_type )
+        self.assertFalse( man.dirty )
+        self.assertEqual( 0, man.tail(storage) )
+
+        with open(tfile.name, 'a') as f:
+            f.write( ', "str_type": "eleven"}\n' )
+
+        self.assertEqual( 1, man.tail(storage) )
+        self.assertEqual( 'eleven', man.get(11).str_type )
+
+        # any remembered offset
+        self.assertEqual( [10, 1, 11], [e['int_type'] for e in storage.tail(MyModel, offset)] )
+
+        # pk 1 is in the file twice now
+        man.store(storage, force=True)
+
+        # our own appends aren't read back
+        MyModel(int_type=12).save()
+        man.store(storage)
+        self.assertEqual( 0, man.tail(storage) )
+
+        # a line that never finished is skipped
+        with open(tfile.name, 'a') as f:
+            f.write( '{"int_type": 13' )
+
+        MyModel(int_type=14).save()
+        man.store(storage)
+
+        man.load(storage)
+        self.assertEqual( [1, 2, 3, 10, 11, 12, 14], sorted(man.pks) )
+
+    def test_export(self):
+        "storing to a storage we didn't load from writes everything"
+        tfile = tempfile.NamedTemporaryFile(mode="w")
+        efile = tempfile.NamedTemporaryFile(mode="w")
+        man = MyModel.objects
+
+        for i in range(5):
+            MyModel(int_type=i).save()
+
+        storage = JSONLinesStorage(tfile.name)
+        man.store(storage)
+        man.load(storage)
+
+        MyModel(int_type=99).save()
+        export = JSONLinesStorage(efile.name)
+        man.store(export)
+        self.assertEqual( 6, len(list(export.read(MyModel))) )
+
+        # the export is what changes are relative to now
+        MyModel(int_type=100).save()
+        man.store(export)
+        self.assertEqual( 7, len(list(export.read(MyModel))) )
+
+        man.load(storage)
+        self.assertEqual( [0, 1, 2, 3, 4], sorted(man.pks) )
+
+    def test_dict_override(self):
+        "storages write what Model.dict returns"
+        class Secret(Model):
+            id     = fields.IntField(primary_key=True)
+            secret = fields.StringField()
+
+            @property
+            def dict(self):
+                d = Model.dict.fget(self)
+                del d['secret']
+                return d
+
+        for i in range(3):
+            Secret(id=i, secret='hush').save()
+
+        tdir = tempfile.TemporaryDirectory()
+
+        for storage_class in [JSONStorage, JournalStorage, JSONLinesStorage]:
+            filename = os.path.join(tdir.name, 'Secret.' + storage_class.__name__)
+            storage = storage_class(filename)
+            Secret.objects.store(storage, force=True)
+
+            # and every journaled save
+            Secret(id=3, secret='hush').save()
+            Secret.objects.store(storage)
+
+            text = open(filename).read()
+            if storage_class is JournalStorage:
+                text += open(storage.journal).read()
+                storage.close()
+
+            self.assertIn( '"id"', text )
+            self.assertNotIn( 'hush', text )
+            Secret.objects.delete( Secret.objects.get(3) )
+
+    def test_json_compact(self):
+        "compact files have no whitespace between records"
+        now = tznow()
+
+        for i in range(25):
+            MyModel(int_type=i, str_type='string %d' % i, dt_type=now).save()
+
+        pretty = tempfile.NamedTemporaryFile(mode="w")
+        compact = tempfile.NamedTemporaryFile(mode="w")
+
+        storage = JSONStorage(pretty.name)
+        storage.write_chunk = 10
+        MyModel.objects.store(storage)
+
+        storage = JSONStorage(compact.name, compact=True)
+        storage.write_chunk = 10
+        MyModel.objects.store(storage, force=True)
+
+        with open(compact.name) as f:
+            lines = f.read().splitlines()
+
+        # a line per chunk
+        self.assertEqual( 3 + 2, len(lines) )
+        self.assertTrue( lines[1].startswith('{"int_type":0,"str_type":"string 0","dt_type":"%s"},{' % now.isoformat()) )
+
+        self.assertEqual( json.load(open(pretty.name)), json.load(open(compact.name)) )
+        self.assertIn( '\n  "int_type": 0,', open(pretty.name).read() )
+
+        MyModel.objects.load(storage)
+        self.assertEqual( 25, MyModel.objects.count )
+        self.assertEqual( now, MyModel.objects.get(24).dt_type )
+
+        # journal snapshots are written the same way
+        tdir = tempfile.TemporaryDirectory()
+        journal = JournalStorage(os.path.join(tdir.name, 'MyModel.json'), compact=True)
+        journal.write_chunk = 10
+        MyModel.objects.store(journal, force=True)
+        self.assertEqual( open(compact.name).read(), open(journal.filename).read() )
+        journal.close()
+
+        # nothing
+        MyModel.objects.clear()
+        MyModel.objects.store(storage)
+        self.assertEqual( [], json.load(open(compact.name)) )
@@ -19,7 +19,7 @@ class Episode(alkali.Model):
         storage = RssLoader('https://pythonbytes.fm/episodes/rss')
 
     guid           = fields.UUIDField(primary_key=True)
-    title          = fields.StringField()
+    title          = fields.StringField(searchable=True)
     published      = fields.DateTimeField()
     itunes_episode = fields.IntField()
     link           = fields.StringField()
@@ -40,7 +40,7 @@ db.load()
 # Episode.objects.load(Episode.Meta.storage)
 
 print("last 10 episodes with 'python' in the title")
-for ep in Episode.objects.filter(title__rei=r"\bpython\b").order_by('-published').limit(10):
+for ep in Episode.objects.filter(title__search="python").order_by('-published').limit(10):
     print('  ', ep)
 
 print("total episode count:", Episode.objects.count)
@@ -48,4 +48,4 @@ print("total episode count:", Episode.objects.count)
 e = Episode.objects.get(itunes_episode=100)
 print(e.title, e.published.date())
 
-print("episode featuring alkali:", Episode.objects.get(title__rei='alkali').link)
+print("episode featuring alkali:", Episode.objects.get(title__icontains="alkali").link)
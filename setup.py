@@ -48,6 +48,7 @@ setup(
     extras_require = {
         'dev': open('req_tests.txt').readlines(),
         'docs': open('req_docs.txt').readlines(),
+        'numpy': ['numpy'],
     },
 
     classifiers=[